@@ -1,9 +1,23 @@
-from .statistical_methods import find_statistical_saboteurs, statistics_report
+from .statistical_methods import (
+    find_statistical_saboteurs,
+    find_interacting_saboteurs,
+    find_bayesian_saboteurs,
+    GroupsDataSummary,
+    merge_summaries,
+    statistics_report,
+)
 from .logical_methods import (
     design_test_batch,
     find_logical_saboteurs,
+    decode_group_tests,
+    plan_test_batch_design,
+    minimum_separation,
+    verify_test_batch,
+    recommend_next_groups,
     plot_batch,
     generate_batch_report,
+    generate_batch_reports,
     generate_combinatorial_groups,
+    CombinatorialGroups,
 )
 from .tools import csv_to_groups_data
@@ -3,4 +3,10 @@ from .logical_methods import (
     find_logical_saboteurs,
     generate_combinatorial_groups,
 )
-from .reports import plot_batch, generate_batch_report
+from .planner import plan_test_batch_design
+from .bitset_cover import out_of_core_test_batch
+from .signatures import minimum_separation, verify_test_batch
+from .adaptive import recommend_next_groups
+from .group_testing import decode_group_tests
+from .combinatorial_groups import CombinatorialGroups
+from .reports import plot_batch, generate_batch_report, generate_batch_reports
@@ -0,0 +1,175 @@
+"""Adaptive design: recommendation of the next groups to test.
+
+After a round of experiments, the saboteur hypotheses (sets of at most
+``max_saboteurs`` elements) which explain the results equally well are
+considered equally likely. A candidate group splits them into the hypotheses
+under which it would fail and those under which it would succeed, and the
+expected information gain of testing it is the entropy of this split. All
+candidates are scored at once with products of sparse incidence matrices.
+"""
+
+import itertools
+from collections import OrderedDict
+
+import numpy as np
+from scipy import sparse
+
+from .logical_methods import _groups_incidence_matrix
+
+# Maximal number of (hypothesis, candidate) pairs scored at once.
+CHUNK_PAIRS = 10**7
+
+
+def _consistent_hypotheses(matrix, failed, max_saboteurs):
+    """Return the hypotheses explaining the results of the tested groups.
+
+    Parameters
+    ----------
+    matrix
+      Sparse (tested groups x elements) incidence matrix.
+
+    failed
+      Boolean array indicating which tested groups failed.
+
+    max_saboteurs
+      Maximal number of saboteurs in a hypothesis.
+
+    Returns
+    -------
+    hypotheses
+      A sparse (hypotheses x elements) incidence matrix, with one row for each
+      set of at most ``max_saboteurs`` elements, all in no successful group,
+      which intersects every failed group.
+    """
+    n_elements = matrix.shape[1]
+    in_successful_group = np.asarray(matrix[~failed].sum(axis=0)).ravel() > 0
+    suspects = np.flatnonzero(~in_successful_group)
+    # suspects_failed[i, j] is True if the i-th suspect is in failed group j.
+    suspects_failed = matrix[failed][:, suspects].T.toarray()
+    rows = []
+    for size in range(max_saboteurs + 1):
+        if size == 0:
+            combinations = np.zeros((1, 0), dtype=np.int64)
+        else:
+            combinations = np.fromiter(
+                itertools.chain.from_iterable(
+                    itertools.combinations(range(len(suspects)), size)
+                ),
+                dtype=np.int64,
+            ).reshape(-1, size)
+        explained = np.zeros((len(combinations), failed.sum()), dtype=bool)
+        for column in combinations.T:
+            explained |= suspects_failed[column]
+        rows.append(suspects[combinations[explained.all(axis=1)]])
+    hypotheses = [list(row) for size_rows in rows for row in size_rows]
+    return sparse.csr_matrix(
+        (
+            np.ones(sum(len(h) for h in hypotheses), dtype=bool),
+            (
+                [i for i, h in enumerate(hypotheses) for _ in h],
+                [e for h in hypotheses for e in h],
+            ),
+        ),
+        shape=(len(hypotheses), n_elements),
+    )
+
+
+def _binary_entropy(counts, totals):
+    """Return totals * H(counts / totals) in bits (0 where totals is 0)."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        p = counts / totals
+        entropy = -p * np.log2(p) - (1 - p) * np.log2(1 - p)
+    return totals * np.nan_to_num(entropy)
+
+
+def _expected_information_gains(hypotheses, candidates, labels):
+    """Return the information gain of each candidate, given the classes of
+    hypotheses (``labels``) already separated by the recommended groups."""
+    n_hypotheses, n_candidates = hypotheses.shape[0], candidates.shape[0]
+    n_labels = labels.max() + 1
+    classes = sparse.csr_matrix(
+        (np.ones(n_hypotheses), (labels, np.arange(n_hypotheses))),
+        shape=(n_labels, n_hypotheses),
+    )
+    class_sizes = np.asarray(classes.sum(axis=1))
+    hypotheses = hypotheses.astype(np.float32)
+    gains = np.zeros(n_candidates)
+    chunk_size = max(1, CHUNK_PAIRS // max(1, n_hypotheses))
+    for start in range(0, n_candidates, chunk_size):
+        chunk = candidates[start : start + chunk_size].T.astype(np.float32)
+        fails = (hypotheses @ chunk).toarray() > 0
+        class_fails = classes @ fails
+        entropies = _binary_entropy(class_fails, class_sizes)
+        gains[start : start + chunk_size] = entropies.sum(axis=0) / n_hypotheses
+    return gains
+
+
+def recommend_next_groups(
+    groups, failed_groups, candidate_groups, max_saboteurs=1, n_groups=1
+):
+    """Recommend the candidate groups to test next to find the saboteurs.
+
+    All hypotheses of at most ``max_saboteurs`` saboteurs explaining the
+    results so far are considered equally likely. Candidates are selected one
+    after the other, each maximizing the expected information gain (in bits)
+    given the outcomes of the previously recommended candidates.
+
+    Parameters
+    ----------
+    groups
+      A dict {group_name: [elements in that group]} of the tested groups.
+
+    failed_groups
+      A list of the names of the tested groups which failed.
+
+    candidate_groups
+      A dict {group_name: [elements in that group]} of the groups which can
+      be tested next, for instance generated with
+      ``generate_combinatorial_groups``.
+
+    max_saboteurs
+      The maximum number of saboteurs among the elements.
+
+    n_groups
+      Number of groups to recommend for the next round.
+
+    Returns
+    -------
+    {'recommended': [...], 'information_gains': [...], 'n_hypotheses': n}
+      Where ``recommended`` lists the names of the recommended candidates,
+      ``information_gains`` gives the expected information gain of each
+      recommended candidate (given the outcomes of the previous ones), and
+      ``n_hypotheses`` is the number of hypotheses consistent with the
+      results so far. Recommendations stop early when no candidate can
+      separate the remaining hypotheses.
+    """
+    failed_groups = set(failed_groups)
+    # The tested and candidate groups share the columns of one incidence matrix
+    # (keyed by position, as candidates may reuse the names of tested groups).
+    all_groups = OrderedDict(
+        enumerate(itertools.chain(groups.values(), candidate_groups.values()))
+    )
+    _, all_matrix = _groups_incidence_matrix(all_groups)
+    matrix, candidates = all_matrix[: len(groups)], all_matrix[len(groups) :]
+    failed = np.array([name in failed_groups for name in groups], dtype=bool)
+    hypotheses = _consistent_hypotheses(matrix, failed, max_saboteurs)
+    candidate_names = list(candidate_groups.keys())
+    labels = np.zeros(hypotheses.shape[0], dtype=np.int64)
+    recommended, gains = [], []
+    for _ in range(min(n_groups, len(candidate_names))):
+        if hypotheses.shape[0] == 0:
+            break
+        candidate_gains = _expected_information_gains(hypotheses, candidates, labels)
+        candidate_gains[[candidate_names.index(n) for n in recommended]] = -1
+        best = candidate_gains.argmax()
+        if candidate_gains[best] <= 0:
+            break
+        recommended.append(candidate_names[best])
+        gains.append(float(candidate_gains[best]))
+        fails = np.asarray((hypotheses @ candidates[best].T).todense()).ravel() > 0
+        labels = np.unique(2 * labels + fails, return_inverse=True)[1].ravel()
+    return dict(
+        recommended=recommended,
+        information_gains=gains,
+        n_hypotheses=hypotheses.shape[0],
+    )
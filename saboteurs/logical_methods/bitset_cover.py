@@ -0,0 +1,391 @@
+"""Greedy test batch design over packed bitsets of tuples.
+
+In ``design_test_batch``, a selection of groups enables the identification of
+saboteurs if, for every tuple ``(x, y1, ... yk)`` of elements, some selected
+group contains ``x`` but none of the ``y``. Here the tuples are not created as
+Python objects: each tuple is identified by an integer index (the index of
+``x`` times the number of combinations of ``k`` other elements, plus the
+colexicographic rank of the combination), and the tuples covered by each group
+are stored as one bit per tuple in a (groups x tuples/8) array of bytes.
+
+For problems too large for memory, this array can be written by chunks to a
+memory-mapped file and the selection streamed from it (``out_of_core_test_batch``).
+"""
+
+import heapq
+import itertools
+import os
+import tempfile
+import time
+from math import comb
+
+import numpy as np
+
+POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def number_of_tuples(n_elements, max_saboteurs):
+    """Return the number of (x, y1, ... yk) tuples, y's being unordered."""
+    if n_elements <= max_saboteurs:
+        return 0
+    return n_elements * comb(n_elements - 1, max_saboteurs)
+
+
+def _binomials_table(n, k):
+    """Return an array where table[a, r] is the binomial coefficient C(a, r)."""
+    return np.array(
+        [[comb(a, r) for r in range(k + 1)] for a in range(n + 1)], dtype=np.int64
+    )
+
+
+def group_tuples_indices(group_ids, n_elements, max_saboteurs, binomials=None):
+    """Return the indices of the tuples covered by a group.
+
+    These are the tuples ``(x, y1, ... yk)`` with ``x`` in the group and the
+    ``y``'s out of the group.
+
+    Parameters
+    ----------
+    group_ids
+      Indices of the elements in the group (between 0 and n_elements - 1).
+
+    n_elements
+      Total number of elements.
+
+    max_saboteurs
+      Number ``k`` of ``y``'s in each tuple.
+
+    binomials
+      Table of binomial coefficients returned by ``_binomials_table``.
+    """
+    k = max_saboteurs
+    if binomials is None:
+        binomials = _binomials_table(n_elements, k)
+    group_ids = np.unique(group_ids)
+    in_group = np.zeros(n_elements, dtype=bool)
+    in_group[group_ids] = True
+    outside = np.flatnonzero(~in_group)
+    if k == 0:
+        combinations = np.zeros((1, 0), dtype=np.int64)
+    else:
+        combinations = np.fromiter(
+            itertools.chain.from_iterable(itertools.combinations(outside, k)),
+            dtype=np.int64,
+        ).reshape(-1, k)
+    indices = list(
+        _iter_group_tuples_indices(group_ids, combinations, n_elements, k, binomials)
+    )
+    return np.concatenate(indices) if len(indices) else np.zeros(0, dtype=np.int64)
+
+
+def _iter_group_tuples_indices(group_ids, combinations, n_elements, k, binomials):
+    """Yield, for each x in the group, the indices of the tuples (x, ys) where
+    the ys are the rows of ``combinations`` (elements out of the group)."""
+    tuples_per_x = comb(n_elements - 1, k)
+    for x in group_ids:
+        # Indices of the y's among the elements other than x.
+        shifted = combinations - (combinations > x)
+        ranks = np.zeros(len(shifted), dtype=np.int64)
+        for i in range(k):
+            ranks += binomials[shifted[:, i], i + 1]
+        yield x * tuples_per_x + ranks
+
+
+def set_bits(row, indices):
+    """Set the bits with the given indices in a packed (big-endian) row."""
+    masks = (128 >> (indices & 7)).astype(np.uint8)
+    np.bitwise_or.at(row, indices >> 3, masks)
+
+
+def greedy_bitset_cover(coverage, n_bits, chunk_size=None):
+    """Greedily select rows of a packed bits matrix until all bits are covered.
+
+    Parameters
+    ----------
+    coverage
+      A (rows x bytes) array of uint8, for instance a Numpy memmap.
+
+    n_bits
+      Number of bits to cover (the rest of the last byte is padding).
+
+    chunk_size
+      Number of rows scored at once. By default, chunks of about 64MB.
+
+    Returns
+    -------
+    selected
+      The list of the indices of the selected rows, or None if some bits are
+      covered by no row.
+    """
+    n_rows, n_bytes = coverage.shape
+    if chunk_size is None:
+        chunk_size = max(1, 2**26 // max(1, n_bytes))
+    uncovered = np.packbits(np.ones(n_bits, dtype=bool))
+    selected = []
+    while uncovered.any():
+        best_row, best_score = None, 0
+        for start in range(0, n_rows, chunk_size):
+            chunk = np.asarray(coverage[start : start + chunk_size])
+            scores = POPCOUNT[chunk & uncovered].sum(axis=1, dtype=np.int64)
+            row = scores.argmax()
+            if scores[row] > best_score:
+                best_row, best_score = start + row, scores[row]
+        if best_row is None:
+            return None
+        selected.append(best_row)
+        uncovered &= ~np.asarray(coverage[best_row])
+    return selected
+
+
+def bitset_test_batch(possible_groups, max_saboteurs=1):
+    """Return the names of a greedy selection of groups identifying saboteurs.
+
+    This gives the same kind of selection as ``design_test_batch`` but stores
+    the coverage of each group as bits instead of sets of tuples, which uses
+    one bit per group and tuple instead of about 30 bytes per covered tuple.
+    Returns None if no selection enables the identification.
+    """
+    element_ids = {}
+    names, groups_ids = [], []
+    for name, elements in possible_groups.items():
+        ids = [
+            element_ids.setdefault(element, len(element_ids)) for element in elements
+        ]
+        names.append(name)
+        groups_ids.append(ids)
+    n_elements = len(element_ids)
+    n_bits = number_of_tuples(n_elements, max_saboteurs)
+    binomials = _binomials_table(n_elements, max_saboteurs)
+    coverage = np.zeros((len(groups_ids), (n_bits + 7) // 8), dtype=np.uint8)
+    for row, ids in zip(coverage, groups_ids):
+        set_bits(row, group_tuples_indices(ids, n_elements, max_saboteurs, binomials))
+    selected = greedy_bitset_cover(coverage, n_bits)
+    if selected is None:
+        return None
+    return [names[i] for i in selected]
+
+
+def _peak_resident_memory():
+    """Return the peak resident memory of the process in bytes (or None)."""
+    try:
+        import resource
+    except ImportError:  # pragma: no cover (Windows)
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _group_temporary_bytes(n_elements, group_size, k):
+    """Return a bound on the bytes of the temporary arrays used to set the bits
+    of a group in ``write_coverage_memmap``: the elements out of the group,
+    the combinations of k of them, and, for each x in the group, a shifted
+    copy of the combinations and a few arrays with one entry per combination
+    (plus a margin for the small arrays)."""
+    n_combinations = comb(n_elements - group_size, k)
+    return n_combinations * (16 * k + 48) + 16 * n_elements + 2**16
+
+
+def write_coverage_memmap(
+    groups_ids, n_elements, max_saboteurs, path, chunk_rows, stats=None
+):
+    """Write the packed coverage bits of the groups to a memory-mapped file.
+
+    The rows are computed by chunks of ``chunk_rows`` groups, each chunk being
+    written to the file and flushed before the next one is computed, so only
+    one chunk resides in memory.
+
+    Parameters
+    ----------
+    groups_ids
+      A list of lists of element indices, one list per group.
+
+    n_elements, max_saboteurs
+      As in ``group_tuples_indices``.
+
+    path
+      Path of the file to create.
+
+    chunk_rows
+      Number of rows computed in memory before being written.
+
+    stats
+      A dict in which ``bytes_written`` and ``write_time`` are incremented.
+
+    Returns
+    -------
+    coverage
+      A read-only (groups x bytes) ``numpy.memmap`` of uint8.
+    """
+    stats = {} if stats is None else stats
+    start_time = time.time()
+    k = max_saboteurs
+    n_bits = number_of_tuples(n_elements, k)
+    n_bytes = (n_bits + 7) // 8
+    shape = (len(groups_ids), n_bytes)
+    binomials = _binomials_table(n_elements, k)
+    coverage = np.memmap(path, dtype=np.uint8, mode="w+", shape=shape)
+    for start in range(0, len(groups_ids), chunk_rows):
+        chunk_ids = groups_ids[start : start + chunk_rows]
+        chunk = np.zeros((len(chunk_ids), n_bytes), dtype=np.uint8)
+        for row, ids in zip(chunk, chunk_ids):
+            # Bits are set for one x at a time, to bound the memory used by
+            # the indices of large groups.
+            ids = np.unique(ids)
+            outside = np.setdiff1d(np.arange(n_elements), ids)
+            combinations = np.fromiter(
+                itertools.chain.from_iterable(itertools.combinations(outside, k)),
+                dtype=np.int64,
+            ).reshape(-1, k)
+            for indices in _iter_group_tuples_indices(
+                ids, combinations, n_elements, k, binomials
+            ):
+                set_bits(row, indices)
+        coverage[start : start + len(chunk)] = chunk
+        coverage.flush()
+        stats["bytes_written"] = stats.get("bytes_written", 0) + chunk.nbytes
+    del coverage
+    stats["write_time"] = stats.get("write_time", 0) + time.time() - start_time
+    return np.memmap(path, dtype=np.uint8, mode="r", shape=shape)
+
+
+def lazy_greedy_bitset_cover(coverage, n_bits, chunk_size=None, stats=None):
+    """Select the same rows as ``greedy_bitset_cover``, reading fewer rows.
+
+    The scores of all rows are computed once, by chunks. As the score of a row
+    (number of uncovered bits it covers) can only decrease, each step then
+    re-scores the rows with the highest previous scores only, until one of
+    them still scores at least the previous score of all the others. This
+    reads a few rows per step instead of the whole matrix, which matters when
+    ``coverage`` is a memory-mapped file.
+
+    Parameters
+    ----------
+    coverage, n_bits, chunk_size
+      As in ``greedy_bitset_cover``.
+
+    stats
+      A dict in which ``rows_read``, ``bytes_read`` and ``select_time`` are
+      incremented.
+    """
+    stats = {} if stats is None else stats
+    start_time = time.time()
+    n_rows, n_bytes = coverage.shape
+    if chunk_size is None:
+        chunk_size = max(1, 2**26 // max(1, n_bytes))
+    uncovered = np.packbits(np.ones(n_bits, dtype=bool))
+    heap = []
+    for start in range(0, n_rows, chunk_size):
+        chunk = np.asarray(coverage[start : start + chunk_size])
+        scores = POPCOUNT[chunk].sum(axis=1, dtype=np.int64)
+        heap.extend(zip((-scores).tolist(), range(start, start + len(chunk))))
+    heapq.heapify(heap)
+    rows_read = n_rows
+    selected = []
+    while uncovered.any():
+        while heap:
+            _, row = heapq.heappop(heap)
+            row_bits = np.asarray(coverage[row])
+            rows_read += 1
+            score = int(POPCOUNT[row_bits & uncovered].sum(dtype=np.int64))
+            # Ties are broken by lowest index, as in greedy_bitset_cover.
+            if (not heap) or ((-score, row) <= heap[0]):
+                break
+            heapq.heappush(heap, (-score, row))
+        else:
+            score = 0
+        if score == 0:
+            selected = None
+            break
+        selected.append(row)
+        uncovered &= ~row_bits
+    stats["rows_read"] = stats.get("rows_read", 0) + rows_read
+    stats["bytes_read"] = stats.get("bytes_read", 0) + rows_read * n_bytes
+    stats["select_time"] = stats.get("select_time", 0) + time.time() - start_time
+    return selected
+
+
+def out_of_core_test_batch(
+    possible_groups, max_saboteurs=1, directory=None, memory_budget=2**28
+):
+    """Greedy test batch design with the coverage bits stored on disk.
+
+    The coverage bits of the groups (see ``bitset_test_batch``) are written by
+    chunks to a memory-mapped file, then the groups are selected with
+    ``lazy_greedy_bitset_cover``, reading chunks of rows. The chunks are sized
+    so that the arrays resident in memory stay within ``memory_budget``,
+    including the temporary index arrays used to write the coverage of a group
+    (the coverage of at least one group is always held in memory, as are the
+    temporary arrays of the group with the fewest elements, which has the most
+    tuples). The selection is the same as with ``bitset_test_batch``.
+
+    Parameters
+    ----------
+    possible_groups
+      A dict of the form {group_name: [elements in group]}.
+
+    max_saboteurs
+      The maximum number of potential bad elements.
+
+    directory
+      Directory of the memory-mapped file, deleted at the end. By default, a
+      temporary directory.
+
+    memory_budget
+      Number of bytes of the arrays resident in memory.
+
+    Returns
+    -------
+    selected, stats
+      The list of the names of the selected groups (None if no selection
+      enables the identification), and a dict of statistics: ``file_bytes``
+      (size of the coverage file), ``bytes_written``, ``bytes_read``,
+      ``rows_read``, ``chunk_rows``, ``resident_bytes`` (estimated peak size of
+      the arrays in memory, temporaries included), ``process_peak_memory``
+      (peak resident memory of the whole Python process since it started, in
+      bytes, if available, which includes everything else the process holds),
+      ``write_time`` and ``select_time``.
+    """
+    element_ids = {}
+    names, groups_ids = [], []
+    for name, elements in possible_groups.items():
+        ids = [
+            element_ids.setdefault(element, len(element_ids)) for element in elements
+        ]
+        names.append(name)
+        groups_ids.append(ids)
+    n_elements = len(element_ids)
+    n_bits = number_of_tuples(n_elements, max_saboteurs)
+    n_bytes = max(1, (n_bits + 7) // 8)
+    # Writing a chunk also creates temporary arrays, the largest for the
+    # group with the fewest elements.
+    min_group_size = min((len(set(ids)) for ids in groups_ids), default=0)
+    temporary_bytes = _group_temporary_bytes(n_elements, min_group_size, max_saboteurs)
+    # Scoring a chunk creates two temporary arrays of the size of the chunk,
+    # and the uncovered bits and the current row are also in memory.
+    chunk_rows = max(
+        1,
+        int(
+            min(
+                (memory_budget - 2 * n_bytes) // (3 * n_bytes),
+                (memory_budget - temporary_bytes) // n_bytes,
+            )
+        ),
+    )
+    rows = min(chunk_rows, len(names))
+    stats = {
+        "chunk_rows": chunk_rows,
+        "resident_bytes": max(
+            (3 * rows + 2) * n_bytes, rows * n_bytes + temporary_bytes
+        ),
+        "file_bytes": len(names) * n_bytes,
+    }
+    with tempfile.TemporaryDirectory(dir=directory) as temp_directory:
+        path = os.path.join(temp_directory, "coverage.bits")
+        coverage = write_coverage_memmap(
+            groups_ids, n_elements, max_saboteurs, path, chunk_rows, stats
+        )
+        selected = lazy_greedy_bitset_cover(coverage, n_bits, chunk_rows, stats)
+        del coverage
+    stats["process_peak_memory"] = _peak_resident_memory()
+    if selected is None:
+        return None, stats
+    return [names[i] for i in selected], stats
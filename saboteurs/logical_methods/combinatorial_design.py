@@ -0,0 +1,87 @@
+"""Direct construction of test batches for combinatorial libraries.
+
+The groups of a combinatorial library contain one element per position, and
+all elements of a position play the same role. This module exploits this
+symmetry to build a valid test batch directly (no search), using a folded
+Reed-Solomon construction:
+
+- Let ``r`` be a prime at least as large as every position size and as the
+  number of positions. Each row ``(a, b)`` of the construction, with ``a`` in
+  ``0..r-1`` and ``b`` in ``0..beta-1``, takes at position ``q`` the element
+  with index ``((a + b * q) mod r) mod n_q``, where ``n_q`` is the number of
+  elements at position ``q``.
+- For an element ``x`` (index ``i`` at position ``p``) and each ``b``, the row
+  ``(i - b * p, b)`` contains ``x``. Before folding, these ``beta`` rows have
+  pairwise-different values at every other position, therefore an element
+  ``y`` at position ``q`` belongs to at most ``ceil(r / n_q)`` of them.
+- So if ``beta > max_saboteurs * max_q(ceil(r / n_q))``, no set of
+  ``max_saboteurs`` other elements can be in all of the groups containing
+  ``x``: for every such set, some selected group contains ``x`` and none of the
+  elements of the set, which is exactly the criterion used by
+  ``design_test_batch``.
+"""
+
+
+def _is_prime(number):
+    if number < 2:
+        return False
+    divisor = 2
+    while divisor * divisor <= number:
+        if number % divisor == 0:
+            return False
+        divisor += 1
+    return True
+
+
+def _next_prime(number):
+    while not _is_prime(number):
+        number += 1
+    return number
+
+
+def _construction_parameters(radixes, max_saboteurs):
+    """Return (r, beta) for the folded Reed-Solomon construction."""
+    prime = _next_prime(max(max(radixes), len(radixes), 2))
+    while True:
+        max_hits = max(-(-prime // radix) for radix in radixes)
+        beta = max_saboteurs * max_hits + 1
+        if beta <= prime:
+            return prime, beta
+        prime = _next_prime(prime + 1)
+
+
+def combinatorial_test_batch_indices(groups, max_saboteurs=1):
+    """Return the indices of a valid test batch of a combinatorial library.
+
+    Parameters
+    ----------
+    groups
+      A ``CombinatorialGroups`` object with disjoint positions, in which every
+      position has more than ``max_saboteurs`` elements.
+
+    max_saboteurs
+      The maximum number of bad elements to identify.
+
+    Returns
+    -------
+    indices
+      The sorted list of the indices of the selected groups.
+    """
+    radixes = groups.radixes
+    if min(radixes) <= max_saboteurs:
+        raise ValueError(
+            "All positions must have more than max_saboteurs=%d elements."
+            % max_saboteurs
+        )
+    if len(radixes) == 1:
+        return list(range(len(groups)))
+    prime, beta = _construction_parameters(radixes, max_saboteurs)
+    indices = set()
+    for a in range(prime):
+        for b in range(beta):
+            position_indices = [
+                ((a + b * position) % prime) % radix
+                for position, radix in enumerate(radixes)
+            ]
+            indices.add(groups.index_from_position_indices(position_indices))
+    return sorted(indices)
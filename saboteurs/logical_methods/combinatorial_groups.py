@@ -0,0 +1,121 @@
+"""Lazy representation of the groups of a combinatorial design."""
+
+from collections.abc import Mapping
+from functools import reduce
+import operator
+
+
+class CombinatorialGroups(Mapping):
+    """Read-only dict {group_name: elements} of all groups of a combinatorial
+    design, computed on demand.
+
+    The i-th group (starting from 0) is the i-th element of
+    ``itertools.product(*elements_per_position)``, i.e. each group contains
+    one element from each position and the last position varies fastest. The
+    group names and elements are computed from this mixed-radix index, so the
+    library is never held in memory, even with millions of groups.
+
+    Parameters
+    ----------
+    elements_per_position
+      A dict {position_name: [elements at this position]} or a list of lists
+      of elements.
+
+    prefix
+      Prefix to generate names for the generated groups, which will be of the
+      form prefix_001, prefix_002, etc.
+
+    Examples
+    --------
+
+    >>> groups = CombinatorialGroups([["A", "B"], ["C", "D", "E"]])
+    >>> len(groups)  # => 6
+    >>> groups["group_2"]  # => ("A", "D")
+    >>> groups.group_at(-1)  # => ("group_6", ("B", "E"))
+    """
+
+    def __init__(self, elements_per_position, prefix="group_"):
+        if hasattr(elements_per_position, "values"):
+            elements_per_position = list(elements_per_position.values())
+        self.elements_per_position = [tuple(e) for e in elements_per_position]
+        self.prefix = prefix
+        self.radixes = [len(elements) for elements in self.elements_per_position]
+        self._length = reduce(operator.mul, self.radixes, 1)
+        self._n_zeros = len(str(self._length))
+        all_elements = [e for elements in self.elements_per_position for e in elements]
+        self.positions_are_disjoint = len(set(all_elements)) == len(all_elements)
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        for index in range(self._length):
+            yield self.name(index)
+
+    def __getitem__(self, name):
+        return self.members(self.index(name))
+
+    def __contains__(self, name):
+        try:
+            self.index(name)
+        except KeyError:
+            return False
+        return True
+
+    def __repr__(self):
+        return "CombinatorialGroups(%s groups, positions sizes %s)" % (
+            self._length,
+            "x".join(str(radix) for radix in self.radixes),
+        )
+
+    def name(self, index):
+        """Return the name of the group with the given index."""
+        return self.prefix + str(index + 1).zfill(self._n_zeros)
+
+    def index(self, name):
+        """Return the index of the group with the given name."""
+        if not (isinstance(name, str) and name.startswith(self.prefix)):
+            raise KeyError(name)
+        suffix = name[len(self.prefix) :]
+        if (
+            (not suffix.isdigit())
+            or (str(int(suffix)).zfill(self._n_zeros) != suffix)
+            or not (1 <= int(suffix) <= self._length)
+        ):
+            raise KeyError(name)
+        return int(suffix) - 1
+
+    def position_indices(self, index):
+        """Return the indices of the group's elements at each position."""
+        if not (0 <= index < self._length):
+            raise IndexError(index)
+        indices = []
+        for radix in self.radixes[::-1]:
+            index, digit = divmod(index, radix)
+            indices.append(digit)
+        return indices[::-1]
+
+    def index_from_position_indices(self, position_indices):
+        """Return the index of the group with the given elements indices."""
+        index = 0
+        for radix, digit in zip(self.radixes, position_indices):
+            index = index * radix + digit
+        return index
+
+    def members(self, index):
+        """Return the elements of the group with the given index."""
+        return tuple(
+            elements[digit]
+            for elements, digit in zip(
+                self.elements_per_position, self.position_indices(index)
+            )
+        )
+
+    def group_at(self, index):
+        """Return (name, elements) for the group with the given index.
+
+        Negative indices are counted from the end, like in lists.
+        """
+        if index < 0:
+            index += self._length
+        return self.name(index), self.members(index)
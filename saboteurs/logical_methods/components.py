@@ -0,0 +1,42 @@
+"""Splitting of groups (or subsets) into independent sub-problems."""
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+
+
+def named_sets_components(named_sets):
+    """Split named sets into groups of sets sharing no element.
+
+    Parameters
+    ----------
+    named_sets
+      A list [(name, set_of_elements), ...], e.g. the items of a groups dict.
+
+    Returns
+    -------
+    components
+      A list of lists of indices in ``named_sets``. Two sets are in the same
+      component if they are connected through a chain of sets sharing at least
+      one element. The components are sorted by first appearance of their
+      sets, and the indices of each component are in increasing order.
+    """
+    element_ids = {}
+    rows, columns = [], []
+    for i, (name, elements) in enumerate(named_sets):
+        for element in elements:
+            if element not in element_ids:
+                element_ids[element] = len(element_ids)
+            rows.append(i)
+            columns.append(element_ids[element])
+    n_sets, n_elements = len(named_sets), len(element_ids)
+    # Bipartite graph with the sets first, then the elements.
+    graph = sparse.coo_matrix(
+        (np.ones(len(rows)), (rows, n_sets + np.array(columns, dtype=int))),
+        shape=(n_sets + n_elements, n_sets + n_elements),
+    )
+    _, labels = connected_components(graph, directed=False)
+    components = {}
+    for i, label in enumerate(labels[:n_sets]):
+        components.setdefault(label, []).append(i)
+    return list(components.values())
@@ -0,0 +1,142 @@
+"""Non-adaptive group testing decoders for logical saboteurs finding.
+
+All decoders work on the sparse group/element incidence matrix, so they scale
+to hundreds of thousands of groups. COMP, DD and SCOMP assume that the group
+results are correct, while the LP decoder tolerates some wrong results.
+"""
+
+import numpy as np
+from scipy import sparse
+from scipy.optimize import linprog
+from .logical_methods import _groups_incidence_matrix
+
+
+def _column_any(matrix):
+    return np.asarray(matrix.sum(axis=0)).ravel() > 0
+
+
+def _comp(matrix, failed):
+    """Return the mask of the elements in no successful group."""
+    return ~_column_any(matrix[~failed])
+
+
+def _dd(matrix, failed, possible):
+    """Return the mask of the possible saboteurs alone in a failed group."""
+    failed_matrix = matrix[failed]
+    n_possible = failed_matrix @ possible.astype(int)
+    alone_in_group = failed_matrix[n_possible == 1]
+    return _column_any(alone_in_group) & possible
+
+
+def _scomp(matrix, failed, possible, definite):
+    """Return the mask of a small set of possible saboteurs explaining all the
+    failed groups, starting from the definite saboteurs."""
+    selected = definite.copy()
+    failed_matrix = matrix[failed].tocsc()
+    unexplained = (failed_matrix @ selected.astype(int)) == 0
+    while unexplained.any():
+        scores = np.asarray(failed_matrix[unexplained].sum(axis=0)).ravel()
+        scores[~possible | selected] = 0
+        best = scores.argmax()
+        if scores[best] == 0:
+            break
+        selected[best] = True
+        unexplained &= ~failed_matrix[:, best].toarray().ravel()
+    return selected
+
+
+def _lp(matrix, failed, mislabel_cost):
+    """Solve the LP relaxation of the noisy decoding problem.
+
+    Minimize ``sum(x) + mislabel_cost * sum(xi)`` where ``x[e]`` in [0, 1]
+    indicates whether element e is a saboteur, and ``xi[g] >= 0`` allows group
+    g to have a wrong result: ``sum(x[e] for e in g) + xi[g] >= 1`` for
+    failed groups and ``sum(x[e] for e in g) <= xi[g]`` for successful ones.
+    """
+    n_groups, n_elements = matrix.shape
+    signs = np.where(failed, -1.0, 1.0)
+    constraints = sparse.hstack(
+        [
+            sparse.diags(signs) @ matrix.astype(float),
+            -sparse.identity(n_groups, format="csr"),
+        ],
+        format="csr",
+    )
+    costs = np.concatenate([np.ones(n_elements), mislabel_cost * np.ones(n_groups)])
+    bounds = n_elements * [(0, 1)] + n_groups * [(0, None)]
+    result = linprog(
+        costs,
+        A_ub=constraints,
+        b_ub=np.where(failed, -1.0, 0.0),
+        bounds=bounds,
+        method="highs",
+    )
+    if result.status != 0:
+        raise ValueError("The LP decoder failed: %s" % result.message)
+    return result.x[:n_elements], result.x[n_elements:]
+
+
+def decode_group_tests(groups, failed_groups, method="lp", mislabel_cost=1.0):
+    """Identify saboteur elements from groups results with a group testing
+    decoder.
+
+    Parameters
+    ----------
+    groups
+      A dict {group_name: [elements in that group]}.
+
+    failed_groups
+      A list [group_name_1, group_name_2, ...] of the names of all groups that
+      experimentally failed.
+
+    method
+      One of "comp" (all elements in no successful group are saboteurs), "dd"
+      (saboteurs are the only such element in some failed group), "scomp"
+      (DD, then the elements explaining the most unexplained failures are
+      added until all failures are explained), or "lp" (linear programming
+      relaxation tolerating wrong group results).
+
+    mislabel_cost
+      For method "lp" only: the cost of considering that a group result is
+      wrong, compared to a cost of 1 for each saboteur. Lower values make the
+      decoder more tolerant to wrong results.
+
+    Returns
+    -------
+    {'saboteurs': [...], 'suspicious': [...]}
+      Where ``saboteurs`` is the list of elements decoded as saboteurs. For
+      methods "dd" and "scomp", ``suspicious`` is the list of the other
+      elements which appear in no successful group. For method "lp",
+      ``suspicious`` lists the elements with a fractional score in the LP
+      solution, and the result also has a ``mislabelled_groups`` list of the
+      groups whose result is considered wrong by the decoder.
+    """
+    groups_names = list(groups.keys())
+    elements, matrix = _groups_incidence_matrix(groups)
+    failed_groups = set(failed_groups)
+    failed = np.array([name in failed_groups for name in groups_names], dtype=bool)
+    elements = np.array(elements, dtype=object)
+
+    if method == "lp":
+        scores, mislabels = _lp(matrix, failed, mislabel_cost)
+        saboteurs = scores > 0.5
+        return dict(
+            saboteurs=list(elements[saboteurs]),
+            suspicious=list(elements[(scores > 1e-6) & ~saboteurs]),
+            mislabelled_groups=[
+                name for name, xi in zip(groups_names, mislabels) if xi > 0.5
+            ],
+        )
+    possible = _comp(matrix, failed)
+    if method == "comp":
+        saboteurs = possible
+    elif method == "dd":
+        saboteurs = _dd(matrix, failed, possible)
+    elif method == "scomp":
+        saboteurs = _scomp(matrix, failed, possible, _dd(matrix, failed, possible))
+    else:
+        raise ValueError("Unknown method: %s" % method)
+    return dict(
+        saboteurs=list(elements[saboteurs]),
+        suspicious=list(elements[possible & ~saboteurs]),
+    )
@@ -1,7 +1,37 @@
 from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 import itertools
+import shutil
+import tempfile
+import warnings
 import numpy as np
-from .minimal_cover import minimal_cover
+from scipy import sparse
+from .minimal_cover import (
+    minimal_cover,
+    milp_minimal_cover,
+    greedy_multicover,
+    weighted_minimal_cover,
+    reduce_cover_problem,
+)
+from .combinatorial_groups import CombinatorialGroups
+from .combinatorial_design import combinatorial_test_batch_indices
+from .components import named_sets_components
+from .bitset_cover import (
+    bitset_test_batch,
+    out_of_core_test_batch,
+    number_of_tuples,
+)
+from .planner import (
+    plan_test_batch_design,
+    DEFAULT_MEMORY_BUDGET,
+    OUT_OF_CORE_MEMORY,
+)
+from ..results import LogicalSaboteursResult
+
+# Above this number of tuples to cover, or of groups, design_test_batch(
+# solver="auto") uses the direct combinatorial construction when possible.
+MAX_SEARCH_TUPLES = 10**5
+MAX_SEARCH_GROUPS = 1000
 
 
 def generate_combinatorial_groups(elements_per_position, prefix="group_"):
@@ -18,20 +48,20 @@ def generate_combinatorial_groups(elements_per_position, prefix="group_"):
     Returns
     -------
       groups
-        An ordered dict {group_001: [e1, e2, e3, e4], group_002: [...] etc.}
-        where each group contains exactly one element from each position, and
-        all possible combinations of elements are there.
+        A ``CombinatorialGroups`` object, which behaves like an ordered dict
+        {group_001: [e1, e2, e3, e4], group_002: [...] etc.} where each group
+        contains exactly one element from each position, and all possible
+        combinations of elements are there. The groups are computed on
+        demand, and can also be accessed by index with ``groups.group_at(i)``.
     """
-    if hasattr(elements_per_position, "values"):
-        elements_per_position = list(elements_per_position.values())
-    groups = list(itertools.product(*elements_per_position))
-    n_zeros = int(np.log10(len(groups))) + 1
-    return OrderedDict(
-        [(prefix + str(i + 1).zfill(n_zeros), group) for i, group in enumerate(groups)]
-    )
+    return CombinatorialGroups(elements_per_position, prefix=prefix)
 
 
 def _minimal_elements_group_coverage(groups):
+    if isinstance(groups, CombinatorialGroups) and groups.positions_are_disjoint:
+        # A set of elements covers all groups if and only if it contains all
+        # the elements of a position.
+        return list(min(groups.elements_per_position, key=len))
     elements_group_coverage = {}
     for group_name, elements in groups.items():
         for element in elements:
@@ -41,7 +71,74 @@ def _minimal_elements_group_coverage(groups):
     return minimal_cover(set(groups.keys()), elements_group_coverage.items())
 
 
-def design_test_batch(possible_groups, max_saboteurs=1):
+def _is_structured_library(groups):
+    return isinstance(groups, CombinatorialGroups) and groups.positions_are_disjoint
+
+
+def _design_component_test_batch(component_groups_and_parameters):
+    component_groups, parameters = component_groups_and_parameters
+    parameters = dict(parameters)
+    n_elements = len(set().union(*component_groups.values()))
+    # Saboteurs in other components don't affect this component's groups.
+    parameters["max_saboteurs"] = min(parameters["max_saboteurs"], n_elements - 1)
+    # The statistics are returned, as the dicts of worker processes are lost.
+    stats = parameters["stats"] = {}
+    selected, error = design_test_batch(component_groups, **parameters)
+    return selected, error, stats
+
+
+def _design_components_test_batch(
+    possible_groups, components_groups, processes, stats=None, **parameters
+):
+    """Design separately the test batches of groups sharing no elements.
+
+    Each sub-problem uses its own checkpoint file, with the component index
+    appended to the provided ``checkpoint_file`` and ``resume_from`` paths,
+    and its statistics are listed in ``stats["components"]``.
+    """
+    jobs = []
+    for i, groups in enumerate(components_groups):
+        component_parameters = dict(parameters)
+        for path_parameter in ("checkpoint_file", "resume_from"):
+            if parameters.get(path_parameter, None) is not None:
+                path = "%s.%d" % (parameters[path_parameter], i)
+                component_parameters[path_parameter] = path
+        jobs.append((groups, component_parameters))
+    if processes == 1:
+        results = list(map(_design_component_test_batch, jobs))
+    else:
+        with ProcessPoolExecutor(processes) as executor:
+            results = list(executor.map(_design_component_test_batch, jobs))
+    if stats is not None:
+        stats["components"] = [component_stats for _, _, component_stats in results]
+    selected = []
+    for component_selected, error, _ in results:
+        if error is not None:
+            return component_selected, error
+        selected += list(component_selected.keys())
+    keys = {group: i for i, group in enumerate(possible_groups.keys())}
+    selected = sorted(selected, key=keys.__getitem__)
+    return OrderedDict((g, possible_groups[g]) for g in selected), None
+
+
+def design_test_batch(
+    possible_groups,
+    max_saboteurs=1,
+    solver="auto",
+    processes=1,
+    group_costs=None,
+    time_limit=None,
+    memory_budget=DEFAULT_MEMORY_BUDGET,
+    time_budget=None,
+    checkpoint_file=None,
+    checkpoint_interval=60,
+    resume_from=None,
+    fixed_groups=None,
+    max_errors=0,
+    spill_directory=None,
+    element_availability=None,
+    stats=None,
+):
     """Select a subset of the groups that enables identification of bad elements.
 
     Parameters
@@ -54,6 +151,111 @@ def design_test_batch(possible_groups, max_saboteurs=1):
       the groups. A bad element is an element which will make every group
       that contains it "fail".
 
+    solver
+      Either "search", to find a small selection of groups with a (possibly
+      exponential) search over all groups (after selecting the groups needed
+      in any selection and discarding the groups covering only tuples also
+      covered by another group, see ``reduce_cover_problem``), or
+      "combinatorial", to directly build a selection for libraries generated
+      with ``generate_combinatorial_groups`` (this is instantaneous even for
+      huge libraries, but may select more groups than the search), or "bitset"
+      for a greedy selection storing the tuples covered by each group as bits
+      (much faster and lighter than the search, but possibly selecting a few
+      more groups), or "out_of_core" for the same greedy selection with the
+      bits written to a memory-mapped file (see ``out_of_core_test_batch``),
+      or "milp" to find the smallest selection with SciPy's mixed-integer
+      linear programming solver. The default, "auto", uses "combinatorial" for
+      combinatorial libraries with too many groups or tuples for the search,
+      and otherwise the first of "search" and "bitset" (and "out_of_core" if a
+      ``spill_directory`` is provided) estimated to fit in ``memory_budget``
+      and ``time_budget``, and in the free disk space (see
+      ``plan_test_batch_design``), then "combinatorial" for combinatorial
+      libraries.
+
+    processes
+      Groups which share no elements with the other groups form independent
+      sub-problems, which are solved separately. This is the number of
+      processes solving these sub-problems in parallel (None for one process
+      per CPU).
+
+    group_costs
+      A dict {group_name: cost} (for instance the price or the build time of
+      each group). When provided, the total cost of the selected groups is
+      minimized instead of their number, by the "milp" solver (also used by
+      the "auto" solver) or by a branch-and-bound "search" (see
+      ``weighted_minimal_cover``), which quickly finds good selections but
+      may need a ``time_limit`` on large libraries to stop before proving
+      that its selection is optimal. The "bitset", "out_of_core" and
+      "combinatorial" solvers are not supported, nor checkpoints.
+
+    time_limit
+      Maximal number of seconds for the "milp" solver and the weighted
+      search. If the limit is reached, the best selection found so far is
+      returned, with a warning.
+
+    memory_budget
+      Maximal number of bytes the solver is estimated to use. Problems
+      estimated to require more memory are refused before any computation,
+      with an error describing the estimates (None for no limit).
+
+    time_budget
+      Maximal number of seconds the solver is estimated to run, used in the
+      same way as ``memory_budget`` (None for no limit).
+
+    checkpoint_file
+      Path of a file where the state of the "search" solver is saved every
+      ``checkpoint_interval`` seconds (see ``minimal_cover``). When the groups
+      form independent sub-problems, each sub-problem is saved in a separate
+      file, with path ``checkpoint_file`` followed by ``.0``, ``.1``, etc.
+
+    checkpoint_interval
+      Number of seconds between two saves of the search state.
+
+    resume_from
+      Path given as ``checkpoint_file`` in a previous, interrupted run with
+      the same parameters, from which the "search" solver is continued (if
+      the file exists, else the search starts from the beginning).
+
+    fixed_groups
+      A dict {group_name: [elements in group]} of groups already selected
+      (for instance the previous test batch of a library which got new
+      elements). Only the tuples involving elements which are not in any
+      fixed group are computed, and the search selects the fewest extra
+      groups of ``possible_groups`` so that the fixed and extra groups
+      together identify all bad elements, assuming that the fixed groups
+      already identify bad elements among the elements they contain. The
+      returned batch starts with the fixed groups. Only the "search" and
+      "milp" solvers are supported.
+
+    max_errors
+      The maximum number of groups whose result may be wrong. With
+      ``max_errors=e``, each pair of saboteur hypotheses is separated by at
+      least 2e + 1 selected groups (which ``minimum_separation`` can check), so
+      the saboteurs can be identified despite e wrong results. The "search"
+      solver then selects the groups greedily. Only the "search" and "milp"
+      solvers are supported.
+
+    spill_directory
+      Directory where the "out_of_core" solver writes its temporary file
+      (by default, the system's temporary directory). When provided, the
+      "auto" solver may select the "out_of_core" solver.
+
+    element_availability
+      A dict {element: n} limiting to n the number of selected groups
+      containing the element (for instance when a part is available in
+      limited quantity). With ``fixed_groups``, the fixed groups count
+      towards the limits. Supported like ``group_costs``.
+
+    stats
+      A dict which, if provided, is filled with the ``plan`` given by
+      ``plan_test_batch_design`` and the ``engine`` it selected (the
+      "combinatorial" solver, ``fixed_groups`` and ``max_errors`` don't use the
+      planner), and for the
+      "out_of_core" engine with its I/O and memory statistics under
+      ``"out_of_core"`` (see ``out_of_core_test_batch``). When the groups form
+      independent sub-problems, ``stats["components"]`` is the list of the
+      statistics of each sub-problem.
+
     Returns
     -------
     selected_groups, error
@@ -78,29 +280,387 @@ def design_test_batch(possible_groups, max_saboteurs=1):
             )
             % (max_saboteurs, lcov, lcov, ", ".join(covering_elements)),
         )
-    all_elements = set(
-        element for elements in possible_groups.values() for element in elements
+    if (
+        (solver == "auto")
+        and _is_structured_library(possible_groups)
+        and (group_costs is None)
+        and (element_availability is None)
+        and (fixed_groups is None)
+        and (max_errors == 0)
+    ):
+        n_elements = sum(possible_groups.radixes)
+        n_tuples = number_of_tuples(n_elements, max_saboteurs)
+        if (n_tuples > MAX_SEARCH_TUPLES) or (len(possible_groups) > MAX_SEARCH_GROUPS):
+            solver = "combinatorial"
+    if solver == "combinatorial":
+        return _combinatorial_test_batch(possible_groups, max_saboteurs), None
+    if solver not in ("auto", "search", "bitset", "out_of_core", "milp"):
+        raise ValueError("Unknown solver: %s" % solver)
+    weighted = (group_costs is not None) or (element_availability is not None)
+    if weighted:
+        if solver not in ("auto", "search", "milp"):
+            raise ValueError(
+                "group_costs and element_availability are only supported by "
+                "the search and milp solvers."
+            )
+        if (checkpoint_file is not None) or (resume_from is not None):
+            raise ValueError(
+                "Checkpoints are not supported with group_costs and "
+                "element_availability."
+            )
+        if (max_errors > 0) and (solver != "milp"):
+            raise ValueError(
+                "group_costs and element_availability are only supported by "
+                "the milp solver when max_errors > 0."
+            )
+        if solver == "auto":
+            solver = "milp"
+    if max_errors > 0:
+        if fixed_groups is not None:
+            raise ValueError("fixed_groups and max_errors cannot be used together.")
+        if solver not in ("auto", "search", "milp"):
+            raise ValueError(
+                "max_errors is only supported by the search and milp solvers."
+            )
+        return _design_error_tolerant_test_batch(
+            possible_groups,
+            max_saboteurs=max_saboteurs,
+            max_errors=max_errors,
+            solver="milp" if solver == "milp" else "search",
+            group_costs=group_costs,
+            time_limit=time_limit,
+            element_availability=element_availability,
+        )
+    if fixed_groups is not None:
+        if solver not in ("auto", "search", "milp"):
+            raise ValueError(
+                "fixed_groups are only supported by the search and milp solvers."
+            )
+        return _design_incremental_test_batch(
+            possible_groups,
+            fixed_groups,
+            max_saboteurs=max_saboteurs,
+            solver="milp" if solver == "milp" else "search",
+            group_costs=group_costs,
+            time_limit=time_limit,
+            element_availability=element_availability,
+        )
+    if not isinstance(possible_groups, CombinatorialGroups):
+        groups_items = list(possible_groups.items())
+        components = named_sets_components(groups_items)
+        if len(components) > 1:
+            return _design_components_test_batch(
+                possible_groups,
+                [OrderedDict(groups_items[i] for i in c) for c in components],
+                processes=processes,
+                max_saboteurs=max_saboteurs,
+                solver=solver,
+                group_costs=group_costs,
+                time_limit=time_limit,
+                memory_budget=memory_budget,
+                time_budget=time_budget,
+                checkpoint_file=checkpoint_file,
+                checkpoint_interval=checkpoint_interval,
+                resume_from=resume_from,
+                spill_directory=spill_directory,
+                element_availability=element_availability,
+                stats=stats,
+            )
+    if solver != "auto":
+        engines = (solver,)
+    elif spill_directory is None:
+        engines = ("search", "bitset")
+    else:
+        engines = ("search", "bitset", "out_of_core")
+    if (solver == "auto") and _is_structured_library(possible_groups):
+        # Last resort for combinatorial libraries too large for the others.
+        engines += ("combinatorial",)
+    disk_budget = None
+    if "out_of_core" in engines:
+        disk_budget = shutil.disk_usage(spill_directory or tempfile.gettempdir()).free
+    plan = plan_test_batch_design(
+        possible_groups,
+        max_saboteurs,
+        engines=engines,
+        memory_budget=memory_budget,
+        time_budget=time_budget,
+        disk_budget=disk_budget,
+    )
+    if stats is not None:
+        stats.update(plan=plan, engine=plan["engine"])
+    if plan["engine"] is None:
+        return None, "This problem exceeds the budgets. " + plan["message"]
+    solver = plan["engine"]
+    if solver == "combinatorial":
+        return _combinatorial_test_batch(possible_groups, max_saboteurs), None
+    if solver in ("bitset", "out_of_core"):
+        if solver == "bitset":
+            selected = bitset_test_batch(possible_groups, max_saboteurs)
+        else:
+            if memory_budget is not None:
+                spill_memory = min(memory_budget, OUT_OF_CORE_MEMORY)
+            else:
+                spill_memory = OUT_OF_CORE_MEMORY
+            selected, spill_stats = out_of_core_test_batch(
+                possible_groups,
+                max_saboteurs,
+                directory=spill_directory,
+                memory_budget=spill_memory,
+            )
+            if stats is not None:
+                stats["out_of_core"] = spill_stats
+        if selected is None:
+            return [], "No solution found."
+        return _selected_groups(possible_groups, selected), None
+    if isinstance(possible_groups, CombinatorialGroups):
+        groups_elements = possible_groups.elements_per_position
+    else:
+        groups_elements = possible_groups.values()
+    # Elements in order of first appearance, so that the tuples below are the
+    # same from one run to the next (as required to resume a search).
+    elements = list(
+        OrderedDict.fromkeys(
+            element for elements in groups_elements for element in elements
+        )
     )
 
-    product = itertools.product(*((1 + max_saboteurs) * (all_elements,)))
-    all_tuples = set(tuple_ for tuple_ in product if len(set(tuple_)) == len(tuple_))
+    # Tuples (x, y1, y2...) where x must be in a group without the y's. The
+    # y's are taken in a fixed order, as their permutations are equivalent.
+    all_tuples = set(
+        (x,) + ys
+        for i, x in enumerate(elements)
+        for ys in itertools.combinations(
+            elements[:i] + elements[i + 1 :], max_saboteurs
+        )
+    )
+
+    selected = _minimal_tuples_cover(
+        all_tuples,
+        possible_groups.items(),
+        solver=solver,
+        group_costs=group_costs,
+        time_limit=time_limit,
+        element_availability=element_availability,
+        checkpoint_file=checkpoint_file,
+        checkpoint_interval=checkpoint_interval,
+        resume_from=resume_from,
+    )
+    if selected is None:
+        return [], "No solution found."
+    return _selected_groups(possible_groups, selected), None
 
-    def all_x_without_ys(group):
+
+def _combinatorial_test_batch(possible_groups, max_saboteurs):
+    """Return the test batch given by the direct combinatorial construction."""
+    if not _is_structured_library(possible_groups):
+        raise ValueError(
+            "The combinatorial solver requires groups generated with "
+            "generate_combinatorial_groups, with different elements at "
+            "each position."
+        )
+    indices = combinatorial_test_batch_indices(possible_groups, max_saboteurs)
+    return OrderedDict(possible_groups.group_at(i) for i in indices)
+
+
+def _minimal_tuples_cover(
+    tuples,
+    named_groups,
+    solver,
+    group_costs,
+    time_limit,
+    multiplicity=1,
+    element_availability=None,
+    **kw
+):
+    """Return the names of a minimal selection of groups covering the tuples.
+
+    A group covers a tuple (x, y1, y2...) if it contains x and none of the
+    y's. Each tuple must be covered by ``multiplicity`` selected groups. The
+    keyword arguments are the checkpoint parameters of the search.
+    """
+    named_groups = list(named_groups)
+    capacity_constraints = None
+    if element_availability is not None:
+        capacity_constraints = [
+            (limit, [name for name, group in named_groups if element in group])
+            for element, limit in element_availability.items()
+        ]
+
+    def x_without_ys(group):
         return set(
             tuple_
-            for tuple_ in all_tuples
+            for tuple_ in tuples
             if (tuple_[0] in group) and not any((e in group) for e in tuple_[1:])
         )
 
-    x_without_ys_sets = [
-        (name, all_x_without_ys(group)) for name, group in possible_groups.items()
+    x_without_ys_sets = [(name, x_without_ys(group)) for name, group in named_groups]
+    if solver == "milp":
+        selected, infos = milp_minimal_cover(
+            tuples,
+            x_without_ys_sets,
+            costs=group_costs,
+            time_limit=time_limit,
+            multiplicity=multiplicity,
+            capacity_constraints=capacity_constraints,
+        )
+        if (selected is not None) and not infos["optimal"]:
+            warnings.warn(
+                "design_test_batch: the MILP solver stopped before proving that "
+                "the selection is optimal (relative gap: %s)." % infos["gap"]
+            )
+        return selected
+    if (group_costs is not None) or (capacity_constraints is not None):
+        selected, infos = weighted_minimal_cover(
+            tuples,
+            x_without_ys_sets,
+            costs=group_costs,
+            capacity_constraints=capacity_constraints,
+            time_limit=time_limit,
+        )
+        if (selected is not None) and not infos["optimal"]:
+            warnings.warn(
+                "design_test_batch: the weighted search stopped before proving "
+                "that the selection has the minimal cost (cost: %s)." % infos["cost"]
+            )
+        return selected
+    if multiplicity > 1:
+        return greedy_multicover(tuples, x_without_ys_sets, multiplicity)
+    # The search doesn't reduce the problem when the number of groups is not
+    # bounded, so the groups in all covers and the dominated groups are
+    # removed here first.
+    reduced = reduce_cover_problem(set(tuples), x_without_ys_sets, merge_elements=False)
+    if reduced is None:
+        return None
+    tuples, x_without_ys_sets, forced = reduced
+    selected = minimal_cover(tuples, x_without_ys_sets, **kw)
+    if selected is None:
+        return None
+    return [name for name, group in forced] + list(selected)
+
+
+def _design_error_tolerant_test_batch(
+    possible_groups,
+    max_saboteurs,
+    max_errors,
+    solver,
+    group_costs,
+    time_limit,
+    element_availability=None,
+):
+    """Select groups covering each (x, y1, y2...) tuple 2e + 1 times.
+
+    For two different hypotheses S and T, there is an element x of one (say
+    S) which is not in the other. The 2e + 1 groups containing x but none of
+    the elements of T fail under S and not under T, so S and T are separated
+    by at least 2e + 1 groups, and up to e wrong results can be corrected.
+    """
+    elements = list(
+        OrderedDict.fromkeys(
+            element for elements in possible_groups.values() for element in elements
+        )
+    )
+    tuples = set(
+        (x,) + ys
+        for i, x in enumerate(elements)
+        for ys in itertools.combinations(
+            elements[:i] + elements[i + 1 :], max_saboteurs
+        )
+    )
+    multiplicity = 2 * max_errors + 1
+    selected = _minimal_tuples_cover(
+        tuples,
+        [(name, set(group)) for name, group in possible_groups.items()],
+        solver=solver,
+        group_costs=group_costs,
+        time_limit=time_limit,
+        multiplicity=multiplicity,
+        element_availability=element_availability,
+    )
+    if selected is None:
+        return [], (
+            "No solution found: some elements cannot be separated from %d "
+            "other elements by %d groups." % (max_saboteurs, multiplicity)
+        )
+    # The separation is guaranteed by the multiplicity of the cover, and is
+    # not checked here, as minimum_separation compares all hypotheses pairs.
+    return _selected_groups(possible_groups, selected), None
+
+
+def _design_incremental_test_batch(
+    possible_groups,
+    fixed_groups,
+    max_saboteurs,
+    solver,
+    group_costs,
+    time_limit,
+    element_availability=None,
+):
+    """Complete ``fixed_groups`` with groups identifying the new elements.
+
+    Only the tuples involving elements absent from ``fixed_groups`` are
+    computed, and those already covered by the fixed groups are discarded.
+    """
+    old_elements = set(
+        element for elements in fixed_groups.values() for element in elements
+    )
+    elements = list(
+        OrderedDict.fromkeys(
+            element for elements in possible_groups.values() for element in elements
+        )
+    )
+    new_elements = [e for e in elements if e not in old_elements]
+    old_elements = [e for e in elements if e in old_elements]
+    k = max_saboteurs
+    tuples = set()
+    for x in new_elements:
+        others = [e for e in elements if e != x]
+        tuples.update((x,) + ys for ys in itertools.combinations(others, k))
+    for x in old_elements:
+        other_olds = [e for e in old_elements if e != x]
+        for n_new in range(1, k + 1):
+            for new_ys in itertools.combinations(new_elements, n_new):
+                for old_ys in itertools.combinations(other_olds, k - n_new):
+                    tuples.add((x,) + new_ys + old_ys)
+    for group in fixed_groups.values():
+        group = set(group)
+        tuples = set(
+            tuple_
+            for tuple_ in tuples
+            if not ((tuple_[0] in group) and group.isdisjoint(tuple_[1:]))
+        )
+    candidates = [
+        (name, set(group))
+        for name, group in possible_groups.items()
+        if name not in fixed_groups
     ]
-    selected = minimal_cover(all_tuples, x_without_ys_sets)
+    if element_availability is not None:
+        element_availability = {
+            element: limit
+            - sum(1 for group in fixed_groups.values() if element in group)
+            for element, limit in element_availability.items()
+        }
+    selected = _minimal_tuples_cover(
+        tuples,
+        candidates,
+        solver=solver,
+        group_costs=group_costs,
+        time_limit=time_limit,
+        element_availability=element_availability,
+    )
     if selected is None:
         return [], "No solution found."
-    keys = list(possible_groups.keys())
-    selected = sorted(selected, key=lambda group: keys.index(group))
-    return OrderedDict((g, possible_groups[g]) for g in selected), None
+    extra_groups = _selected_groups(possible_groups, selected)
+    return OrderedDict(list(fixed_groups.items()) + list(extra_groups.items())), None
+
+
+def _selected_groups(possible_groups, selected):
+    """Return an OrderedDict of the selected groups, in library order."""
+    if isinstance(possible_groups, CombinatorialGroups):
+        selected = sorted(selected, key=possible_groups.index)
+    else:
+        keys = {group: i for i, group in enumerate(possible_groups.keys())}
+        selected = sorted(selected, key=keys.__getitem__)
+    return OrderedDict((g, possible_groups[g]) for g in selected)
 
 
 def _groups_fail_table(groups):
@@ -134,6 +694,37 @@ def _groups_fail_table(groups):
     )
 
 
+def _groups_incidence_matrix(groups):
+    """Return the elements of the groups and a sparse group/element matrix.
+
+    Parameters
+    ----------
+    groups
+      Ordered dict of the form {group_name: [elements in groups]}.
+
+    Returns
+    -------
+    elements, matrix
+      ``elements`` is the list of all elements, in order of first appearance
+      (the same order as in ``_groups_fail_table``), and ``matrix`` is a
+      boolean sparse CSR matrix where ``matrix[i, j]`` is True if the j-th
+      element is part of the i-th group.
+    """
+    element_ids = OrderedDict()
+    rows, columns = [], []
+    for i, group in enumerate(groups.values()):
+        for element in group:
+            if element not in element_ids:
+                element_ids[element] = len(element_ids)
+            rows.append(i)
+            columns.append(element_ids[element])
+    matrix = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=bool), (rows, columns)),
+        shape=(len(groups), len(element_ids)),
+    )
+    return list(element_ids.keys()), matrix
+
+
 def find_logical_saboteurs(groups, failed_groups):
     """Identify bad and suspicious elements from groups failure data
 
@@ -149,12 +740,29 @@ def find_logical_saboteurs(groups, failed_groups):
     Returns
     -------
     {'saboteurs': [...], 'suspicious': []}
-      Where ``suspicious`` is the list of all elements which do not appear in
+      A ``LogicalSaboteursResult``, which can be used as such a dict. Where
+      ``suspicious`` is the list of all elements which do not appear in
       successful group, and ``saboteurs`` is the list of suspicious elements
       which are also the only suspicious element in at least one group.
+      Groups sharing no elements with the other groups are analyzed
+      separately.
     """
-    groups = OrderedDict(groups.items())
+    groups_items = list(groups.items())
     failed_groups = set(failed_groups)
+    saboteurs, suspicious = [], []
+    for component in named_sets_components(groups_items):
+        component_groups = OrderedDict(groups_items[i] for i in component)
+        confirmed, suspects = _find_component_logical_saboteurs(
+            component_groups, failed_groups
+        )
+        saboteurs += list(confirmed)
+        suspicious += list(suspects.difference(confirmed))
+    return LogicalSaboteursResult(saboteurs=saboteurs, suspicious=suspicious)
+
+
+def _find_component_logical_saboteurs(groups, failed_groups):
+    """Return the sets (saboteurs, suspicious) for groups forming a connected
+    component, i.e. sharing no element with groups outside ``groups``."""
     groups_list = np.array(list(groups.keys()))
     fail_table = {
         element: set(groups_list[groups_])
@@ -179,6 +787,4 @@ def find_logical_saboteurs(groups, failed_groups):
             )
         )
     )
-    return dict(
-        saboteurs=list(confirmed), suspicious=list(suspicious.difference(confirmed))
-    )
+    return confirmed, suspicious
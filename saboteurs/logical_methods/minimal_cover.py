@@ -1,11 +1,39 @@
 """Provides a generic and slightly-smarter minimal cover algorithm."""
 
+import os
+import pickle
+import time
+import warnings
+from collections import OrderedDict
+import numpy as np
+from scipy import sparse
+from scipy.optimize import milp, LinearConstraint, Bounds
+from .components import named_sets_components
+
 
 def minimal_cover(
-    elements_set, subsets, max_subsets=None, heuristic="default", selected=(), depth=0
+    elements_set,
+    subsets,
+    max_subsets=None,
+    heuristic="default",
+    selected=(),
+    depth=0,
+    solver="search",
+    time_limit=None,
+    checkpoint_file=None,
+    checkpoint_interval=60,
+    resume_from=None,
+    costs=None,
+    capacity_constraints=None,
+    return_infos=False,
 ):
     """Generic method to find minimal subset covers.
 
+    Groups of subsets which share no element with the other subsets are
+    covered independently, which is much faster than one search over all
+    subsets. When ``max_subsets`` is provided, the problem is simplified with
+    ``reduce_cover_problem`` at each step of the search.
+
     Parameters
     ----------
     elements_set
@@ -28,23 +56,207 @@ def minimal_cover(
     depth
       (Recursion parameter, do not use.). Depth of the recursion.
 
+    solver
+      Either "search" (default) for this module's search, or "milp" to solve
+      the problem as a mixed-integer linear program (see
+      ``milp_minimal_cover``), which finds a cover with the minimal number of
+      subsets.
+
+    time_limit
+      Maximal number of seconds for the "milp" solver and the weighted
+      search, after which the best cover found so far is returned.
+
+    checkpoint_file
+      Path of a file where the state of the search (the branches left to
+      explore, the covers of the components already solved and the current
+      bound on the number of subsets) is saved every ``checkpoint_interval``
+      seconds, and where the final cover is saved at the end of the search.
+
+    checkpoint_interval
+      Number of seconds between two saves of the search state.
+
+    resume_from
+      Path of a file saved via ``checkpoint_file`` in a previous run on the
+      same problem (and with the same heuristic), from which the search is
+      continued. The search starts from the beginning if the file does not
+      exist, so the same path can be given for ``checkpoint_file`` and
+      ``resume_from`` in jobs which may be restarted.
+
+    costs
+      A dict {name: cost} of the subsets. When provided, the cover with the
+      minimal total cost is searched instead of the cover with the fewest
+      subsets, with ``weighted_minimal_cover`` for the "search" solver (the
+      ``max_subsets``, ``heuristic`` and checkpoint parameters are then not
+      supported).
+
+    capacity_constraints
+      A list of ``(limit, names)`` meaning that at most ``limit`` of the
+      subsets with these names can be selected. Also uses
+      ``weighted_minimal_cover`` for the "search" solver.
+
+    return_infos
+      If True, a dict of information on the cover is also returned.
+
     Returns
     -------
 
       None if no solution was found, else a collection of [(name, subset)...].
+      If ``return_infos`` is True, a tuple ``(selected, infos)`` where
+      ``infos`` has keys ``optimal`` (True if the cover is proven to have the
+      minimal cost, which the unweighted search never proves) and ``cost``,
+      plus the other information given by ``milp_minimal_cover`` or
+      ``weighted_minimal_cover``. Without ``return_infos``, the "milp" solver
+      warns when its cover is not proven optimal.
     """
 
+    if solver == "milp":
+        selected, infos = milp_minimal_cover(
+            elements_set,
+            subsets,
+            max_subsets=max_subsets,
+            costs=costs,
+            time_limit=time_limit,
+            capacity_constraints=capacity_constraints,
+        )
+        if return_infos:
+            return selected, infos
+        if (selected is not None) and not infos["optimal"]:
+            warnings.warn(
+                "minimal_cover: the MILP solver stopped before proving that the "
+                "cover is optimal (relative gap: %s)." % infos["gap"]
+            )
+        return selected
+    if solver != "search":
+        raise ValueError("Unknown solver: %s" % solver)
+    if (costs is not None) or (capacity_constraints is not None):
+        if max_subsets is not None:
+            raise ValueError("max_subsets is not supported with costs.")
+        selected, infos = weighted_minimal_cover(
+            elements_set,
+            subsets,
+            costs=costs,
+            capacity_constraints=capacity_constraints,
+            time_limit=time_limit,
+        )
+        return (selected, infos) if return_infos else selected
+    if return_infos:
+        selected = minimal_cover(
+            elements_set,
+            subsets,
+            max_subsets=max_subsets,
+            heuristic=heuristic,
+            selected=selected,
+            depth=depth,
+            checkpoint_file=checkpoint_file,
+            checkpoint_interval=checkpoint_interval,
+            resume_from=resume_from,
+        )
+        infos = {
+            "optimal": len(elements_set) == 0,
+            "cost": None if selected is None else float(len(selected)),
+        }
+        return selected, infos
     if len(elements_set) == 0:
         return []
     if max_subsets == 0:
         return None
 
-    if depth == 0:
-        full_set = set().union(*[subset for name, subset in subsets])
-        if full_set != elements_set:
-            return None
+    if depth > 0:
+        return _search_minimal_cover(
+            elements_set, subsets, max_subsets, heuristic, selected
+        )
 
+    full_set = set().union(*[subset for name, subset in subsets])
+    if full_set != elements_set:
+        return None
     subsets = [(n, s) for (n, s) in subsets if len(s)]
+    checkpoint = None
+    if (checkpoint_file is not None) or (resume_from is not None):
+        checkpoint = _SearchCheckpoint(
+            checkpoint_file,
+            checkpoint_interval,
+            resume_from,
+            fingerprint=(len(elements_set), [n for (n, s) in subsets], max_subsets),
+        )
+        if checkpoint.resumed.get("done", False):
+            return checkpoint.resumed["result"]
+    components = named_sets_components(subsets)
+    result = _components_minimal_cover(
+        [[subsets[i] for i in component] for component in components],
+        max_subsets=max_subsets,
+        heuristic=heuristic,
+        selected=selected,
+        checkpoint=checkpoint,
+    )
+    if checkpoint is not None:
+        checkpoint.save(force=True, done=True, result=result)
+    return result
+
+
+class _SearchCheckpoint:
+    """Periodically saves the state of a search to a file, and reloads it."""
+
+    def __init__(self, path, interval, resume_from, fingerprint):
+        self.path = path
+        self.interval = interval
+        self.fingerprint = fingerprint
+        self.last_save = time.time()
+        self.position = {}
+        self.resumed = {}
+        if (resume_from is not None) and os.path.exists(resume_from):
+            with open(resume_from, "rb") as f:
+                self.resumed = pickle.load(f)
+            if self.resumed["fingerprint"] != fingerprint:
+                raise ValueError(
+                    "The checkpoint %s was saved for a different problem." % resume_from
+                )
+
+    def save(self, force=False, **state):
+        """Save the position and the given state, if the interval has passed."""
+        if self.path is None:
+            return
+        now = time.time()
+        if (not force) and (now - self.last_save < self.interval):
+            return
+        state = dict(self.position, fingerprint=self.fingerprint, **state)
+        # Written in a temporary file first, so that an interruption during
+        # the save leaves the previous checkpoint intact.
+        with open(self.path + ".part", "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(self.path + ".part", self.path)
+        self.last_save = now
+
+
+def _search_frame(elements_set, subsets, max_subsets, heuristic, selected):
+    """Prepare the exploration of a node of the search.
+
+    Returns ``(result, None)`` if the result of the node is known without
+    exploring it, else ``(None, frame)`` where ``frame`` is a dict holding the
+    state of the node.
+    """
+    if len(elements_set) == 0:
+        return [], None
+    if max_subsets == 0:
+        return None, None
+    if max_subsets is None:
+        # Without max_subsets, the search is a greedy descent which never
+        # backtracks, and reductions would only change which cover is found.
+        subsets = [(n, s) for (n, s) in subsets if len(s)]
+        forced_names = []
+    else:
+        reduced = reduce_cover_problem(elements_set, subsets)
+        if reduced is None:
+            return None, None
+        elements_set, subsets, forced = reduced
+        forced_names = [name for (name, subset) in forced][::-1]
+        selected = list(selected) + [subset for (name, subset) in forced]
+        max_subsets -= len(forced)
+        if max_subsets < 0:
+            return None, None
+        if len(elements_set) == 0:
+            return forced_names, None
+        if max_subsets == 0:
+            return None, None
 
     def sorting_heuristic(named_subset):
         name, subset = named_subset
@@ -53,33 +265,553 @@ def minimal_cover(
         else:
             return heuristic(named_subset, selected)
 
-    ordered_subsets = sorted(subsets, key=sorting_heuristic)
+    frame = dict(
+        elements_set=elements_set,
+        ordered_subsets=sorted(subsets, key=sorting_heuristic),
+        max_subsets=max_subsets,
+        selected=selected,
+        forced_names=forced_names,
+        explored=None,
+    )
+    return None, frame
+
 
-    while len(ordered_subsets):
+def _search_minimal_cover(
+    elements_set,
+    subsets,
+    max_subsets,
+    heuristic,
+    selected,
+    checkpoint=None,
+    stack=None,
+    child_result=None,
+):
+    """Depth-first search of a cover with at most ``max_subsets`` subsets.
+
+    The nodes being explored are kept in an explicit ``stack`` of frames
+    (see ``_search_frame``) rather than in a recursion, so that the search can
+    be saved with ``checkpoint.save(stack=stack, child_result=child_result)``
+    and continued later by providing the saved stack and child result.
+    """
+    if stack is None:
+        result, frame = _search_frame(
+            elements_set, subsets, max_subsets, heuristic, selected
+        )
+        if frame is None:
+            return result
+        stack = [frame]
+    # Result of the last explored child node, or None if it has no cover.
+    while len(stack):
+        if checkpoint is not None:
+            checkpoint.save(stack=stack, child_result=child_result)
+        frame = stack[-1]
+        if frame["explored"] is not None:
+            name, new_subsets = frame["explored"]
+            frame["explored"] = None
+            if child_result is not None:
+                stack.pop()
+                child_result = child_result + [name] + frame["forced_names"]
+                continue
+            frame["ordered_subsets"] = [
+                subset_
+                for (subset_, (new_name, new_subset)) in zip(
+                    frame["ordered_subsets"], new_subsets
+                )
+                if len(new_subset) != 0
+            ]
+        ordered_subsets = frame["ordered_subsets"]
+        max_subsets = frame["max_subsets"]
+        elements_set = frame["elements_set"]
+        if len(ordered_subsets) == 0:
+            stack.pop()
+            child_result = None
+            continue
         if max_subsets is not None:
             critical_subset_length = len(elements_set) / max_subsets
             max_len = max(len(s) for name, s in ordered_subsets)
             if max_len < critical_subset_length:
-                return None
+                stack.pop()
+                child_result = None
+                continue
         name, subset = ordered_subsets.pop()
-        new_elements_set = elements_set.difference(subset)
         new_subsets = [
             (name_, sub.difference(subset)) for (name_, sub) in ordered_subsets
         ]
-        new_max_subsets = None if (max_subsets is None) else max_subsets - 1
-        result = minimal_cover(
-            new_elements_set,
+        frame["explored"] = (name, new_subsets)
+        child_result, child_frame = _search_frame(
+            elements_set.difference(subset),
             new_subsets,
-            heuristic=heuristic,
-            selected=list(selected) + [subset],
-            max_subsets=new_max_subsets,
-            depth=depth + 1,
+            None if (max_subsets is None) else max_subsets - 1,
+            heuristic,
+            list(frame["selected"]) + [subset],
         )
-        if result is not None:
-            return result + [name]
-        ordered_subsets = [
-            subset_
-            for (subset_, (new_name, new_subset)) in zip(ordered_subsets, new_subsets)
-            if len(new_subset) != 0
+        if child_frame is not None:
+            stack.append(child_frame)
+    return child_result
+
+
+def _components_minimal_cover(
+    components, max_subsets, heuristic, selected, checkpoint=None
+):
+    """Cover separately each group of subsets sharing no element with others.
+
+    If ``max_subsets`` is provided, the minimal number of subsets of each
+    component is found by trying increasing numbers of subsets, so that the
+    sum over all components is minimal. If a ``checkpoint`` is provided, the
+    search starts from the component, budget and stack it was saved at.
+    """
+    resumed = {} if checkpoint is None else checkpoint.resumed
+    first_component = resumed.get("component", 0)
+    result = list(resumed.get("result", []))
+    first_budget = resumed.get("budget", None)
+    stack = resumed.get("stack", None)
+    child_result = resumed.get("child_result", None)
+    for i, component in enumerate(components):
+        if i < first_component:
+            continue
+        elements_set = set().union(*[subset for name, subset in component])
+        if (max_subsets is None) or (len(components) == 1):
+            budgets = [max_subsets]
+        else:
+            other_components = len(components) - i - 1
+            max_budget = max_subsets - len(result) - other_components
+            budgets = range(1, max_budget + 1)
+            if (i == first_component) and (first_budget is not None):
+                budgets = range(first_budget, max_budget + 1)
+        for budget in budgets:
+            if checkpoint is not None:
+                checkpoint.position = dict(component=i, budget=budget, result=result)
+            component_result = _search_minimal_cover(
+                elements_set,
+                component,
+                max_subsets=budget,
+                heuristic=heuristic,
+                selected=selected,
+                checkpoint=checkpoint,
+                stack=stack,
+                child_result=child_result,
+            )
+            stack = child_result = None
+            if component_result is not None:
+                break
+        else:
+            return None
+        result = result + component_result
+    return result
+
+
+def reduce_cover_problem(elements_set, subsets, merge_elements=True):
+    """Simplify a set cover problem without changing its minimal covers size.
+
+    The following rules are applied until none of them changes the problem:
+
+    - Subsets which are the only subset covering some element are selected
+      (and their elements are removed from the problem).
+    - Elements covered by exactly the same subsets are replaced by a single
+      one of these elements.
+    - Subsets contained in another subset are removed (for identical subsets,
+      only the first one is kept).
+
+    Any cover of the reduced problem, plus the selected subsets, is a cover of
+    the original problem, and the reduced problem has a cover with ``n``
+    subsets if and only if the original problem had a cover with
+    ``n + len(selected)`` subsets.
+
+    Parameters
+    ----------
+    elements_set
+      The set of all elements to cover.
+
+    subsets
+      A list of (name, subset).
+
+    merge_elements
+      If False, elements covered by the same subsets are not merged, so the
+      sizes of the remaining subsets are unchanged (which matters to the
+      ordering of the search when the number of subsets is not bounded).
+
+    Returns
+    -------
+    elements_set, subsets, selected
+      The reduced problem and the list ``[(name, subset)...]`` of the selected
+      subsets, or None if some elements are covered by no subset.
+    """
+    selected = []
+    while True:
+        subsets = [(n, s) for (n, s) in subsets if len(s)]
+        # signatures[element] has its i-th bit set if subset i covers element.
+        signatures = {}
+        for i, (name, subset) in enumerate(subsets):
+            bit = 1 << i
+            for element in subset:
+                signatures[element] = signatures.get(element, 0) | bit
+        if not (elements_set <= signatures.keys()):
+            return None
+
+        forced_mask = 0
+        for signature in signatures.values():
+            if signature & (signature - 1) == 0:
+                forced_mask |= signature
+        if forced_mask:
+            forced = [i for i in range(len(subsets)) if (forced_mask >> i) & 1]
+            covered = set().union(*(subsets[i][1] for i in forced))
+            selected += [subsets[i] for i in forced]
+            elements_set = elements_set.difference(covered)
+            subsets = [
+                (name, subset.difference(covered))
+                for i, (name, subset) in enumerate(subsets)
+                if not (forced_mask >> i) & 1
+            ]
+            continue
+
+        representatives = {}
+        for element, signature in signatures.items():
+            representatives.setdefault(signature, element)
+        if merge_elements and (len(representatives) < len(signatures)):
+            kept = set(representatives.values())
+            elements_set = elements_set.intersection(kept)
+            subsets = [(name, subset.intersection(kept)) for name, subset in subsets]
+
+        sizes = [len(subset) for name, subset in subsets]
+        kept_subsets = []
+        for i, (name, subset) in enumerate(subsets):
+            # Bits of the subsets containing all elements of this subset.
+            supersets = -1
+            for element in subset:
+                supersets &= signatures[element]
+            supersets ^= 1 << i
+            dominated = (supersets & ((1 << i) - 1)) != 0
+            while supersets and not dominated:
+                j = (supersets & -supersets).bit_length() - 1
+                dominated = sizes[j] > sizes[i]
+                supersets &= supersets - 1
+            if not dominated:
+                kept_subsets.append((name, subset))
+        if len(kept_subsets) == len(subsets):
+            return elements_set, subsets, selected
+        subsets = kept_subsets
+
+
+def milp_minimal_cover(
+    elements_set,
+    subsets,
+    max_subsets=None,
+    costs=None,
+    time_limit=None,
+    multiplicity=1,
+    capacity_constraints=None,
+):
+    """Find a minimal-cost subset cover with SciPy's MILP solver (HiGHS).
+
+    Parameters
+    ----------
+    elements_set
+      The set of all elements to cover.
+
+    subsets
+      A list of (name, subset).
+
+    max_subsets
+      Maximal number of subsets allowed.
+
+    costs
+      A dict {name: cost} giving the cost of each subset. By default all
+      subsets cost 1, i.e. the number of selected subsets is minimized.
+
+    time_limit
+      Maximal number of seconds for the solver, after which the best cover
+      found so far is returned.
+
+    multiplicity
+      Number of selected subsets which must cover each element.
+
+    capacity_constraints
+      A list of ``(limit, names)`` meaning that at most ``limit`` of the
+      subsets with these names can be selected.
+
+    Returns
+    -------
+    selected, infos
+      ``selected`` is None if no solution was found, else the list of the
+      names of the selected subsets. ``infos`` is a dict with keys
+      ``optimal`` (True if the cover is proven to have the minimal cost),
+      ``cost`` (the total cost of the cover), ``gap`` (the relative gap between
+      this cost and the best lower bound found by the solver) and ``message``.
+    """
+    element_ids = {element: i for i, element in enumerate(elements_set)}
+    rows, columns = [], []
+    for j, (name, subset) in enumerate(subsets):
+        for element in subset:
+            if element in element_ids:
+                rows.append(element_ids[element])
+                columns.append(j)
+    coverage = sparse.csr_matrix(
+        (np.ones(len(rows)), (rows, columns)),
+        shape=(len(element_ids), len(subsets)),
+    )
+    constraints = [LinearConstraint(coverage, lb=multiplicity, ub=np.inf)]
+    if max_subsets is not None:
+        constraints.append(
+            LinearConstraint(np.ones((1, len(subsets))), lb=0, ub=max_subsets)
+        )
+    if capacity_constraints:
+        subset_ids = {name: j for j, (name, subset) in enumerate(subsets)}
+        rows, columns, limits = [], [], []
+        for i, (limit, names) in enumerate(capacity_constraints):
+            limits.append(limit)
+            for name in names:
+                if name in subset_ids:
+                    rows.append(i)
+                    columns.append(subset_ids[name])
+        capacity_matrix = sparse.csr_matrix(
+            (np.ones(len(rows)), (rows, columns)),
+            shape=(len(limits), len(subsets)),
+        )
+        constraints.append(LinearConstraint(capacity_matrix, lb=-np.inf, ub=limits))
+    if costs is None:
+        cost_vector = np.ones(len(subsets))
+    else:
+        cost_vector = np.array([costs[name] for name, subset in subsets], dtype=float)
+    options = {} if time_limit is None else {"time_limit": time_limit}
+    result = milp(
+        cost_vector,
+        integrality=np.ones(len(subsets)),
+        bounds=Bounds(0, 1),
+        constraints=constraints,
+        options=options,
+    )
+    infos = {
+        "optimal": result.status == 0,
+        "cost": None,
+        "gap": getattr(result, "mip_gap", None),
+        "message": result.message,
+    }
+    if result.x is None:
+        return None, infos
+    selected = [name for (name, subset), x in zip(subsets, result.x) if x > 0.5]
+    infos["cost"] = float(np.dot(cost_vector, result.x > 0.5))
+    return selected, infos
+
+
+def greedy_multicover(elements_set, subsets, multiplicity):
+    """Greedily select subsets until each element is covered several times.
+
+    At each step, the subset covering the most elements which are not yet
+    covered ``multiplicity`` times is selected (each subset can be selected
+    only once).
+
+    Parameters
+    ----------
+    elements_set
+      The set of all elements to cover.
+
+    subsets
+      A list of (name, subset).
+
+    multiplicity
+      Number of selected subsets which must cover each element.
+
+    Returns
+    -------
+    selected
+      The list of the names of the selected subsets, or None if some elements
+      are covered by less than ``multiplicity`` subsets.
+    """
+    remaining = OrderedDict(
+        (name, set(subset).intersection(elements_set)) for name, subset in subsets
+    )
+    containing = {}
+    for name, subset in remaining.items():
+        for element in subset:
+            containing.setdefault(element, []).append(name)
+    if any(len(containing.get(e, ())) < multiplicity for e in elements_set):
+        return None
+    demands = {element: multiplicity for element in elements_set}
+    unmet_demand = multiplicity * len(elements_set)
+    selected = []
+    while unmet_demand > 0:
+        name = max(remaining, key=lambda name_: len(remaining[name_]))
+        subset = remaining.pop(name)
+        selected.append(name)
+        unmet_demand -= len(subset)
+        for element in subset:
+            demands[element] -= 1
+            if demands[element] == 0:
+                for other_name in containing[element]:
+                    if other_name in remaining:
+                        remaining[other_name].discard(element)
+    return selected
+
+
+def _bits(mask):
+    """Yield the indices of the set bits of an integer."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def weighted_minimal_cover(
+    elements_set, subsets, costs=None, capacity_constraints=None, time_limit=None
+):
+    """Find a minimal-cost subset cover with a branch-and-bound search.
+
+    The search starts from the cover given by the greedy heuristic (selecting
+    the subset with the lowest cost per newly covered element). At each node,
+    it branches on the uncovered element covered by the fewest available
+    subsets, trying first the subsets with the lowest cost per newly covered
+    element, and excluding in each branch the subsets tried in the previous
+    branches. A node is pruned when its cost plus a lower bound of the cost of
+    covering the remaining elements (each element costing at least the
+    lowest cost per newly covered element of the subsets containing it)
+    reaches the cost of the best cover found.
+
+    Parameters
+    ----------
+    elements_set
+      The set of all elements to cover.
+
+    subsets
+      A list of (name, subset).
+
+    costs
+      A dict {name: cost} giving the (positive) cost of each subset. By
+      default all subsets cost 1, i.e. the number of subsets is minimized.
+
+    capacity_constraints
+      A list of ``(limit, names)`` meaning that at most ``limit`` of the
+      subsets with these names can be selected (for instance, the groups
+      using a part available in limited quantity).
+
+    time_limit
+      Maximal number of seconds of the search, after which the best cover
+      found so far is returned.
+
+    Returns
+    -------
+    selected, infos
+      ``selected`` is None if no solution was found, else the list of the
+      names of the selected subsets. ``infos`` is a dict with keys
+      ``optimal`` (True if the search completed), ``cost`` (the total cost of
+      the cover) and ``nodes`` (the number of nodes explored).
+    """
+    element_ids = {element: i for i, element in enumerate(elements_set)}
+    names, masks, subset_costs = [], [], []
+    for name, subset in subsets:
+        mask = 0
+        for element in subset:
+            if element in element_ids:
+                mask |= 1 << element_ids[element]
+        if mask:
+            names.append(name)
+            masks.append(mask)
+            subset_costs.append(1.0 if costs is None else float(costs[name]))
+    name_ids = {name: i for i, name in enumerate(names)}
+    subsets_constraints = [[] for _ in names]
+    capacities = []
+    for c, (limit, constraint_names) in enumerate(capacity_constraints or []):
+        capacities.append(limit)
+        for name in constraint_names:
+            if name in name_ids:
+                subsets_constraints[name_ids[name]].append(c)
+    full_mask = (1 << len(element_ids)) - 1
+    start_time = time.time()
+    infos = dict(optimal=True, cost=None, nodes=0)
+    best = dict(cost=np.inf, selected=None)
+
+    def available(i, excluded, capacities):
+        return not (excluded >> i) & 1 and all(
+            capacities[c] > 0 for c in subsets_constraints[i]
+        )
+
+    def select(i, capacities):
+        capacities = list(capacities)
+        for c in subsets_constraints[i]:
+            capacities[c] -= 1
+        return capacities
+
+    # Greedy cover, giving the first upper bound.
+    uncovered, selected, cost, greedy_capacities = full_mask, [], 0.0, capacities
+    while uncovered:
+        ratios = [
+            (subset_costs[i] / bin(masks[i] & uncovered).count("1"), i)
+            for i in range(len(names))
+            if (masks[i] & uncovered) and available(i, 0, greedy_capacities)
         ]
-    return None
+        if not ratios:
+            break
+        i = min(ratios)[1]
+        selected.append(i)
+        cost += subset_costs[i]
+        uncovered &= ~masks[i]
+        greedy_capacities = select(i, greedy_capacities)
+    if not uncovered:
+        best.update(cost=cost, selected=selected)
+
+    def explore(uncovered, cost, selected, excluded, capacities):
+        infos["nodes"] += 1
+        if (time_limit is not None) and (time.time() - start_time > time_limit):
+            infos["optimal"] = False
+            return
+        if not uncovered:
+            if cost < best["cost"] - 1e-9:
+                best.update(cost=cost, selected=list(selected))
+            return
+        candidates = sorted(
+            (subset_costs[i] / bin(masks[i] & uncovered).count("1"), i)
+            for i in range(len(names))
+            if (masks[i] & uncovered) and available(i, excluded, capacities)
+        )
+        # First lower bound: each uncovered element costs at least the best
+        # ratio of the candidates containing it.
+        bound, assigned = cost, 0
+        element_candidates = {}
+        for ratio, i in candidates:
+            new = masks[i] & uncovered & ~assigned
+            bound += ratio * bin(new).count("1")
+            assigned |= new
+            for element in _bits(masks[i] & uncovered):
+                element_candidates.setdefault(element, []).append(i)
+        if (assigned != uncovered) or (bound >= best["cost"] - 1e-9):
+            return
+        # Second lower bound: elements with no candidate in common must be
+        # covered by different subsets, each costing at least the cheapest
+        # of the candidates containing its element.
+        packing_bound, used = cost, 0
+        for element in sorted(
+            element_candidates, key=lambda e: (len(element_candidates[e]), e)
+        ):
+            element_mask = 0
+            for i in element_candidates[element]:
+                element_mask |= 1 << i
+            if not (used & element_mask):
+                used |= element_mask
+                packing_bound += min(
+                    subset_costs[i] for i in element_candidates[element]
+                )
+        if packing_bound >= best["cost"] - 1e-9:
+            return
+        counts = {e: len(c) for e, c in element_candidates.items()}
+        element = min(counts, key=lambda e: (counts[e], e))
+        branch_excluded = excluded
+        for ratio, i in candidates:
+            if not (masks[i] >> element) & 1:
+                continue
+            selected.append(i)
+            explore(
+                uncovered & ~masks[i],
+                cost + subset_costs[i],
+                selected,
+                branch_excluded,
+                select(i, capacities),
+            )
+            selected.pop()
+            branch_excluded |= 1 << i
+            if not infos["optimal"]:
+                return
+
+    explore(full_mask, 0.0, [], 0, capacities)
+    if best["selected"] is None:
+        return None, infos
+    infos["cost"] = best["cost"]
+    return [names[i] for i in sorted(best["selected"])], infos
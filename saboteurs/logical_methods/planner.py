@@ -0,0 +1,249 @@
+"""Estimation of the resources needed to design a test batch.
+
+The estimates are computed from the number of elements, the sizes of the
+groups and ``max_saboteurs`` only, without creating any tuple, so that
+``design_test_batch`` can pick an engine, or refuse a problem, before
+allocating gigabytes of memory. The constants below are rough measurements on
+a laptop CPU; the estimates are meant to give orders of magnitude.
+"""
+
+from collections import Counter
+from math import comb
+
+from .bitset_cover import number_of_tuples
+from .combinatorial_design import _construction_parameters
+from .combinatorial_groups import CombinatorialGroups
+
+# Memory of a tuple in the set of all tuples, and of a reference to a tuple in
+# the set of the tuples covered by a group.
+BYTES_PER_TUPLE = 100
+BYTES_PER_TUPLE_ELEMENT = 8
+BYTES_PER_COVERED_TUPLE = 300
+# Checking whether a group covers a tuple, and removing a covered tuple from
+# the sets of the other groups during the search.
+SECONDS_PER_TUPLE_CHECK = 6e-7
+SECONDS_PER_COVERED_TUPLE = 3e-7
+# Computing the bit index of a covered tuple, and scoring one byte of the
+# packed coverage matrix during the greedy selection.
+SECONDS_PER_TUPLE_BIT = 8e-7
+SECONDS_PER_COVERAGE_BYTE = 2e-9
+BITSET_CHUNK_BYTES = 2**26
+# Sparse constraint matrix and solver internals, per covered tuple.
+MILP_BYTES_PER_COVERED_TUPLE = 100
+# Reading or writing one byte of the coverage file of the "out_of_core"
+# engine, the maximal size of its arrays in memory (it uses less when the
+# memory budget is lower, down to a few rows), and the approximate number of
+# rows it reads at each greedy step.
+SECONDS_PER_DISK_BYTE = 2e-9
+OUT_OF_CORE_MEMORY = 2**28
+OUT_OF_CORE_ROWS_PER_STEP = 200
+# Memory of a selected group index, and computing the index of one row of
+# the direct construction of the "combinatorial" engine, per position.
+BYTES_PER_COMBINATORIAL_ROW = 100
+SECONDS_PER_COMBINATORIAL_ENTRY = 3e-7
+
+ENGINES = ("search", "bitset", "out_of_core", "milp", "combinatorial")
+DEFAULT_MEMORY_BUDGET = 4e9
+
+
+def _format_bytes(n_bytes):
+    for unit in ["B", "kB", "MB", "GB"]:
+        if n_bytes < 1000:
+            return "%.1f%s" % (n_bytes, unit)
+        n_bytes /= 1000.0
+    return "%.1fTB" % n_bytes
+
+
+def estimate_test_batch_design(possible_groups, max_saboteurs=1):
+    """Estimate the size of a test batch design problem and its cost with
+    each engine of ``design_test_batch``.
+
+    Parameters
+    ----------
+    possible_groups
+      A dict of the form {group_name: [elements in group]}.
+
+    max_saboteurs
+      The maximum number of potential bad elements.
+
+    Returns
+    -------
+    estimates
+      A dict with the number of groups, elements and tuples to cover, the
+      total number of (group, covered tuple) pairs, and for each engine
+      ("search", "bitset", "out_of_core", "milp", "combinatorial") a dict
+      {"memory": bytes, "time": seconds} (the time of the "milp" engine cannot
+      be estimated and is None). The "out_of_core" engine also has a "disk"
+      estimate in bytes, and its "memory" is the minimal memory it can work
+      with. The "combinatorial" estimate is None for libraries which are not
+      generated with ``generate_combinatorial_groups`` with different
+      elements at each position and more than ``max_saboteurs`` elements per
+      position.
+    """
+    k = max_saboteurs
+    if (
+        isinstance(possible_groups, CombinatorialGroups)
+        and possible_groups.positions_are_disjoint
+    ):
+        n_groups = len(possible_groups)
+        n_elements = sum(possible_groups.radixes)
+        sizes_counts = {len(possible_groups.radixes): n_groups}
+    else:
+        n_groups = len(possible_groups)
+        all_elements = set()
+        sizes_counts = Counter()
+        for elements in possible_groups.values():
+            all_elements.update(elements)
+            sizes_counts[len(set(elements))] += 1
+        n_elements = len(all_elements)
+    n_tuples = number_of_tuples(n_elements, k)
+    n_covered = sum(
+        count * size * comb(max(0, n_elements - size), k)
+        for size, count in sizes_counts.items()
+    )
+    # The greedy selections rarely need more than a few times the minimal
+    # number of groups, which is at least n_tuples / (mean covered tuples).
+    mean_covered = max(1.0, 1.0 * n_covered / max(1, n_groups))
+    n_steps = min(n_groups, 3 * int(n_tuples / mean_covered + 1))
+    n_bytes = (n_tuples + 7) // 8
+    engines = {
+        "search": {
+            "memory": n_tuples * (BYTES_PER_TUPLE + BYTES_PER_TUPLE_ELEMENT * (k + 1))
+            + n_covered * BYTES_PER_COVERED_TUPLE,
+            "time": n_groups * n_tuples * SECONDS_PER_TUPLE_CHECK
+            + n_steps * n_covered * SECONDS_PER_COVERED_TUPLE,
+        },
+        "bitset": {
+            "memory": n_groups * n_bytes + min(n_groups * n_bytes, BITSET_CHUNK_BYTES),
+            "time": n_covered * SECONDS_PER_TUPLE_BIT
+            + n_steps * n_groups * n_bytes * SECONDS_PER_COVERAGE_BYTE,
+        },
+        "out_of_core": {
+            "memory": 5 * n_bytes,
+            "disk": n_groups * n_bytes,
+            "time": n_covered * SECONDS_PER_TUPLE_BIT
+            + n_groups
+            * n_bytes
+            * (SECONDS_PER_COVERAGE_BYTE + 2 * SECONDS_PER_DISK_BYTE)
+            + n_steps
+            * min(n_groups, OUT_OF_CORE_ROWS_PER_STEP)
+            * n_bytes
+            * (SECONDS_PER_COVERAGE_BYTE + SECONDS_PER_DISK_BYTE),
+        },
+        "milp": {
+            "memory": n_covered * MILP_BYTES_PER_COVERED_TUPLE,
+            "time": None,
+        },
+        "combinatorial": _combinatorial_estimate(possible_groups, k),
+    }
+    return {
+        "n_groups": n_groups,
+        "n_elements": n_elements,
+        "n_tuples": n_tuples,
+        "n_covered_tuples": n_covered,
+        "engines": engines,
+    }
+
+
+def _combinatorial_estimate(possible_groups, max_saboteurs):
+    """Return the estimate of the direct construction, or None if it does not
+    apply to the library."""
+    if not (
+        isinstance(possible_groups, CombinatorialGroups)
+        and possible_groups.positions_are_disjoint
+        and min(possible_groups.radixes) > max_saboteurs
+    ):
+        return None
+    radixes = possible_groups.radixes
+    if len(radixes) == 1:
+        n_rows = len(possible_groups)
+    else:
+        prime, beta = _construction_parameters(radixes, max_saboteurs)
+        n_rows = prime * beta
+    return {
+        "memory": n_rows * BYTES_PER_COMBINATORIAL_ROW,
+        "time": n_rows * len(radixes) * SECONDS_PER_COMBINATORIAL_ENTRY,
+    }
+
+
+def plan_test_batch_design(
+    possible_groups,
+    max_saboteurs=1,
+    engines=("search", "bitset"),
+    memory_budget=DEFAULT_MEMORY_BUDGET,
+    time_budget=None,
+    disk_budget=None,
+):
+    """Select the first engine able to design a test batch within budgets.
+
+    Parameters
+    ----------
+    possible_groups
+      A dict of the form {group_name: [elements in group]}.
+
+    max_saboteurs
+      The maximum number of potential bad elements.
+
+    engines
+      The engines to consider, by order of preference.
+
+    memory_budget
+      Maximal number of bytes the engine may use (None for no limit).
+
+    time_budget
+      Maximal number of seconds the engine may run (None for no limit). This
+      budget is not applied to engines with an unpredictable running time.
+
+    disk_budget
+      Maximal number of bytes the "out_of_core" engine may write to disk
+      (None for no limit).
+
+    Returns
+    -------
+    plan
+      The estimates returned by ``estimate_test_batch_design`` with two more
+      keys: ``engine`` (the name of the selected engine, or None if no engine
+      fits in the budgets) and ``message`` (a description of the estimates).
+    """
+    plan = estimate_test_batch_design(possible_groups, max_saboteurs)
+    plan["engine"] = None
+    descriptions = []
+    for engine in engines:
+        estimate = plan["engines"][engine]
+        if estimate is None:
+            descriptions.append("%s: not applicable" % engine)
+            continue
+        time = estimate["time"]
+        descriptions.append(
+            "%s: %s of memory, %s%s"
+            % (
+                engine,
+                _format_bytes(estimate["memory"]),
+                (
+                    ""
+                    if "disk" not in estimate
+                    else _format_bytes(estimate["disk"]) + " of disk, "
+                ),
+                "unknown time" if time is None else "%.2gs" % time,
+            )
+        )
+        fits_memory = (memory_budget is None) or (estimate["memory"] <= memory_budget)
+        fits_time = (time_budget is None) or (time is None) or (time <= time_budget)
+        fits_disk = (disk_budget is None) or (estimate.get("disk", 0) <= disk_budget)
+        if fits_memory and fits_time and fits_disk and plan["engine"] is None:
+            plan["engine"] = engine
+    plan["message"] = (
+        "Designing a test batch of %d groups with %d elements and up to %d "
+        "saboteurs requires covering %d tuples (%d group/tuple pairs). "
+        "Estimated costs: %s. Budgets: %s of memory, %s."
+    ) % (
+        plan["n_groups"],
+        plan["n_elements"],
+        max_saboteurs,
+        plan["n_tuples"],
+        plan["n_covered_tuples"],
+        "; ".join(descriptions),
+        "no limit" if memory_budget is None else _format_bytes(memory_budget),
+        "no time limit" if time_budget is None else "%.2gs" % time_budget,
+    )
+    return plan
@@ -1,41 +1,114 @@
-from collections import OrderedDict
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+import hashlib
+import json
+import os
+import shutil
+import zipfile
 import numpy as np
 import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
+from matplotlib.figure import Figure
 import flametree
-from .logical_methods import _groups_fail_table
+from .logical_methods import _groups_incidence_matrix
 
+HASHES_FILE = "batches_hashes.json"
 
-def plot_batch(groups, ax=None):
+
+def _thinned_ticks(labels, max_labels):
+    """Return (positions, labels) showing at most ``max_labels`` labels."""
+    step = max(1, int(np.ceil(1.0 * len(labels) / max_labels)))
+    positions = list(range(0, len(labels), step))
+    return positions, [labels[i] for i in positions]
+
+
+def plot_batch(groups, ax=None, max_labels=100, grid_lines=True):
     """Plot a diagram of all groups and the elements they contain.
 
     The ``groups`` parameter is a dict {group_name: [elements in the group]}.
     The ax is a Matplotlib Ax object on which to plot. If none is provided a
     new ax will be created and returned at the end.
-    """
-    groups = OrderedDict(groups.items())
 
-    fail_table = _groups_fail_table(groups)
-    array = np.array(list(fail_table.values())).T[::-1]
-    lines, cols = len(array), len(array[0])
+    The heatmap is rasterized and the grid is drawn as a single collection of
+    lines, so that the plot remains light even with thousands of groups and
+    elements. When there are more than ``max_labels`` groups (or elements),
+    only every n-th label is shown. Set ``grid_lines`` to False to not draw
+    the white lines separating the cells.
+    """
+    elements, matrix = _groups_incidence_matrix(groups)
+    array = matrix.toarray()[::-1]
+    lines, cols = array.shape
 
     if ax is None:
         _, ax = plt.subplots(1)
-    ax.imshow(array, cmap="Purples")
-    ax.set_aspect("equal")
-    for y in range(lines):
-        ax.axhline(y + 0.5, c="white")
-    ax.set_yticks(range(lines))
-    for x in range(cols):
-        ax.axvline(x + 0.5, c="white")
-    ax.set_xticks(range(cols))
-    ax.set_xticklabels(list(fail_table.keys()), rotation=90)
-    ax.set_yticklabels(list(groups.keys())[::-1])
+    image = ax.imshow(array, cmap="Purples", interpolation="nearest")
+    image.set_rasterized(True)
+    if grid_lines:
+        segments = [[(-0.5, y + 0.5), (cols - 0.5, y + 0.5)] for y in range(lines)]
+        segments += [[(x + 0.5, -0.5), (x + 0.5, lines - 0.5)] for x in range(cols)]
+        linewidth = min(1.5, 150.0 / max(lines, cols))
+        ax.add_collection(
+            LineCollection(segments, colors="white", linewidths=linewidth)
+        )
+    xticks, xlabels = _thinned_ticks(elements, max_labels)
+    ax.set_xticks(xticks)
+    ax.set_xticklabels(xlabels, rotation=90)
+    yticks, ylabels = _thinned_ticks(list(groups.keys())[::-1], max_labels)
+    ax.set_yticks(yticks)
+    ax.set_yticklabels(ylabels)
     ax.set_xlim(-0.5, cols - 0.5)
     ax.set_ylim(-0.5, lines - 0.5)
     ax.set_aspect("equal")
     return ax
 
 
+def _batch_csv_lines(groups, group_naming):
+    """Yield the lines of the CSV file describing a groups batch."""
+    yield "%s,elements" % group_naming
+    for group, elements in groups.items():
+        yield "\n" + ",".join([group] + list(elements))
+
+
+def _batch_hash(groups, group_naming, plot_format):
+    """Return a hash of everything that determines a batch report's content."""
+    hasher = hashlib.sha1(("%s,%s\n" % (group_naming, plot_format)).encode())
+    for line in _batch_csv_lines(groups, group_naming):
+        hasher.update(line.encode())
+    return hasher.hexdigest()
+
+
+def _render_batch_plot(groups, group_naming, plot_format):
+    """Return the binary data of the plot of a groups batch.
+
+    This function doesn't use pyplot, so the figure is garbage-collected when
+    done, and the function can run in worker processes.
+    """
+    ax = Figure().add_subplot(111)
+    plot_batch(groups, ax=ax)
+    ax.set_title("Elements per %s" % group_naming)
+    data = BytesIO()
+    ax.figure.savefig(data, bbox_inches="tight", format=plot_format)
+    return data.getvalue()
+
+
+def _render_batch_plot_star(args):
+    return _render_batch_plot(*args)
+
+
+def _bounded_map(executor, function, jobs, max_pending):
+    """Yield the results of ``executor.map(function, jobs)`` in order, with at
+    most ``max_pending`` jobs submitted and not yet consumed, so that the
+    rendered plots waiting to be written never pile up in memory."""
+    pending = deque()
+    for job in jobs:
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+        pending.append(executor.submit(function, job))
+    while pending:
+        yield pending.popleft().result()
+
+
 def generate_batch_report(
     groups, target="@memory", group_naming="group", plot_format="pdf"
 ):
@@ -58,15 +131,143 @@ def generate_batch_report(
       Formal of the plot (pdf, png, jpeg, etc).
     """
     root = flametree.file_tree(target)
-    csv = ("%s,elements\n" % group_naming) + "\n".join(
-        [",".join([group] + list(elements)) for group, elements in groups.items()]
-    )
+    csv = "".join(_batch_csv_lines(groups, group_naming))
     root._file("%ss.csv" % group_naming).write(csv)
-    ax = plot_batch(groups)
-    ax.set_title("Elements per %s" % group_naming)
-    ax.figure.savefig(
-        root._file("%ss.%s" % (group_naming, plot_format)).open("wb"),
-        bbox_inches="tight",
-        format=plot_format,
-    )
+    plot_data = _render_batch_plot(groups, group_naming, plot_format)
+    root._file("%ss.%s" % (group_naming, plot_format)).write(plot_data, mode="wb")
     return root._close()
+
+
+def generate_batch_reports(
+    batches, target, group_naming="group", plot_format="pdf", processes=None
+):
+    """Generate the reports of many groups batches in a folder or zip file.
+
+    The plots are rendered in parallel in a pool of processes, and the CSV
+    files and plots are written one by one to the target, so that the whole
+    archive is never held in memory. A file ``batches_hashes.json`` at the
+    root of the target records a hash of each batch's content, and batches
+    whose content has not changed since the last run on the same target are
+    not rendered again.
+
+    Parameters
+    ----------
+    batches
+      A (ordered) dict {batch_name: groups} where each ``groups`` is a dict
+      {group_name: [elements in the group]}, e.g. returned by
+      ``design_test_batch``.
+
+    target
+      Path to a folder, or to a zip file (ending with ".zip"). Each batch's
+      report is written in a sub-folder named after the batch.
+
+    group_naming
+      Word that will replace "group" in the reports, e.g. "assembly", "team",
+      etc.
+
+    plot_format
+      Formal of the plots (pdf, png, jpeg, etc).
+
+    processes
+      Number of processes rendering the plots. Default (None) uses one process
+      per CPU, and 1 renders everything in the current process.
+
+    Returns
+    -------
+    {"rendered": [...], "unchanged": [...]}
+      The names of the batches which have been rendered, and of the batches
+      which were left untouched as their content has not changed.
+    """
+    csv_name = "%ss.csv" % group_naming
+    plot_name = "%ss.%s" % (group_naming, plot_format)
+    hashes = OrderedDict(
+        (str(name), _batch_hash(groups, group_naming, plot_format))
+        for name, groups in batches.items()
+    )
+    to_zip = target.lower().endswith(".zip")
+    previous_hashes = {}
+    if to_zip and os.path.exists(target):
+        with zipfile.ZipFile(target) as previous_archive:
+            archived_files = set(previous_archive.namelist())
+            if HASHES_FILE in archived_files:
+                previous_hashes = json.loads(previous_archive.read(HASHES_FILE))
+        previous_hashes = {
+            name: hash_
+            for name, hash_ in previous_hashes.items()
+            if all(
+                "%s/%s" % (name, filename) in archived_files
+                for filename in (csv_name, plot_name)
+            )
+        }
+    elif os.path.exists(os.path.join(target, HASHES_FILE)):
+        with open(os.path.join(target, HASHES_FILE), "r") as f:
+            previous_hashes = json.load(f)
+    if not to_zip:
+        previous_hashes = {
+            name: hash_
+            for name, hash_ in previous_hashes.items()
+            if all(
+                os.path.exists(os.path.join(target, name, filename))
+                for filename in (csv_name, plot_name)
+            )
+        }
+    unchanged = [
+        name for name, hash_ in hashes.items() if previous_hashes.get(name) == hash_
+    ]
+    unchanged_set = set(unchanged)
+    to_render = [
+        (str(name), groups)
+        for name, groups in batches.items()
+        if str(name) not in unchanged_set
+    ]
+    plot_jobs = ((groups, group_naming, plot_format) for _, groups in to_render)
+
+    def write_rendered_reports(open_file, plots):
+        for (name, groups), plot_data in zip(to_render, plots):
+            with open_file("%s/%s" % (name, csv_name), "wb") as f:
+                for line in _batch_csv_lines(groups, group_naming):
+                    f.write(line.encode())
+            with open_file("%s/%s" % (name, plot_name), "wb") as f:
+                f.write(plot_data)
+
+    def write_reports(open_file):
+        if processes == 1:
+            plots = map(_render_batch_plot_star, plot_jobs)
+            write_rendered_reports(open_file, plots)
+        else:
+            max_pending = 2 * (processes or os.cpu_count() or 1)
+            with ProcessPoolExecutor(processes) as executor:
+                plots = _bounded_map(
+                    executor, _render_batch_plot_star, plot_jobs, max_pending
+                )
+                write_rendered_reports(open_file, plots)
+        with open_file(HASHES_FILE, "wb") as f:
+            f.write(json.dumps(hashes, indent=2).encode())
+
+    if to_zip:
+        temp_target = target + ".part"
+        try:
+            with zipfile.ZipFile(temp_target, "w", zipfile.ZIP_DEFLATED) as archive:
+                if len(unchanged):
+                    with zipfile.ZipFile(target) as previous_archive:
+                        for name in unchanged:
+                            for filename in (csv_name, plot_name):
+                                path = "%s/%s" % (name, filename)
+                                with previous_archive.open(path) as source:
+                                    with archive.open(path, "w") as dest:
+                                        shutil.copyfileobj(source, dest)
+                write_reports(lambda path, mode: archive.open(path, "w"))
+            os.replace(temp_target, target)
+        finally:
+            if os.path.exists(temp_target):
+                os.remove(temp_target)
+    else:
+
+        def open_file(path, mode):
+            path = os.path.join(target, *path.split("/"))
+            if not os.path.exists(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            return open(path, mode)
+
+        write_reports(open_file)
+    return {"rendered": [name for name, _ in to_render], "unchanged": unchanged}
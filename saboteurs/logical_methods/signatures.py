@@ -0,0 +1,178 @@
+"""Failure signatures of saboteur hypotheses, as packed bit vectors.
+
+A hypothesis is a set of at most ``max_saboteurs`` elements assumed to be the
+saboteurs. Its signature has one bit per group, set if the group contains one
+of the elements of the hypothesis (i.e. if the group would fail). Signatures
+are stored as rows of a (hypotheses x groups/8) array of bytes, so that they
+can be compared with vectorised XOR and population counts.
+"""
+
+import itertools
+from collections import OrderedDict
+
+import numpy as np
+
+from .bitset_cover import POPCOUNT
+
+
+def elements_signatures(groups):
+    """Return the elements of the groups and their packed signatures.
+
+    Parameters
+    ----------
+    groups
+      A dict {group_name: [elements in that group]}.
+
+    Returns
+    -------
+    elements, signatures
+      ``elements`` lists the elements in order of first appearance, and
+      ``signatures[i]`` is the packed signature of the hypothesis "the i-th
+      element is the only saboteur".
+    """
+    element_ids = OrderedDict()
+    for group in groups.values():
+        for element in group:
+            element_ids.setdefault(element, len(element_ids))
+    incidence = np.zeros((len(element_ids), len(groups)), dtype=bool)
+    for j, group in enumerate(groups.values()):
+        incidence[[element_ids[element] for element in group], j] = True
+    return list(element_ids), np.packbits(incidence, axis=1)
+
+
+def hypotheses_signatures(groups, max_saboteurs):
+    """Return all hypotheses of at most ``max_saboteurs`` saboteurs and their
+    packed signatures.
+
+    Parameters
+    ----------
+    groups
+      A dict {group_name: [elements in that group]}.
+
+    max_saboteurs
+      The maximal number of saboteurs in a hypothesis.
+
+    Returns
+    -------
+    hypotheses, signatures
+      ``hypotheses`` is a list of tuples of elements (starting with the empty
+      hypothesis) and ``signatures[i]`` is the packed signature of the i-th
+      hypothesis.
+    """
+    elements, element_signatures = elements_signatures(groups)
+    hypotheses, signatures = [], []
+    for size in range(max_saboteurs + 1):
+        if size == 0:
+            indices = np.zeros((1, 0), dtype=np.int64)
+        else:
+            indices = np.fromiter(
+                itertools.chain.from_iterable(
+                    itertools.combinations(range(len(elements)), size)
+                ),
+                dtype=np.int64,
+            ).reshape(-1, size)
+        size_signatures = np.zeros(
+            (len(indices), element_signatures.shape[1]), dtype=np.uint8
+        )
+        for column in indices.T:
+            size_signatures |= element_signatures[column]
+        hypotheses += [tuple(elements[i] for i in row) for row in indices]
+        signatures.append(size_signatures)
+    return hypotheses, np.vstack(signatures)
+
+
+def minimum_separation(groups, max_saboteurs, chunk_size=256):
+    """Return the smallest number of groups separating two hypotheses.
+
+    Two hypotheses are separated by a group if the group fails under one
+    hypothesis but not under the other. If all pairs of hypotheses are
+    separated by at least ``2e + 1`` groups, the saboteurs can be identified
+    even when ``e`` group results are wrong. All pairs of hypotheses are
+    compared, by blocks of ``chunk_size`` x ``chunk_size`` pairs.
+
+    Parameters
+    ----------
+    groups
+      A dict {group_name: [elements in that group]}.
+
+    max_saboteurs
+      The maximal number of saboteurs in a hypothesis.
+
+    Returns
+    -------
+    separation, hypotheses_pair
+      The smallest number of separating groups, and a pair of hypotheses (as
+      tuples of elements) separated by this number of groups (None if there
+      are less than two hypotheses).
+    """
+    hypotheses, signatures = hypotheses_signatures(groups, max_saboteurs)
+    best, best_pair = len(groups) + 1, None
+    n_hypotheses = len(signatures)
+    for start in range(0, n_hypotheses, chunk_size):
+        chunk = signatures[start : start + chunk_size]
+        for other_start in range(start, n_hypotheses, chunk_size):
+            others = signatures[other_start : other_start + chunk_size]
+            distances = POPCOUNT[chunk[:, None, :] ^ others[None, :, :]].sum(
+                axis=2, dtype=np.int64
+            )
+            # Only compare each hypothesis with the hypotheses after it.
+            rows, columns = np.indices(distances.shape)
+            distances[other_start + columns <= start + rows] = len(groups) + 1
+            i, j = np.unravel_index(distances.argmin(), distances.shape)
+            if distances[i, j] < best:
+                best = distances[i, j]
+                best_pair = (hypotheses[start + i], hypotheses[other_start + j])
+    if best_pair is None:
+        return len(groups), None
+    return int(best), best_pair
+
+
+def verify_test_batch(groups, max_saboteurs=1, max_pairs=None):
+    """Find the saboteur hypotheses that a test batch cannot tell apart.
+
+    The signatures of all hypotheses of at most ``max_saboteurs`` saboteurs
+    are sorted (as byte strings) to find the hypotheses with the same
+    signature, i.e. which would make exactly the same groups fail.
+
+    Parameters
+    ----------
+    groups
+      A dict {group_name: [elements in that group]}, for instance a test
+      batch returned by ``design_test_batch``.
+
+    max_saboteurs
+      The maximum number of saboteurs among the elements.
+
+    max_pairs
+      Maximal number of pairs returned (None for all pairs).
+
+    Returns
+    -------
+    indistinguishable_pairs
+      A list [(hypothesis_1, hypothesis_2), ...] of the pairs of hypotheses
+      (tuples of elements) with the same signature. The test batch can
+      identify up to ``max_saboteurs`` saboteurs if and only if this list is
+      empty.
+    """
+    hypotheses, signatures = hypotheses_signatures(groups, max_saboteurs)
+    if signatures.shape[1] == 0:
+        return []
+    keys = np.ascontiguousarray(signatures).view(
+        np.dtype((np.void, signatures.shape[1]))
+    )[:, 0]
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    # Boundaries of the runs of identical signatures in the sorted keys.
+    starts = np.flatnonzero(
+        np.concatenate([[True], sorted_keys[1:] != sorted_keys[:-1], [True]])
+    )
+    pairs = []
+    for start, end in zip(starts[:-1], starts[1:]):
+        if end - start < 2:
+            continue
+        same_signature = sorted(order[start:end])
+        for i, j in itertools.combinations(same_signature, 2):
+            pairs.append((hypotheses[i], hypotheses[j]))
+            if (max_pairs is not None) and (len(pairs) >= max_pairs):
+                return pairs
+    return pairs
@@ -0,0 +1,226 @@
+"""Result objects of the saboteur-finding methods.
+
+Results behave like the (read-only) dicts previously returned, so that
+``result["saboteurs"]`` or ``result["groups_data"]`` still work, but they
+store their data in slots and arrays, and never copy the input data. Plain
+dicts and pandas dataframes are only built on demand, with ``to_dict()`` and
+``to_dataframe()``.
+"""
+
+from collections import OrderedDict
+from collections.abc import ItemsView, Mapping, ValuesView
+
+import numpy as np
+import pandas
+
+from .statistical_methods.deviations import top_outliers
+from .statistical_methods.incidence import MembersIncidence
+
+
+class _Result(Mapping):
+    """Read-only mapping {field: value} over the slots of a result. Fields
+    set to None are absent from the mapping."""
+
+    __slots__ = ()
+    _fields = ()
+
+    def __init__(self, **fields):
+        for field in self._fields:
+            setattr(self, field, fields.pop(field, None))
+        if fields:
+            raise TypeError("Unknown fields: %s" % ", ".join(fields))
+
+    def __getitem__(self, field):
+        value = getattr(self, field, None) if field in self._fields else None
+        if value is None:
+            raise KeyError(field)
+        return value
+
+    def __iter__(self):
+        return (f for f in self._fields if getattr(self, f) is not None)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return "%s(%s)" % (
+            self.__class__.__name__,
+            ", ".join("%s=%s" % (f, repr(self[f])) for f in self),
+        )
+
+    def to_dict(self):
+        """Return the result as a dict of plain Python objects."""
+        return {field: _to_plain(self[field]) for field in self}
+
+
+def _to_plain(value):
+    """Convert mappings (including views) to dicts, recursively."""
+    if isinstance(value, Mapping):
+        return OrderedDict((k, _to_plain(v)) for k, v in value.items())
+    return value
+
+
+class LogicalSaboteursResult(_Result):
+    """Result of ``find_logical_saboteurs``.
+
+    Fields ``saboteurs`` and ``suspicious`` are lists of elements.
+    """
+
+    __slots__ = ("saboteurs", "suspicious")
+    _fields = __slots__
+
+    def to_dataframe(self):
+        """Return a dataframe with columns ``element`` and ``status``
+        ("saboteur" or "suspicious")."""
+        return pandas.DataFrame(
+            {
+                "element": list(self.saboteurs) + list(self.suspicious),
+                "status": ["saboteur"] * len(self.saboteurs)
+                + ["suspicious"] * len(self.suspicious),
+            }
+        )
+
+
+class _GroupsItemsView(ItemsView):
+    """Items view of a ``GroupsStatistics``, enumerating the groups data
+    instead of looking up each group by name."""
+
+    __slots__ = ()
+
+    def __iter__(self):
+        groups = self._mapping
+        for i, (name, group_data) in enumerate(groups.groups_data.items()):
+            yield name, groups._group(i, group_data)
+
+
+class _GroupsValuesView(ValuesView):
+    """Values view of a ``GroupsStatistics`` (see ``_GroupsItemsView``)."""
+
+    __slots__ = ()
+
+    def __iter__(self):
+        for _, group_data in _GroupsItemsView(self._mapping):
+            yield group_data
+
+
+class GroupsStatistics(Mapping):
+    """Read-only view {group_name: group_data} of the groups data completed
+    with the failure rate and deviation of each group.
+
+    The groups data is not copied: each ``group_data`` dict is built on
+    access, from the original dict of the group (whose members list is
+    shared, not copied) and from the arrays of failure rates and deviations.
+
+    Parameters
+    ----------
+    groups_data
+      Result of ``csv_to_groups_data()``.
+
+    failure_rates, deviations, pvalues
+      Arrays with the failure rate, the deviation and the deviation p-value
+      (see ``groups_deviations``) of each group, in the order of
+      ``groups_data``.
+
+    incidence
+      The ``MembersIncidence`` of the groups data, if already computed (else
+      it is computed on the first access to the ``incidence`` attribute).
+    """
+
+    __slots__ = (
+        "groups_data",
+        "failure_rates",
+        "deviations",
+        "pvalues",
+        "_incidence",
+        "_indices",
+    )
+
+    def __init__(self, groups_data, failure_rates, deviations, pvalues, incidence=None):
+        self.groups_data = groups_data
+        self.failure_rates = np.asarray(failure_rates, dtype=float)
+        self.deviations = np.asarray(deviations, dtype=float)
+        self.pvalues = np.asarray(pvalues, dtype=float)
+        self._incidence = incidence
+        self._indices = None
+
+    @property
+    def incidence(self):
+        """The ``MembersIncidence`` of the groups data."""
+        if self._incidence is None:
+            self._incidence = MembersIncidence(self.groups_data)
+        return self._incidence
+
+    def _index(self, group_name):
+        if self._indices is None:
+            self._indices = {name: i for i, name in enumerate(self.groups_data)}
+        return self._indices[group_name]
+
+    def _group(self, index, group_data):
+        group_data = dict(group_data)
+        group_data["failure_rate"] = self.failure_rates[index]
+        group_data["deviation"] = self.deviations[index]
+        group_data["deviation_pvalue"] = self.pvalues[index]
+        return group_data
+
+    def __getitem__(self, group_name):
+        return self._group(self._index(group_name), self.groups_data[group_name])
+
+    def __iter__(self):
+        return iter(self.groups_data)
+
+    def __len__(self):
+        return len(self.groups_data)
+
+    def items(self):
+        return _GroupsItemsView(self)
+
+    def values(self):
+        return _GroupsValuesView(self)
+
+    def outliers(self, n_outliers=10):
+        """Return the names of the ``n_outliers`` groups whose failures are
+        the least likely given their members, by increasing p-value."""
+        names = list(self.groups_data)
+        return [names[i] for i in top_outliers(self.pvalues, n_outliers)]
+
+    def to_dataframe(self):
+        """Return a dataframe with one row per group."""
+        return pandas.DataFrame(
+            {
+                "attempts": [d["attempts"] for d in self.groups_data.values()],
+                "failures": [d["failures"] for d in self.groups_data.values()],
+                "failure_rate": self.failure_rates,
+                "deviation": self.deviations,
+                "deviation_pvalue": self.pvalues,
+            },
+            index=list(self.groups_data),
+        )
+
+
+class StatisticalSaboteursResult(_Result):
+    """Result of ``find_statistical_saboteurs``.
+
+    Fields are ``groups_data`` (the input groups data, or a
+    ``GroupsStatistics`` view of it with failure rates and deviations),
+    ``conserved_members``, ``varying_members``, ``significant_members``
+    (OrderedDict {member: {'pvalue':..., 'effect':..., 'twins':...}}) and,
+    depending on the analysis, ``f1_score``, ``f1_score_interval`` and
+    ``selected_members``.
+    """
+
+    __slots__ = (
+        "groups_data",
+        "conserved_members",
+        "varying_members",
+        "significant_members",
+        "f1_score",
+        "f1_score_interval",
+        "selected_members",
+    )
+    _fields = __slots__
+
+    def to_dataframe(self):
+        """Return a dataframe with one row per significant member."""
+        return pandas.DataFrame.from_dict(
+            self.significant_members, orient="index"
+        ).rename_axis("member")
@@ -1,2 +1,9 @@
 from .statistical_methods import find_statistical_saboteurs
+from .lasso import weighted_lasso_path
+from .bootstrap import bootstrap_intervals
+from .deviations import groups_deviations, top_outliers
+from .summaries import GroupsDataSummary, merge_summaries
+from .incidence import MembersIncidence
+from .bayesian import find_bayesian_saboteurs
+from .interactions import find_interacting_saboteurs
 from .reports import statistics_report
@@ -0,0 +1,251 @@
+"""Posterior probabilities of the members being saboteurs (noisy-OR model).
+
+Each member is a saboteur with probability ``prior``. An attempt of a group
+fails with probability ``1 - (1 - b) * (1 - s)**c`` where ``c`` is the number
+of saboteurs in the group, ``s`` the probability that a saboteur makes an
+attempt fail, and ``b`` the background failure rate. The number of failures of
+a group is binomial given its number of attempts.
+
+The posterior is computed either by Gibbs sampling, with all the chains of a
+process updated at once and the chains distributed over processes, or with a
+mean-field variational approximation where all members are updated at once.
+Both only use the sparse (groups x members) incidence matrix and the counts
+of saboteurs per group.
+"""
+
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy.special import expit, logit
+
+from .incidence import MembersIncidence
+
+
+def _groups_arrays(groups_data):
+    """Return the varying members, the sparse (groups x members) incidence
+    matrix, and the arrays of attempts and failures of the groups.
+
+    Members in all groups are left out: their effect can't be told apart
+    from the background failure rate (and they would create modes of the
+    posterior in which the Gibbs chains get stuck).
+    """
+    incidence = MembersIncidence(groups_data)
+    matrix = incidence.matrix.astype(np.int64)
+    varying = np.flatnonzero(incidence.groups_counts() < len(groups_data))
+    members = [incidence.members[i] for i in varying]
+    attempts = np.array([int(d["attempts"]) for d in groups_data.values()])
+    failures = np.array([int(d["failures"]) for d in groups_data.values()])
+    return members, matrix[:, varying], attempts, failures
+
+
+def _log_failure_probabilities(max_count, background_rate, saboteur_rate):
+    """Return log P(fail) and log P(success) of an attempt, for each number of
+    saboteurs in the group from 0 to ``max_count``."""
+    counts = np.arange(max_count + 1)
+    log_success = np.log1p(-background_rate) + counts * np.log1p(-saboteur_rate)
+    log_failure = np.log(-np.expm1(log_success))
+    return log_failure, log_success
+
+
+def _gibbs_chains(parameters):
+    """Run Gibbs sampling chains and return the mean of the samples of each
+    chain (a chains x members array).
+
+    The chains are updated together, as arrays, but each chain draws its
+    random numbers from its own seed, so a chain gives the same samples
+    whichever other chains it is run with.
+    """
+    (
+        matrix,
+        attempts,
+        failures,
+        prior,
+        background_rate,
+        saboteur_rate,
+        n_samples,
+        burn_in,
+        seeds,
+    ) = parameters
+    rngs = [np.random.default_rng(seed) for seed in seeds]
+    n_chains = len(rngs)
+    n_groups, n_members = matrix.shape
+    max_count = int(np.asarray(matrix.sum(axis=1)).max()) + 1
+    log_failure, log_success = _log_failure_probabilities(
+        max_count, background_rate, saboteur_rate
+    )
+    # Change of the log-likelihood of a failure when adding a saboteur.
+    failure_gain = log_failure[1:] - log_failure[:-1]
+    success_gain = np.log1p(-saboteur_rate)
+    members_groups = [
+        matrix.indices[matrix.indptr[m] : matrix.indptr[m + 1]]
+        for m in range(n_members)
+    ]
+    constants = logit(prior) + success_gain * np.array(
+        [(attempts[g] - failures[g]).sum() for g in members_groups]
+    )
+    states = np.array([rng.random(n_members) for rng in rngs]) < prior
+    counts = (matrix @ states.T.astype(np.int64)).T
+    totals = np.zeros((n_chains, n_members))
+    for sweep in range(burn_in + n_samples):
+        uniforms = np.array([rng.random(n_members) for rng in rngs]).T
+        for m in range(n_members):
+            groups = members_groups[m]
+            # Numbers of saboteurs in the groups of m, without m.
+            others = counts[:, groups] - states[:, m : m + 1]
+            log_odds = constants[m] + failure_gain[others] @ failures[groups]
+            new_state = uniforms[m] < expit(log_odds)
+            changed = new_state != states[:, m]
+            if changed.any():
+                counts[:, groups] += (new_state.astype(np.int64) - states[:, m])[
+                    :, None
+                ]
+                states[:, m] = new_state
+        if sweep >= burn_in:
+            totals += states
+    return totals / n_samples
+
+
+def _mean_field(
+    matrix, attempts, failures, prior, background_rate, saboteur_rate, max_iter, tol
+):
+    """Return the mean-field approximation of the posterior probabilities.
+
+    For each group, the expected probability that an attempt succeeds is
+    approximated by ``(1 - b) * prod(1 - q_m * s)`` over its members, and all
+    probabilities ``q_m`` are updated at once (with damping) until they
+    change by less than ``tol``.
+    """
+    matrix = matrix.tocoo()
+    groups, members = matrix.row, matrix.col
+    n_members = matrix.shape[1]
+    log_keep = np.log1p(-saboteur_rate)
+    constants = logit(prior) + log_keep * np.bincount(
+        members, weights=(attempts - failures)[groups], minlength=n_members
+    )
+    probabilities = np.full(n_members, prior)
+    for _ in range(max_iter):
+        # Log of the expected success probability of each group, then of the
+        # (group, member) pairs without the member, and with the member.
+        log_factors = np.log1p(-probabilities * saboteur_rate)
+        group_logs = np.log1p(-background_rate) + np.bincount(
+            groups, weights=log_factors[members], minlength=matrix.shape[0]
+        )
+        log_without = group_logs[groups] - log_factors[members]
+        failure_without = np.log(-np.expm1(log_without))
+        failure_with = np.log(-np.expm1(log_without + log_keep))
+        log_odds = constants + np.bincount(
+            members,
+            weights=failures[groups] * (failure_with - failure_without),
+            minlength=n_members,
+        )
+        new_probabilities = 0.5 * probabilities + 0.5 * expit(log_odds)
+        change = np.abs(new_probabilities - probabilities).max()
+        probabilities = new_probabilities
+        if change < tol:
+            break
+    return probabilities
+
+
+def find_bayesian_saboteurs(
+    groups_data,
+    method="variational",
+    prior=0.05,
+    saboteur_failure_rate=0.8,
+    background_failure_rate=None,
+    n_chains=4,
+    n_samples=1000,
+    burn_in=200,
+    processes=1,
+    seed=0,
+    max_iter=500,
+    tol=1e-6,
+):
+    """Return the posterior probability that each member is a saboteur.
+
+    Parameters
+    ----------
+    groups_data
+      Result of ``csv_to_groups_data()``.
+
+    method
+      Either "variational" (fast mean-field approximation) or "gibbs" (Gibbs
+      sampling, slower but exact in the limit of many samples).
+
+    prior
+      Prior probability that a member is a saboteur.
+
+    saboteur_failure_rate
+      Probability that a saboteur makes an attempt of its group fail.
+
+    background_failure_rate
+      Probability that an attempt fails without any saboteur. By default,
+      the lowest failure rate of the groups (between 0.01 and 0.5).
+
+    n_chains
+      Number of Gibbs sampling chains.
+
+    n_samples
+      Number of samples of each chain, after the burn-in.
+
+    burn_in
+      Number of initial samples of each chain which are discarded.
+
+    processes
+      Number of processes among which the chains are distributed (the chains
+      of a process are updated together, as arrays).
+
+    seed
+      Seed of the random numbers. Each chain gets an independent stream
+      spawned from this seed, so results are reproducible and don't depend
+      on ``processes``.
+
+    max_iter, tol
+      Maximal number of iterations, and tolerance on the change of the
+      probabilities, of the variational method.
+
+    Returns
+    -------
+    {'posteriors': {...}, 'background_failure_rate': b, 'chains_posteriors': ...}
+      Where ``posteriors`` is an OrderedDict {member: probability} sorted by
+      decreasing probability, for all members except those present in every
+      group (whose effect can't be told apart from the background). With the
+      "gibbs" method, ``chains_posteriors`` is a (chains x members) array of
+      the estimates of each chain, in the order of first appearance of the
+      members, whose spread indicates whether the chains have converged.
+    """
+    members, matrix, attempts, failures = _groups_arrays(groups_data)
+    if background_failure_rate is None:
+        rates = failures / np.maximum(attempts, 1)
+        background_failure_rate = float(np.clip(rates.min(), 0.01, 0.5))
+    model = (prior, background_failure_rate, saboteur_failure_rate)
+    result = {"background_failure_rate": background_failure_rate}
+    if method == "variational":
+        probabilities = _mean_field(
+            matrix, attempts, failures, *model, max_iter=max_iter, tol=tol
+        )
+    elif method == "gibbs":
+        n_jobs = max(1, min(processes or 1, n_chains))
+        seeds = np.random.SeedSequence(seed).spawn(n_chains)
+        chains = np.array_split(np.arange(n_chains), n_jobs)
+        jobs = [
+            (matrix, attempts, failures)
+            + model
+            + (n_samples, burn_in, [seeds[i] for i in job_chains])
+            for job_chains in chains
+        ]
+        if n_jobs == 1:
+            results = list(map(_gibbs_chains, jobs))
+        else:
+            with ProcessPoolExecutor(n_jobs) as executor:
+                results = list(executor.map(_gibbs_chains, jobs))
+        chains_posteriors = np.vstack(results)
+        probabilities = chains_posteriors.mean(axis=0)
+        result["chains_posteriors"] = chains_posteriors
+    else:
+        raise ValueError("Unknown method: %s" % method)
+    order = np.argsort(-probabilities, kind="stable")
+    result["posteriors"] = OrderedDict(
+        (members[i], float(probabilities[i])) for i in order
+    )
+    return result
@@ -0,0 +1,56 @@
+"""Deviations of the groups from the failure rates predicted by the members.
+
+Groups failing much more often than predicted by their members (the
+"Mystery" column of the reports) may contain saboteurs which were not
+identified. All groups are scored at once from arrays of attempts, failures
+and predicted failure rates.
+"""
+
+import numpy as np
+from scipy.stats import binom
+
+
+def groups_deviations(attempts, failures, predictions, baseline_rate):
+    """Return the deviations and tail p-values of the failures of the groups.
+
+    Parameters
+    ----------
+    attempts, failures
+      Arrays of the numbers of attempts and failures of the groups.
+
+    predictions
+      Array of the failure rates predicted for the groups.
+
+    baseline_rate
+      Failure rate giving the standard deviation of the failure rate of a
+      group (clipped between 0.1 and 0.9), e.g. the intercept of the model.
+
+    Returns
+    -------
+    deviations, pvalues
+      ``deviations`` are the differences between the observed and predicted
+      failure rates, in standard deviations of a binomial at the baseline rate
+      (rounded to 0.1). ``pvalues`` are the exact binomial probabilities of
+      observing at least as many failures as in each group, at its predicted
+      rate.
+    """
+    attempts = np.asarray(attempts, dtype=float)
+    failures = np.asarray(failures, dtype=float)
+    predictions = np.asarray(predictions, dtype=float)
+    baseline_rate = min(0.9, max(0.1, baseline_rate))
+    std = binom.std(attempts, baseline_rate) / attempts
+    deviations = np.round((failures / attempts - predictions) / std, decimals=1)
+    rates = np.clip(predictions, 1e-9, 1 - 1e-9)
+    pvalues = binom.sf(failures - 1, attempts, rates)
+    return deviations, pvalues
+
+
+def top_outliers(pvalues, n_outliers=10):
+    """Return the indices of the groups with the lowest p-values, sorted by
+    increasing p-value (selected in linear time, then sorted)."""
+    pvalues = np.asarray(pvalues, dtype=float)
+    n_outliers = min(n_outliers, len(pvalues))
+    if n_outliers == 0:
+        return np.zeros(0, dtype=np.int64)
+    selected = np.argpartition(pvalues, n_outliers - 1)[:n_outliers]
+    return selected[np.argsort(pvalues[selected], kind="stable")]
@@ -0,0 +1,63 @@
+"""Sparse (groups x members) incidence matrix of groups data.
+
+The incidence is computed in one pass over the members lists of the groups.
+The analyses then slice the columns of the members they need from it, and
+the reports reuse it, instead of testing ``member in group_data["members"]``
+for every member and group at each stage.
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+from scipy import sparse
+
+
+class MembersIncidence:
+    """Sparse (groups x members) incidence matrix of groups data.
+
+    Parameters
+    ----------
+    groups_data
+      Result of ``csv_to_groups_data()``.
+
+    Attributes
+    ----------
+    members
+      List of the members, in order of first appearance in the groups.
+
+    matrix
+      Boolean sparse CSC matrix where ``matrix[i, j]`` is True if the j-th
+      member is in the i-th group.
+    """
+
+    __slots__ = ("members", "matrix", "_member_ids")
+
+    def __init__(self, groups_data):
+        member_ids = OrderedDict()
+        rows, columns = [], []
+        for i, group_data in enumerate(groups_data.values()):
+            for member in OrderedDict.fromkeys(group_data["members"]):
+                rows.append(i)
+                columns.append(member_ids.setdefault(member, len(member_ids)))
+        self.members = list(member_ids)
+        self.matrix = sparse.csc_matrix(
+            (np.ones(len(rows), dtype=bool), (rows, columns)),
+            shape=(len(groups_data), len(member_ids)),
+        )
+        self._member_ids = member_ids
+
+    def __repr__(self):
+        return "MembersIncidence(%d groups, %d members)" % self.matrix.shape
+
+    def member_indices(self, members):
+        """Return the array of the column indices of the members."""
+        return np.array([self._member_ids[m] for m in members], dtype=np.int64)
+
+    def groups_counts(self):
+        """Return the array of the number of groups containing each member."""
+        return np.diff(self.matrix.indptr)
+
+    def columns(self, members, dtype=float):
+        """Return the dense (groups x members) array of the given members."""
+        ids = self.member_indices(members)
+        return self.matrix[:, ids].toarray().astype(dtype)
@@ -0,0 +1,129 @@
+"""Detection of pairs of members which fail only when they occur together.
+
+Only the pairs of members which co-occur in some groups are considered, and
+their statistics are computed with products of the sparse (groups x members)
+incidence matrix, so the cost depends on the number of co-occurring pairs
+rather than on the square of the number of members.
+"""
+
+import numpy as np
+from scipy import sparse
+from scipy.stats import binom
+
+from .incidence import MembersIncidence
+
+
+def find_interacting_saboteurs(
+    groups_data,
+    pvalue_threshold=0.05,
+    min_cooccurrences=2,
+    min_failures=2,
+    chunk_size=10000,
+):
+    """Find pairs of members which cause failures when they occur together.
+
+    For each pair of members (a, b), the failure rate of the groups with both
+    members is compared to the failure rate of the groups with only one of
+    them (the highest of the two rates is used). The p-value is the
+    probability of observing at least as many failures in the groups with
+    both members if they failed at this baseline rate (binomial tail). These
+    p-values are not corrected for the number of pairs tested.
+
+    Parameters
+    ----------
+    groups_data
+      Result of ``csv_to_groups_data()``.
+
+    pvalue_threshold
+      Only pairs with a p-value below this threshold are returned.
+
+    min_cooccurrences
+      Pairs of members found together in less groups than this are ignored.
+
+    min_failures
+      Pairs of members with less failures when together than this are
+      ignored. The number of failures of a pair is at most the number of
+      failures of each member, so the members with less failures are
+      discarded before pairs are enumerated.
+
+    chunk_size
+      Number of pairs whose failures are counted in one matrix product.
+
+    Returns
+    -------
+    significant_pairs
+      A list of dicts, one per pair, sorted by increasing p-value, with keys
+      ``members`` (the pair of members), ``pvalue``, ``attempts`` and
+      ``failures`` (in the groups with both members), ``failure_rate`` and
+      ``baseline_rate`` (the failure rate of the groups with only one member).
+    """
+    incidence = MembersIncidence(groups_data)
+    members, matrix = incidence.members, incidence.matrix.astype(float)
+    attempts = np.array([d["attempts"] for d in groups_data.values()], dtype=float)
+    failures = np.array([d["failures"] for d in groups_data.values()], dtype=float)
+    n_groups_with = np.asarray(matrix.sum(axis=0)).ravel()
+    member_attempts = matrix.T @ attempts
+    member_failures = matrix.T @ failures
+    # Members in all groups can't be distinguished from the other members.
+    kept = (member_failures >= min_failures) & (n_groups_with < len(groups_data))
+    kept_ids = np.flatnonzero(kept)
+    matrix = matrix[:, kept_ids]
+
+    # Co-occurring pairs (upper triangle of the co-occurrence matrix).
+    cooccurrences = sparse.triu(matrix.T @ matrix, k=1).tocoo()
+    pairs_mask = cooccurrences.data >= min_cooccurrences
+    a = cooccurrences.row[pairs_mask]
+    b = cooccurrences.col[pairs_mask]
+    if len(a) == 0:
+        return []
+    pairs_attempts = np.asarray(
+        (matrix.T @ sparse.diags(attempts) @ matrix)[a, b]
+    ).ravel()
+    ids_a, ids_b = kept_ids[a], kept_ids[b]
+    upper_bound = np.minimum(member_failures[ids_a], member_failures[ids_b])
+    upper_bound = np.minimum(upper_bound, pairs_attempts)
+    bound_mask = upper_bound >= min_failures
+    a, b, ids_a, ids_b = (
+        a[bound_mask],
+        b[bound_mask],
+        ids_a[bound_mask],
+        ids_b[bound_mask],
+    )
+    pairs_attempts = pairs_attempts[bound_mask]
+
+    pairs_failures = np.zeros(len(a))
+    for start in range(0, len(a), chunk_size):
+        end = start + chunk_size
+        both = matrix[:, a[start:end]].multiply(matrix[:, b[start:end]])
+        pairs_failures[start:end] = both.T @ failures
+
+    # Failure rates of the groups with only one of the two members.
+    a_only_attempts = member_attempts[ids_a] - pairs_attempts
+    b_only_attempts = member_attempts[ids_b] - pairs_attempts
+    with np.errstate(divide="ignore", invalid="ignore"):
+        a_only_rate = (member_failures[ids_a] - pairs_failures) / a_only_attempts
+        b_only_rate = (member_failures[ids_b] - pairs_failures) / b_only_attempts
+        pairs_rate = pairs_failures / pairs_attempts
+    # Pairs never seen apart can't be told from single saboteurs.
+    separable = (a_only_attempts > 0) & (b_only_attempts > 0)
+    baseline = np.fmax(a_only_rate, b_only_rate)
+    candidates = separable & (pairs_failures >= min_failures) & (pairs_rate > baseline)
+    pvalues = np.ones(len(a))
+    pvalues[candidates] = binom.sf(
+        pairs_failures[candidates] - 1,
+        pairs_attempts[candidates].astype(int),
+        baseline[candidates],
+    )
+    significant = np.flatnonzero(candidates & (pvalues < pvalue_threshold))
+    significant = significant[np.argsort(pvalues[significant], kind="stable")]
+    return [
+        {
+            "members": (members[ids_a[i]], members[ids_b[i]]),
+            "pvalue": pvalues[i],
+            "attempts": int(pairs_attempts[i]),
+            "failures": int(pairs_failures[i]),
+            "failure_rate": pairs_rate[i],
+            "baseline_rate": baseline[i],
+        }
+        for i in significant
+    ]
@@ -0,0 +1,247 @@
+"""Weighted LASSO / elastic-net path with screening rules.
+
+The model is fitted on one row per group, weighted by the number of attempts
+of the group, which gives the same coefficients as a least-squares fit on one
+row per attempt, without creating these rows. The objective, for a
+regularization ``alpha``, is::
+
+    sum(w * (y - X.b - b0)**2) / (2 * sum(w))
+    + alpha * (l1_ratio * |b|_1 + (1 - l1_ratio) / 2 * |b|_2**2)
+
+The path is computed from the largest ``alpha`` (where all coefficients are
+zero) downwards, each fit starting from the previous solution (warm start).
+Before each fit, the SAFE rule discards the features which are certainly zero
+(for the LASSO only, as its bound doesn't hold with an L2 penalty), and the
+sequential strong rule discards most of the others. Coordinate descent then
+runs on the remaining features only, and the features which violate the
+optimality conditions are added back before the fit is accepted.
+"""
+
+from math import sqrt
+
+import numpy as np
+
+
+def _center(X, y, sample_weight):
+    weights = sample_weight / sample_weight.sum()
+    X_mean = weights @ X
+    y_mean = weights @ y
+    sqrt_weights = np.sqrt(sample_weight)[:, None]
+    return (
+        sqrt_weights * (X - X_mean),
+        sqrt_weights[:, 0] * (y - y_mean),
+        X_mean,
+        y_mean,
+    )
+
+
+def _coordinate_descent_sweep(X, residuals, coef, features, l1, l2, norms):
+    """Update each coefficient once, in place, and return the largest change
+    (in units of y)."""
+    max_change = 0.0
+    for j in features.tolist():
+        norm = norms[j]
+        if norm == 0:
+            continue
+        column = X[:, j]
+        old = coef.item(j)
+        rho = float(column @ residuals) + norm * old
+        if rho > l1:
+            new = (rho - l1) / (norm + l2)
+        elif rho < -l1:
+            new = (rho + l1) / (norm + l2)
+        else:
+            new = 0.0
+        if new != old:
+            residuals -= (new - old) * column
+            coef[j] = new
+            change = abs(new - old) * sqrt(norm)
+            if change > max_change:
+                max_change = change
+    return max_change
+
+
+def _coordinate_descent(X, residuals, coef, features, l1, l2, norms, tol, max_iter):
+    """Minimize the objective over the given features, in place.
+
+    ``X`` is the centered and weighted data divided by sqrt(sum(w)) (so that
+    ``X.T @ residuals`` gives correlations), ``norms`` are the squared norms
+    of its columns (as a list), and ``residuals`` is kept equal to
+    ``y - X @ coef``. After
+    each sweep over all features, the non-zero coefficients only are updated
+    until convergence, as most features stay at zero.
+    """
+    for _ in range(max_iter):
+        max_change = _coordinate_descent_sweep(
+            X, residuals, coef, features, l1, l2, norms
+        )
+        if max_change < tol:
+            break
+        active = features[coef[features] != 0]
+        for _ in range(max_iter):
+            if (
+                _coordinate_descent_sweep(X, residuals, coef, active, l1, l2, norms)
+                < tol
+            ):
+                break
+
+
+def weighted_lasso_path(
+    X,
+    y,
+    sample_weight=None,
+    l1_ratio=1.0,
+    n_alphas=50,
+    eps=1e-3,
+    tol=1e-4,
+    max_iter=1000,
+):
+    """Compute the coefficients of a weighted elastic-net along a path.
+
+    Parameters
+    ----------
+    X
+      A (samples x features) array.
+
+    y
+      An array of the observed values (e.g. the failure rates of the groups).
+
+    sample_weight
+      The weight of each sample (e.g. the number of attempts of each group).
+
+    l1_ratio
+      Proportion of L1 regularization (1 for the LASSO).
+
+    n_alphas
+      Number of regularization values in the path.
+
+    eps
+      Ratio between the smallest and the largest regularization values.
+
+    tol
+      Coordinate descent stops when no coefficient changes the predictions by
+      more than ``tol`` times the norm of the (centered, weighted) y.
+
+    max_iter
+      Maximal number of coordinate descent sweeps per fit.
+
+    Returns
+    -------
+    alphas, coefs, intercepts, n_screened
+      The decreasing regularization values, a (alphas x features) array of
+      coefficients, the intercepts, and for each alpha the number of
+      features on which coordinate descent was run. The path stops early
+      if there are as many non-zero coefficients as samples, or if the
+      residuals decrease by less than 1e-5 of their initial value.
+    """
+    X = np.asarray(X, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n_samples, n_features = X.shape
+    if sample_weight is None:
+        sample_weight = np.ones(n_samples)
+    sample_weight = np.asarray(sample_weight, dtype=float)
+    Xc, yc, X_mean, y_mean = _center(X, y, sample_weight)
+    scale = np.sqrt(sample_weight.sum())
+    Xc, yc = np.asfortranarray(Xc / scale), yc / scale
+    norms = (Xc**2).sum(axis=0)
+    norms_list = norms.tolist()
+    correlations = np.abs(Xc.T @ yc)
+    alpha_max = correlations.max() / max(l1_ratio, 1e-3)
+    if alpha_max == 0:
+        alphas = np.zeros(1)
+    else:
+        alphas = alpha_max * np.logspace(0, np.log10(eps), n_alphas)
+    y_norm = np.sqrt(yc @ yc)
+
+    coef = np.zeros(n_features)
+    residuals = yc.copy()
+    coefs, n_screened = [], []
+    previous_alpha = alpha_max
+    previous_rss = yc @ yc
+    for alpha in alphas:
+        l1, l2 = alpha * l1_ratio, alpha * (1 - l1_ratio)
+        # SAFE rule: these features have a zero coefficient at this alpha.
+        if l1_ratio == 1:
+            safe_bound = l1 - np.sqrt(norms) * y_norm * (alpha_max - alpha) / max(
+                alpha_max, 1e-300
+            )
+            not_safe = correlations >= safe_bound
+        else:
+            not_safe = np.ones(n_features, dtype=bool)
+        # Sequential strong rule, from the correlations at the previous alpha.
+        current = np.abs(Xc.T @ residuals)
+        strong = current >= l1_ratio * (2 * alpha - previous_alpha)
+        features = np.flatnonzero(not_safe & (strong | (coef != 0)))
+        while True:
+            _coordinate_descent(
+                Xc,
+                residuals,
+                coef,
+                features,
+                l1,
+                l2,
+                norms_list,
+                tol * y_norm,
+                max_iter,
+            )
+            # Optimality conditions for all the features left out of the fit.
+            current = np.abs(Xc.T @ residuals)
+            violations = (current > l1 * (1 + 1e-6)) & (coef == 0)
+            violations[features] = False
+            if not violations.any():
+                break
+            features = np.union1d(features, np.flatnonzero(violations))
+        coefs.append(coef.copy())
+        n_screened.append(len(features))
+        previous_alpha = alpha
+        # As in glmnet, the path stops when the model is saturated or when
+        # decreasing alpha barely improves the fit anymore.
+        rss = residuals @ residuals
+        n_nonzero = (coef != 0).sum()
+        converged = (len(coefs) >= 5) and (previous_rss - rss < 1e-5 * (yc @ yc))
+        if (n_nonzero >= n_samples - 1) or converged:
+            break
+        previous_rss = rss
+    alphas = alphas[: len(coefs)]
+    coefs = np.array(coefs)
+    intercepts = y_mean - coefs @ X_mean
+    return alphas, coefs, intercepts, np.array(n_screened)
+
+
+def weighted_lasso_fit(X, y, sample_weight=None, extra_rss=0.0, **path_parameters):
+    """Fit a weighted elastic-net, with the regularization selected by BIC.
+
+    Parameters
+    ----------
+    X, y, sample_weight
+      As in ``weighted_lasso_path``. The BIC is computed as if each sample was
+      repeated ``sample_weight`` times.
+
+    extra_rss
+      Residual sum of squares which no model can explain, added to the
+      residuals of each fit (e.g. the within-group variance of 0/1 outcomes
+      when ``y`` is the failure rate of each group).
+
+    **path_parameters
+      Other parameters of ``weighted_lasso_path``.
+
+    Returns
+    -------
+    coef, intercept, alpha
+      The sparse coefficients, the intercept and the selected regularization.
+    """
+    X = np.asarray(X, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if sample_weight is None:
+        sample_weight = np.ones(len(y))
+    sample_weight = np.asarray(sample_weight, dtype=float)
+    alphas, coefs, intercepts, _ = weighted_lasso_path(
+        X, y, sample_weight=sample_weight, **path_parameters
+    )
+    n = sample_weight.sum()
+    predictions = X @ coefs.T + intercepts
+    rss = sample_weight @ (y[:, None] - predictions) ** 2 + extra_rss
+    degrees_of_freedom = (coefs != 0).sum(axis=1)
+    bic = n * np.log(np.maximum(rss, 1e-300) / n) + degrees_of_freedom * np.log(n)
+    best = int(np.argmin(bic))
+    return coefs[best], intercepts[best], alphas[best]
@@ -7,6 +7,7 @@ import numpy as np
 from pdf_reports import pug_to_html, write_report
 
 from ..version import __version__
+from ..results import GroupsStatistics
 
 THIS_PATH = os.path.dirname(os.path.realpath(__file__))
 STYLESHEET = os.path.join(THIS_PATH, "assets", "report_style.css")
@@ -25,36 +26,39 @@ def saboteurs_pug_to_html(**context):
 
 
 def make_groups_table(analysis_results):
-    """Return a Pandas dataframe indicating which elements belong to each group.
-    """
-    return pandas.DataFrame.from_records(
+    """Return a Pandas dataframe indicating which elements belong to each group."""
+    groups = analysis_results["groups_data"]
+    if not isinstance(groups, GroupsStatistics):
+        # Results given as plain dicts, e.g. from ``result.to_dict()``.
+        groups = GroupsStatistics(
+            groups,
+            [group_data["failure_rate"] for group_data in groups.values()],
+            [group_data["deviation"] for group_data in groups.values()],
+            [
+                group_data.get("deviation_pvalue", np.nan)
+                for group_data in groups.values()
+            ],
+        )
+    deviations = groups.deviations
+    mysteries = np.full(len(deviations), "nan", dtype=object)
+    defined = ~np.isnan(deviations)
+    stars = np.maximum(0, deviations[defined].astype(int))
+    mysteries[defined] = [n_stars * "*" for n_stars in stars.tolist()]
+    members = list(analysis_results["significant_members"])
+    checks = np.where(groups.incidence.columns(members, dtype=bool), "✔", "")
+    table = OrderedDict(
         [
-            OrderedDict(
-                [
-                    ("Group", group),
-                    ("Failure Rate (%)", int(100 * group_data["failure_rate"])),
-                ]
-                + [
-                    (member, "✔" * (member in group_data["members"]))
-                    for member in analysis_results["significant_members"]
-                ]
-                + [
-                    (
-                        "Mystery",
-                        "nan"
-                        if (str(group_data["deviation"]) == "nan")
-                        else "*" * abs(max(0, int(group_data["deviation"]))),
-                    )
-                ]
-            )
-            for (group, group_data) in analysis_results["groups_data"].items()
+            ("Group", list(groups)),
+            ("Failure Rate (%)", (100 * groups.failure_rates).astype(int)),
         ]
-    ).sort_values("Failure Rate (%)", ascending=False)
+        + [(member, checks[:, i]) for i, member in enumerate(members)]
+        + [("Mystery", mysteries)]
+    )
+    return pandas.DataFrame(table).sort_values("Failure Rate (%)", ascending=False)
 
 
 def make_members_table(analysis_results):
-    """Return a Pandas dataframe with significance/impact of the main elements.
-    """
+    """Return a Pandas dataframe with significance/impact of the main elements."""
     return pandas.DataFrame.from_records(
         [
             OrderedDict(
@@ -1,34 +1,45 @@
-from scipy.stats import binom
 from collections import OrderedDict
 from sklearn import linear_model, metrics
 from sklearn.feature_selection import SelectFpr, f_classif
+from scipy.stats import f as f_distribution
 import numpy as np
-from copy import deepcopy
-
-
-def _find_twins(groups_data, almost_twins_threshold=0.8):
-    groups_members_list = [data["members"] for data in groups_data.values()]
-    all_members = set([member for l in groups_members_list for member in l])
-    profiles = {
-        member: [member in parts_list for parts_list in groups_members_list]
-        for member in all_members
-    }
-    profiles = {
-        member: profile
-        for member, profile in profiles.items()
-        if min(profile) != max(profile)
-    }
-    all_members = sorted(set(profiles.keys()))
+from .lasso import weighted_lasso_fit
+from .bootstrap import bootstrap_intervals
+from .deviations import groups_deviations
+from .incidence import MembersIncidence
+from ..results import GroupsStatistics, StatisticalSaboteursResult
+
+
+def _find_twins(groups_data, almost_twins_threshold=0.8, incidence=None):
+    if incidence is None:
+        incidence = MembersIncidence(groups_data)
+    n_groups = incidence.matrix.shape[0]
+    all_members = sorted(
+        member
+        for member, count in zip(incidence.members, incidence.groups_counts())
+        if count < n_groups
+    )
+    # Correlations of the profiles of the members, one row at a time, from
+    # the numbers of groups shared by each pair of members.
+    profiles = incidence.matrix[:, incidence.member_indices(all_members)]
+    profiles = profiles.astype(float)
+    cooccurrences = (profiles.T @ profiles).tocsr()
+    frequencies = np.asarray(profiles.sum(axis=0)).ravel() / n_groups
+    stds = np.sqrt(frequencies * (1 - frequencies))
+    threshold = min(almost_twins_threshold, 0.999)
     twins = {}
     almost_tweens = {m: set() for m in all_members}
     has_tweens = {m: False for m in all_members}
     for i, m1 in enumerate(all_members):
         if has_tweens[m1]:
             continue
-        for m2 in all_members[i + 1 :]:
+        row = cooccurrences[i].toarray().ravel() / n_groups
+        correlations = (row - frequencies[i] * frequencies) / (stds[i] * stds)
+        for j in i + 1 + np.flatnonzero(correlations[i + 1 :] > threshold):
+            m2 = all_members[j]
             if has_tweens[m2]:
                 continue
-            corr = np.corrcoef(profiles[m1], profiles[m2])[1, 0]
+            corr = float(correlations[j])
             if corr > 0.999:
                 if m1 not in twins:
                     twins[m1] = set()
@@ -40,8 +51,63 @@ def _find_twins(groups_data, almost_twins_threshold=0.8):
     return twins, almost_tweens, has_tweens
 
 
+def _counts_pvalues(attempts, failures, member_attempts, member_failures):
+    """Return the ANOVA p-value of each member, from counts.
+
+    These are the p-values of ``sklearn.feature_selection.f_classif`` on one
+    row per attempt (with the presence of the members as features and the
+    failure of the attempt as class), given the total attempts and failures
+    and the attempts and failures of the groups of each member. Members in
+    all groups get a NaN p-value.
+    """
+    n = attempts
+    class_sizes = np.array([n - failures, failures], dtype=float)
+    sums = np.array(
+        [member_attempts - member_failures, member_failures],
+        dtype=float,
+    )
+    total = sums.sum(axis=0)
+    # Features are 0/1, so their sums of squares are their sums.
+    with np.errstate(divide="ignore", invalid="ignore"):
+        between = (sums**2 / class_sizes[:, None]).sum(axis=0) - total**2 / n
+        within = total - total**2 / n - between
+        f_values = between / (within / (n - 2))
+    return f_distribution.sf(f_values, 1, n - 2)
+
+
+def _lasso_effects(groups_data, selected_members, incidence=None):
+    """Fit the failure rates of the groups with a weighted LASSO.
+
+    Returns the coefficients of the members, the intercept, the (groups x
+    members) data and the failure rates of the groups. Each group is weighted
+    by its number of attempts, which is equivalent to a fit on one row per
+    attempt.
+    """
+    if incidence is None:
+        incidence = MembersIncidence(groups_data)
+    data = incidence.columns(selected_members)
+    attempts = np.array([int(d["attempts"]) for d in groups_data.values()])
+    failures = np.array([int(d["failures"]) for d in groups_data.values()])
+    rates = 1.0 * failures / attempts
+    coef, intercept, alpha = weighted_lasso_fit(
+        data,
+        rates,
+        sample_weight=attempts,
+        extra_rss=(attempts * rates * (1 - rates)).sum(),
+    )
+    return coef, intercept, data, rates
+
+
 def find_statistical_saboteurs(
-    groups_data, pvalue_threshold=0.1, effect_threshold=0, max_significant_members=10
+    groups_data,
+    pvalue_threshold=0.1,
+    effect_threshold=0,
+    max_significant_members=10,
+    regression="ridge",
+    bootstrap=0,
+    confidence=0.95,
+    processes=1,
+    seed=0,
 ):
     """Return statistics on possible bad elements in the data.
 
@@ -53,12 +119,53 @@ def find_statistical_saboteurs(
     pvalue_threshold
       Only failure-associated elements with a p-value below this threshold
       will be included in the final statistics.
+
+    regression
+      Either "ridge" (default) to estimate the effects of the members with a
+      ridge regression, or "lasso" for a sparse L1-regularized regression on
+      the failure rates of the groups weighted by their attempts (see
+      ``weighted_lasso_path``), in which most members get a zero effect. With
+      "lasso", the result also has a ``selected_members`` entry listing the
+      members with a non-zero effect.
+
+    bootstrap
+      Number of bootstrap resamples of the groups used to compute confidence
+      intervals (0 for none). The intervals are given by the ``effect_interval``
+      of each significant member and by the ``f1_score_interval`` of the
+      result (see ``bootstrap_intervals``). Only with the "ridge" regression.
+
+    confidence
+      Probability mass of the bootstrap intervals.
+
+    processes, seed
+      Number of processes running the bootstrap resamples, and seed of the
+      random resamples.
+
+    Returns
+    -------
+    result
+      A ``StatisticalSaboteursResult``, which can be used as a dict with keys
+      ``groups_data``, ``conserved_members``, ``varying_members``,
+      ``significant_members``, ``f1_score``, etc. The groups data is not
+      copied: ``result["groups_data"]`` is a view of the input completed with
+      the ``failure_rate``, ``deviation`` and ``deviation_pvalue`` of each
+      group, whose ``outliers()`` method ranks the groups failing more than
+      predicted by their members.
     """
-    groups_data = deepcopy(groups_data)
-    twins, almost_tweens, has_twins = _find_twins(groups_data)
-    members_sets = [set(group["members"]) for group in groups_data.values()]
-    all_members = set().union(*members_sets)
-    conserved_members = members_sets[0].intersection(*members_sets)
+    if regression not in ("ridge", "lasso"):
+        raise ValueError("Unknown regression: %s" % regression)
+    if bootstrap and regression != "ridge":
+        raise ValueError("Bootstrap intervals require the ridge regression.")
+    # The (groups x members) incidence is computed once, and the data of each
+    # fit below is sliced from its columns.
+    incidence = MembersIncidence(groups_data)
+    twins, almost_tweens, has_twins = _find_twins(groups_data, incidence=incidence)
+    all_members = set(incidence.members)
+    conserved_members = set(
+        member
+        for member, count in zip(incidence.members, incidence.groups_counts())
+        if count == len(groups_data)
+    )
     members_with_twins = set().union(*twins.values())
     varying_members = sorted(
         all_members.difference(conserved_members).difference(members_with_twins)
@@ -66,32 +173,54 @@ def find_statistical_saboteurs(
 
     # Build the data
 
+    attempts = np.array([int(d["attempts"]) for d in groups_data.values()])
+    failures = np.array([int(d["failures"]) for d in groups_data.values()])
+    if regression == "ridge":
+        # One row per attempt: the successes of each group, then its failures.
+        attempt_ranks = np.arange(attempts.sum()) - np.repeat(
+            np.cumsum(attempts) - attempts, attempts
+        )
+        attempts_observed = (
+            attempt_ranks >= np.repeat(attempts - failures, attempts)
+        ).astype(int)
+
     def build_data_and_observed(selected_members, by_group=False):
-        data = []
-        observed = []
-        for group_name, group_data in groups_data.items():
-            attempts = int(group_data["attempts"])
-            failures = int(group_data["failures"])
-            vector = [[(mb in group_data["members"]) for mb in selected_members]]
-            if by_group:
-                data += vector
-                observed.append(1.0 * failures / attempts)
-            else:
-                data += attempts * vector
-                observed += (attempts - failures) * [0] + failures * [1]
-        return np.array(data), np.array(observed)
-
-    # LASSO model (gives positive / negative impact)
-    data, observed = build_data_and_observed(varying_members)
-    regression = linear_model.RidgeCV()
-    regression.fit(data, observed)
-
-    # ANOVA analysis (for p-values)
-    selector = SelectFpr(f_classif, alpha=pvalue_threshold)
-    selector.fit(data, observed)
+        data = incidence.columns(selected_members, dtype=bool)
+        if by_group:
+            return data, 1.0 * failures / attempts
+        return np.repeat(data, attempts, axis=0), attempts_observed
+
+    def build_weighted_data_and_observed(selected_members):
+        # One row per group and outcome, weighted by its number of attempts,
+        # which is equivalent to one row per attempt for weighted fits.
+        data = incidence.columns(selected_members, dtype=bool)
+        observed = np.repeat([0, 1], len(data))
+        weights = np.concatenate([attempts - failures, failures])
+        nonzero = weights > 0
+        return np.vstack([data, data])[nonzero], observed[nonzero], weights[nonzero]
+
+    # Regression model (gives positive / negative impact), and ANOVA analysis
+    # (for p-values). The lasso path fits the groups and computes the p-values
+    # from the counts, without building one row per attempt.
+    if regression == "lasso":
+        coefficients, _, data, _ = _lasso_effects(
+            groups_data, varying_members, incidence
+        )
+        selected_members = [m for m, c in zip(varying_members, coefficients) if c]
+        pvalues = _counts_pvalues(
+            attempts.sum(), failures.sum(), attempts @ data, failures @ data
+        )
+    else:
+        data, observed = build_data_and_observed(varying_members)
+        regression_model = linear_model.RidgeCV()
+        regression_model.fit(data, observed)
+        coefficients = regression_model.coef_
+        selector = SelectFpr(f_classif, alpha=pvalue_threshold)
+        selector.fit(data, observed)
+        pvalues = selector.pvalues_
 
     # select the most interesting parts
-    data_ = zip(selector.pvalues_, regression.coef_, varying_members)
+    data_ = zip(pvalues, coefficients, varying_members)
     significant_members = OrderedDict(
         [
             (name, {"pvalue": pvalue, "twins": twins.get(name, [])})
@@ -101,18 +230,28 @@ def find_statistical_saboteurs(
     )
 
     if len(significant_members) == 0:
-        return {
-            "groups_data": groups_data,
-            "conserved_members": conserved_members,
-            "varying_members": varying_members,
-            "significant_members": significant_members,
-        }
-    # LASSO model (significant parts only)
-    data, observed = build_data_and_observed(significant_members)
-    regression.fit(data, observed)
-    zipped = zip(regression.coef_, significant_members.items())
+        return StatisticalSaboteursResult(
+            groups_data=groups_data,
+            conserved_members=conserved_members,
+            varying_members=varying_members,
+            significant_members=significant_members,
+            selected_members=selected_members if regression == "lasso" else None,
+        )
+    # Regression model (significant parts only)
+    if regression == "lasso":
+        coefficients = _lasso_effects(
+            groups_data, list(significant_members), incidence
+        )[0]
+        data, observed, weights = build_weighted_data_and_observed(significant_members)
+    else:
+        data, observed = build_data_and_observed(significant_members)
+        weights = None
+        regression_model.fit(data, observed)
+        coefficients = regression_model.coef_
+    zipped = zip(coefficients, significant_members.items())
     for coef, (name, data_) in zipped:
         data_["effect"] = coef
+    fitted_members = list(significant_members)
     for member in list(significant_members.keys()):
         if significant_members[member]["effect"] < effect_threshold:
             significant_members.pop(member)
@@ -122,24 +261,49 @@ def find_statistical_saboteurs(
 
     # Build a classifier to compute a L1 score
     classifier = linear_model.LogisticRegressionCV(penalty="l2")
-    classifier.fit(data, observed)
-    f1_score = metrics.f1_score(observed, classifier.predict(data))
+    classifier.fit(data, observed, sample_weight=weights)
+    f1_score = metrics.f1_score(
+        observed, classifier.predict(data), sample_weight=weights
+    )
+    if bootstrap:
+        effects_intervals, f1_score_interval = bootstrap_intervals(
+            build_data_and_observed(fitted_members, by_group=True)[0],
+            attempts,
+            failures,
+            alpha=regression_model.alpha_,
+            C=classifier.C_[0],
+            n_resamples=bootstrap,
+            confidence=confidence,
+            processes=processes,
+            seed=seed,
+        )
+        for member, interval in zip(fitted_members, effects_intervals):
+            if member in significant_members:
+                significant_members[member]["effect_interval"] = tuple(
+                    map(float, interval)
+                )
 
     # Find constructs which are less explained by the parts:
-    data, observed = build_data_and_observed(significant_members, by_group=True)
-    regression.fit(data, observed)
-    predictions = regression.predict(data)
-    zipped = zip(groups_data.values(), observed, predictions)
-    intercept = min(0.9, max(0.1, regression.intercept_))
-    for group_data, obs, pred in zipped:
-        std = binom.std(group_data["attempts"], intercept) / group_data["attempts"]
-        group_data["failure_rate"] = obs
-        group_data["deviation"] = np.round((obs - pred) / std, decimals=1)
-
-    return {
-        "groups_data": groups_data,
-        "conserved_members": conserved_members,
-        "varying_members": varying_members,
-        "significant_members": significant_members,
-        "f1_score": f1_score,
-    }
+    if regression == "lasso":
+        coefficients, intercept, data, observed = _lasso_effects(
+            groups_data, list(significant_members), incidence
+        )
+        predictions = data @ coefficients + intercept
+    else:
+        data, observed = build_data_and_observed(significant_members, by_group=True)
+        regression_model.fit(data, observed)
+        predictions = regression_model.predict(data)
+        intercept = regression_model.intercept_
+    deviations, pvalues = groups_deviations(attempts, failures, predictions, intercept)
+
+    return StatisticalSaboteursResult(
+        groups_data=GroupsStatistics(
+            groups_data, observed, deviations, pvalues, incidence=incidence
+        ),
+        conserved_members=conserved_members,
+        varying_members=varying_members,
+        significant_members=significant_members,
+        f1_score=f1_score,
+        f1_score_interval=f1_score_interval if bootstrap else None,
+        selected_members=selected_members if regression == "lasso" else None,
+    )
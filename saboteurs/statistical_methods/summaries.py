@@ -0,0 +1,322 @@
+"""Mergeable summaries of groups data, for analyses split across shards.
+
+A summary holds sufficient statistics of the groups of a shard: the numbers
+of groups, attempts and failures of each member, the co-occurrence matrix of
+the members weighted by attempts, and a hash of the set of groups of each
+member. All of them are sums over the groups, so the summary of several
+shards is the sum of their summaries, whatever the order in which they are
+merged, and the statistics of the members can be computed from the final
+summary without the groups data.
+"""
+
+import hashlib
+from collections import OrderedDict
+from functools import reduce
+
+import numpy as np
+from scipy import sparse
+
+from .incidence import MembersIncidence
+from .statistical_methods import _counts_pvalues
+
+
+def _group_hash(group_name):
+    """Return a 64-bit hash of a group name."""
+    digest = hashlib.blake2b(str(group_name).encode(), digest_size=8).digest()
+    return np.uint64(int.from_bytes(digest, "little"))
+
+
+class GroupsDataSummary:
+    """Sufficient statistics of the groups data of a shard.
+
+    Summaries are created with ``GroupsDataSummary.from_groups_data`` and
+    merged with ``merge`` (or ``+``). Merging is associative and commutative
+    (up to the order of the members), provided that group names are unique
+    across shards, as the profile hashes identify the groups by their names.
+
+    Parameters
+    ----------
+    members
+      List of the members.
+
+    n_groups, attempts, failures
+      Total numbers of groups, attempts and failures.
+
+    member_groups, member_attempts, member_failures
+      Numbers of groups, attempts and failures of the groups of each member.
+
+    gram
+      A sparse (members x members) matrix giving for each pair of members the
+      total attempts of the groups containing both (a dense array is also
+      accepted).
+
+    profile_hashes
+      An array of uint64 giving for each member the sum (modulo 2**64) of the
+      hashes of the names of its groups. Members with the same hash are in
+      exactly the same groups (twins).
+
+    Examples
+    --------
+
+    >>> summaries = [GroupsDataSummary.from_groups_data(shard)
+    >>>              for shard in shards]  # e.g. in parallel, on each node
+    >>> summary = merge_summaries(summaries)
+    >>> result = summary.find_saboteurs()
+    """
+
+    def __init__(
+        self,
+        members,
+        n_groups,
+        attempts,
+        failures,
+        member_groups,
+        member_attempts,
+        member_failures,
+        gram,
+        profile_hashes,
+    ):
+        self.members = list(members)
+        self.n_groups = int(n_groups)
+        self.attempts = int(attempts)
+        self.failures = int(failures)
+        self.member_groups = np.asarray(member_groups, dtype=np.int64)
+        self.member_attempts = np.asarray(member_attempts, dtype=np.int64)
+        self.member_failures = np.asarray(member_failures, dtype=np.int64)
+        self.gram = sparse.csr_matrix(gram, dtype=np.int64)
+        # Canonical form, so that equal summaries serialize identically.
+        self.gram.sum_duplicates()
+        self.gram.eliminate_zeros()
+        self.profile_hashes = np.asarray(profile_hashes, dtype=np.uint64)
+
+    def __repr__(self):
+        return "GroupsDataSummary(%d members, %d groups, %d attempts)" % (
+            len(self.members),
+            self.n_groups,
+            self.attempts,
+        )
+
+    @classmethod
+    def from_groups_data(cls, groups_data):
+        """Summarize the result of ``csv_to_groups_data()``."""
+        incidence = MembersIncidence(groups_data)
+        data = incidence.matrix.astype(np.int64)
+        attempts = np.array([int(d["attempts"]) for d in groups_data.values()])
+        failures = np.array([int(d["failures"]) for d in groups_data.values()])
+        hashes = np.array([_group_hash(name) for name in groups_data], np.uint64)
+        # Sums of the hashes of the groups of each member (column of the CSC
+        # matrix), wrapping around modulo 2**64.
+        profile_hashes = np.zeros(len(incidence.members), dtype=np.uint64)
+        if len(incidence.members):
+            profile_hashes = np.add.reduceat(
+                hashes[data.indices], data.indptr[:-1], dtype=np.uint64
+            )
+        return cls(
+            members=incidence.members,
+            n_groups=len(groups_data),
+            attempts=attempts.sum(),
+            failures=failures.sum(),
+            member_groups=incidence.groups_counts(),
+            member_attempts=data.T @ attempts,
+            member_failures=data.T @ failures,
+            gram=data.T @ sparse.diags(attempts) @ data,
+            profile_hashes=profile_hashes,
+        )
+
+    def _reindexed(self, member_ids):
+        """Return the arrays of the summary for a superset of its members,
+        given as a dict {member: index}."""
+        ids = np.array([member_ids[m] for m in self.members], dtype=np.int64)
+        n = len(member_ids)
+        arrays = []
+        for array in (
+            self.member_groups,
+            self.member_attempts,
+            self.member_failures,
+            self.profile_hashes,
+        ):
+            new_array = np.zeros(n, dtype=array.dtype)
+            new_array[ids] = array
+            arrays.append(new_array)
+        gram = self.gram.tocoo()
+        gram = sparse.csr_matrix(
+            (gram.data, (ids[gram.row], ids[gram.col])), shape=(n, n)
+        )
+        return arrays + [gram]
+
+    def merge(self, other):
+        """Return the summary of the groups of both summaries."""
+        member_ids = OrderedDict((m, i) for i, m in enumerate(self.members))
+        for member in other.members:
+            member_ids.setdefault(member, len(member_ids))
+        (groups, attempts, failures, hashes, gram), (
+            other_groups,
+            other_attempts,
+            other_failures,
+            other_hashes,
+            other_gram,
+        ) = (self._reindexed(member_ids), other._reindexed(member_ids))
+        return GroupsDataSummary(
+            members=list(member_ids),
+            n_groups=self.n_groups + other.n_groups,
+            attempts=self.attempts + other.attempts,
+            failures=self.failures + other.failures,
+            member_groups=groups + other_groups,
+            member_attempts=attempts + other_attempts,
+            member_failures=failures + other_failures,
+            gram=gram + other_gram,
+            profile_hashes=hashes + other_hashes,
+        )
+
+    __add__ = merge
+
+    def to_dict(self):
+        """Return a JSON-serializable dict, which ``from_dict`` reads back."""
+        return dict(
+            members=list(self.members),
+            n_groups=self.n_groups,
+            attempts=self.attempts,
+            failures=self.failures,
+            member_groups=self.member_groups.tolist(),
+            member_attempts=self.member_attempts.tolist(),
+            member_failures=self.member_failures.tolist(),
+            gram=self._gram_triplets(),
+            profile_hashes=["%016x" % h for h in self.profile_hashes.tolist()],
+        )
+
+    def _gram_triplets(self):
+        """Return the gram as a dict of lists of rows, columns and values."""
+        gram = self.gram.tocoo()
+        return dict(
+            rows=gram.row.tolist(), columns=gram.col.tolist(), values=gram.data.tolist()
+        )
+
+    @classmethod
+    def from_dict(cls, data):
+        """Return the summary serialized with ``to_dict``."""
+        data = dict(data)
+        data["profile_hashes"] = [int(h, 16) for h in data["profile_hashes"]]
+        n = len(data["members"])
+        gram = data["gram"]
+        data["gram"] = sparse.csr_matrix(
+            (
+                np.array(gram["values"], dtype=np.int64),
+                (np.array(gram["rows"], dtype=np.int64), gram["columns"]),
+            ),
+            shape=(n, n),
+        )
+        return cls(**data)
+
+    def twins(self):
+        """Return a dict {member: [members in exactly the same groups]}."""
+        members_per_hash = OrderedDict()
+        for member, profile_hash in zip(self.members, self.profile_hashes.tolist()):
+            members_per_hash.setdefault(profile_hash, []).append(member)
+        return OrderedDict(
+            (member, [m for m in same_hash if m != member])
+            for same_hash in members_per_hash.values()
+            if len(same_hash) > 1
+            for member in same_hash
+        )
+
+    def pvalues(self):
+        """Return the ANOVA p-value of each member.
+
+        These are the p-values of ``sklearn.feature_selection.f_classif`` on
+        one row per attempt (with the presence of the members as features and
+        the failure of the attempt as class), computed from the counts. Members
+        in all groups get a NaN p-value.
+        """
+        return _counts_pvalues(
+            self.attempts, self.failures, self.member_attempts, self.member_failures
+        )
+
+    def ridge_effects(self, members, alpha=1.0):
+        """Return the effects of the members and the intercept, as given by a
+        ridge regression on one row per attempt (see ``find_saboteurs``)."""
+        member_ids = {m: i for i, m in enumerate(self.members)}
+        ids = [member_ids[m] for m in members]
+        n = float(self.attempts)
+        member_attempts = self.member_attempts[ids].astype(float)
+        gram = (
+            self.gram[ids][:, ids].toarray()
+            - np.outer(member_attempts, member_attempts) / n
+        )
+        correlations = self.member_failures[ids] - member_attempts * self.failures / n
+        effects = np.linalg.solve(gram + alpha * np.eye(len(ids)), correlations)
+        intercept = (self.failures - member_attempts @ effects) / n
+        return effects, intercept
+
+    def find_saboteurs(self, pvalue_threshold=0.1, effect_threshold=0, alpha=1.0):
+        """Return statistics on possible bad members, from the summary only.
+
+        This follows ``find_statistical_saboteurs``: members which are in all
+        groups, or which are twins of another member, are left out, members
+        are selected by ANOVA p-value, then their effects are estimated with a
+        ridge regression. As the regularization can't be selected by
+        cross-validation without the groups, it is given by ``alpha``. There
+        are no per-group deviations or F1 score, which require the groups.
+
+        Parameters
+        ----------
+        pvalue_threshold
+          Only failure-associated members with a p-value below this threshold
+          are returned.
+
+        effect_threshold
+          Only members with an effect above this threshold are returned.
+
+        alpha
+          Regularization of the ridge regression.
+
+        Returns
+        -------
+        {'significant_members': ..., 'conserved_members': ..., ...}
+          With ``conserved_members`` (members in all groups),
+          ``varying_members`` (the other members without twins) and
+          ``significant_members``, an OrderedDict {member: {'pvalue': ...,
+          'effect': ..., 'twins': [...]}} sorted by increasing p-value.
+        """
+        conserved = set(
+            m for m, n in zip(self.members, self.member_groups) if n == self.n_groups
+        )
+        # As in find_statistical_saboteurs, the first of twin members (in
+        # alphabetical order) stands for the others.
+        twins = OrderedDict()
+        for member, member_twins in self.twins().items():
+            if (member not in conserved) and (member < min(member_twins)):
+                twins[member] = sorted(member_twins)
+        members_with_twins = set().union(*twins.values())
+        varying_members = sorted(set(self.members) - conserved - members_with_twins)
+        if len(varying_members):
+            effects = self.ridge_effects(varying_members, alpha=alpha)[0]
+        else:
+            effects = []
+        pvalues = dict(zip(self.members, self.pvalues()))
+        candidates = sorted(
+            (pvalues[member], member)
+            for member, effect in zip(varying_members, effects)
+            if effect > 0
+        )
+        significant_members = OrderedDict(
+            (member, {"pvalue": pvalue, "twins": twins.get(member, [])})
+            for pvalue, member in candidates
+            if pvalue < pvalue_threshold
+        )
+        if len(significant_members):
+            effects = self.ridge_effects(list(significant_members), alpha=alpha)[0]
+            for effect, data in zip(effects, significant_members.values()):
+                data["effect"] = effect
+            for member in list(significant_members):
+                if significant_members[member]["effect"] < effect_threshold:
+                    significant_members.pop(member)
+        return {
+            "conserved_members": conserved,
+            "varying_members": varying_members,
+            "significant_members": significant_members,
+        }
+
+
+def merge_summaries(summaries):
+    """Merge a list of ``GroupsDataSummary`` (e.g. one per shard)."""
+    return reduce(GroupsDataSummary.merge, summaries)
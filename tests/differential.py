@@ -0,0 +1,313 @@
+"""Differential testing of the optimized code paths against references.
+
+The reference implementations below are the straightforward versions of the
+baseline code. ``run_differential`` runs a reference and a candidate on many
+random instances from seeded generators, shrinks each mismatching instance to
+a minimal one (by removing groups and elements while the outputs still
+differ), and measures the speedup of the candidate.
+"""
+
+import json
+import time
+from collections import OrderedDict
+
+import numpy as np
+from sklearn import linear_model
+from sklearn.feature_selection import f_classif
+
+# SEEDED GENERATORS
+
+
+def random_groups(rng, max_groups=12, max_elements=10, max_size=5):
+    """Return an OrderedDict {group_name: [elements]} of random groups."""
+    n_groups = rng.randint(1, max_groups + 1)
+    n_elements = rng.randint(1, max_elements + 1)
+    elements = ["e%d" % i for i in range(n_elements)]
+    groups = OrderedDict()
+    for i in range(n_groups):
+        size = rng.randint(1, min(max_size, n_elements) + 1)
+        groups["g%d" % i] = list(rng.choice(elements, size, replace=False))
+    return groups
+
+
+def random_failed_groups(rng, groups, max_saboteurs=2, noise=0.1):
+    """Return the names of the groups containing one of a few random
+    saboteurs, plus a few groups failing for no reason."""
+    elements = sorted(set(e for group in groups.values() for e in group))
+    n_saboteurs = rng.randint(0, min(max_saboteurs, len(elements)) + 1)
+    saboteurs = set(rng.choice(elements, n_saboteurs, replace=False))
+    return [
+        name
+        for name, group in groups.items()
+        if saboteurs.intersection(group) or (rng.rand() < noise)
+    ]
+
+
+def random_groups_data(rng, max_groups=30, max_members=12, max_size=6):
+    """Return random groups data as given by ``csv_to_groups_data``, where
+    groups with a saboteur fail more often."""
+    groups = random_groups(rng, max_groups, max_members, max_size)
+    members = sorted(set(m for group in groups.values() for m in group))
+    saboteurs = set(rng.choice(members, 1))
+    groups_data = OrderedDict()
+    for name, members in groups.items():
+        attempts = rng.randint(1, 12)
+        rate = 0.7 if saboteurs.intersection(members) else 0.2
+        groups_data[name] = dict(
+            id=name,
+            attempts=attempts,
+            failures=rng.binomial(attempts, rate),
+            members=members,
+        )
+    return groups_data
+
+
+def random_combinatorial_design(rng, max_positions=3, max_elements=4):
+    """Return a dict {position: [elements]} of a random combinatorial design
+    with disjoint positions."""
+    n_positions = rng.randint(2, max_positions + 1)
+    return OrderedDict(
+        (
+            "position_%d" % p,
+            ["p%d_%d" % (p, i) for i in range(rng.randint(2, max_elements + 1))],
+        )
+        for p in range(n_positions)
+    )
+
+
+# REFERENCE IMPLEMENTATIONS (from the baseline code)
+
+
+def reference_find_logical_saboteurs(groups, failed_groups):
+    """Set-based ``find_logical_saboteurs`` of the baseline."""
+    failed_groups = set(failed_groups)
+    fail_table = OrderedDict()
+    for name, group in groups.items():
+        for element in group:
+            fail_table.setdefault(element, set()).add(name)
+    suspicious = set(
+        element
+        for element, element_groups in fail_table.items()
+        if element_groups < failed_groups
+    )
+    confirmed = set(
+        suspect
+        for suspect in suspicious
+        if len(
+            fail_table[suspect].difference(
+                set().union(
+                    *(fail_table[other] for other in suspicious.difference({suspect}))
+                )
+            )
+        )
+    )
+    return dict(
+        saboteurs=list(confirmed), suspicious=list(suspicious.difference(confirmed))
+    )
+
+
+def reference_find_twins(groups_data, almost_twins_threshold=None):
+    """Correlation-based twins of the baseline ``_find_twins``. If a threshold
+    is given, also return the dict {member: {(almost_twin, corr)...}}."""
+    groups_members = [data["members"] for data in groups_data.values()]
+    all_members = set(member for members in groups_members for member in members)
+    profiles = {
+        member: [member in members for members in groups_members]
+        for member in all_members
+    }
+    profiles = {m: p for m, p in profiles.items() if min(p) != max(p)}
+    all_members = sorted(profiles)
+    twins, has_twins = {}, {m: False for m in all_members}
+    almost_twins = {m: set() for m in all_members}
+    for i, m1 in enumerate(all_members):
+        if has_twins[m1]:
+            continue
+        for m2 in all_members[i + 1 :]:
+            if has_twins[m2]:
+                continue
+            corr = np.corrcoef(profiles[m1], profiles[m2])[1, 0]
+            if corr > 0.999:
+                twins.setdefault(m1, set()).add(m2)
+                has_twins[m1] = has_twins[m2] = True
+            elif (almost_twins_threshold is not None) and (
+                corr > almost_twins_threshold
+            ):
+                almost_twins[m1].add((m2, corr))
+                almost_twins[m2].add((m1, corr))
+    if almost_twins_threshold is None:
+        return twins
+    return twins, almost_twins
+
+
+def reference_minimal_cover(elements_set, subsets, depth=0):
+    """Depth-first search of the baseline ``minimal_cover``, which returns
+    the first cover found (not necessarily the smallest one)."""
+    if len(elements_set) == 0:
+        return []
+    if depth == 0:
+        if set().union(*[subset for name, subset in subsets]) != elements_set:
+            return None
+    subsets = [(n, s) for (n, s) in subsets if len(s)]
+    ordered_subsets = sorted(subsets, key=lambda named_subset: len(named_subset[1]))
+    while len(ordered_subsets):
+        name, subset = ordered_subsets.pop()
+        new_subsets = [(n, s.difference(subset)) for (n, s) in ordered_subsets]
+        result = reference_minimal_cover(
+            elements_set.difference(subset), new_subsets, depth + 1
+        )
+        if result is not None:
+            return result + [name]
+        ordered_subsets = [
+            subset_
+            for (subset_, (new_name, new_subset)) in zip(ordered_subsets, new_subsets)
+            if len(new_subset) != 0
+        ]
+    return None
+
+
+def expanded_rows(groups_data, members):
+    """Return the (attempts x members) data and 0/1 outcomes, with one row
+    per attempt, as in the baseline ``find_statistical_saboteurs``."""
+    data, observed = [], []
+    for group_data in groups_data.values():
+        attempts, failures = group_data["attempts"], group_data["failures"]
+        data += attempts * [[m in group_data["members"] for m in members]]
+        observed += (attempts - failures) * [0] + failures * [1]
+    return np.array(data, dtype=float).reshape(-1, len(members)), np.array(observed)
+
+
+def reference_ridge_effects(groups_data, members, alpha=1.0):
+    """Ridge effects fitted on one row per attempt."""
+    data, observed = expanded_rows(groups_data, members)
+    return linear_model.Ridge(alpha=alpha).fit(data, observed).coef_
+
+
+def reference_anova_pvalues(groups_data, members):
+    """ANOVA p-values computed on one row per attempt."""
+    data, observed = expanded_rows(groups_data, members)
+    return f_classif(data, observed)[1]
+
+
+# HARNESS
+
+
+def groups_shrinks(groups):
+    """Yield the instances with one group, or one element of a group, less."""
+    names = list(groups)
+    for name in names:
+        if len(groups) > 1:
+            yield OrderedDict((n, g) for n, g in groups.items() if n != name)
+    for name in names:
+        group = groups[name]
+        for element in group if len(group) > 1 else []:
+            smaller = OrderedDict(groups)
+            smaller[name] = [e for e in group if e != element]
+            yield smaller
+
+
+def shrink(instance, differs, shrinks):
+    """Return a locally minimal instance on which ``differs`` is still True.
+
+    ``shrinks(instance)`` yields smaller variants of the instance, and the
+    first one which still differs replaces it, until none does.
+    """
+    shrunk = True
+    while shrunk:
+        shrunk = False
+        for smaller in shrinks(instance):
+            if differs(smaller):
+                instance, shrunk = smaller, True
+                break
+    return instance
+
+
+def run_differential(
+    generate,
+    reference,
+    candidate,
+    n_instances=1000,
+    seed=0,
+    agree=None,
+    shrinks=None,
+    record_file=None,
+    name=None,
+):
+    """Compare the outputs of ``reference`` and ``candidate`` on random
+    instances.
+
+    Parameters
+    ----------
+    generate
+      Function ``rng => instance``. Instances are passed to ``reference`` and
+      ``candidate`` as positional arguments if they are tuples.
+
+    reference, candidate
+      The two implementations to compare.
+
+    n_instances
+      Number of random instances.
+
+    seed
+      Seed of the random instances (instance i uses the seed (seed, i), so
+      any instance can be regenerated on its own).
+
+    agree
+      Function ``(reference_output, candidate_output) => bool`` telling
+      whether the outputs agree, by default ``==``. It can also check that the
+      candidate is at least as good as the reference.
+
+    shrinks
+      Function ``instance => smaller instances``, used to shrink mismatching
+      instances. No shrinking if None.
+
+    record_file
+      If provided, a JSON line with the name, number of instances,
+      mismatches and speedup is appended to this file.
+
+    Returns
+    -------
+    {'mismatches': [...], 'reference_time': t1, 'candidate_time': t2, ...}
+      With ``'speedup': t1 / t2``. Each mismatch is a dict with the
+      ``index`` of the instance, the ``instance`` and the ``shrunk``
+      instance.
+    """
+    if agree is None:
+        agree = lambda a, b: a == b
+
+    def call(function, instance):
+        return (
+            function(*instance) if isinstance(instance, tuple) else function(instance)
+        )
+
+    def differs(instance):
+        return not agree(call(reference, instance), call(candidate, instance))
+
+    times = {reference: 0.0, candidate: 0.0}
+    mismatches = []
+    for i in range(n_instances):
+        rng = np.random.RandomState([seed, i])
+        instance = generate(rng)
+        outputs = []
+        for function in (reference, candidate):
+            start = time.perf_counter()
+            outputs.append(call(function, instance))
+            times[function] += time.perf_counter() - start
+        if not agree(*outputs):
+            shrunk = instance if shrinks is None else shrink(instance, differs, shrinks)
+            mismatches.append(dict(index=i, instance=instance, shrunk=shrunk))
+    result = dict(
+        mismatches=mismatches,
+        reference_time=times[reference],
+        candidate_time=times[candidate],
+        speedup=times[reference] / max(times[candidate], 1e-12),
+    )
+    if record_file is not None:
+        with open(record_file, "a") as f:
+            record = dict(
+                name=name,
+                n_instances=n_instances,
+                n_mismatches=len(mismatches),
+                speedup=result["speedup"],
+            )
+            f.write(json.dumps(record) + "\n")
+    return result
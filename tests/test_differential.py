@@ -0,0 +1,215 @@
+import numpy as np
+from saboteurs import (find_logical_saboteurs, design_test_batch,
+                       generate_combinatorial_groups)
+from saboteurs.logical_methods.minimal_cover import minimal_cover
+from saboteurs.logical_methods import verify_test_batch
+from saboteurs.statistical_methods import GroupsDataSummary, MembersIncidence
+from saboteurs.statistical_methods.statistical_methods import _find_twins
+from differential import (random_groups, random_failed_groups,
+                          random_groups_data, random_combinatorial_design,
+                          reference_find_logical_saboteurs,
+                          reference_find_twins, reference_minimal_cover,
+                          reference_ridge_effects, expanded_rows,
+                          reference_anova_pvalues, groups_shrinks,
+                          run_differential)
+
+
+def logical_instance(rng):
+    groups = random_groups(rng)
+    return groups, random_failed_groups(rng, groups)
+
+
+def normalized_logical_result(result):
+    return sorted(result["saboteurs"]), sorted(result["suspicious"])
+
+
+def logical_shrinks(instance):
+    groups, failed_groups = instance
+    for smaller in groups_shrinks(groups):
+        yield smaller, [name for name in failed_groups if name in smaller]
+
+
+def test_find_logical_saboteurs_differential(tmpdir):
+    record_file = str(tmpdir.join("speedups.jsonl"))
+    result = run_differential(
+        logical_instance,
+        reference_find_logical_saboteurs,
+        find_logical_saboteurs,
+        n_instances=1000,
+        agree=lambda a, b: (normalized_logical_result(a) ==
+                            normalized_logical_result(b)),
+        shrinks=logical_shrinks,
+        record_file=record_file,
+        name="find_logical_saboteurs",
+    )
+    assert result["mismatches"] == []
+    assert '"n_mismatches": 0' in tmpdir.join("speedups.jsonl").read()
+
+
+def test_shrinking_of_mismatches():
+    def wrong_candidate(groups, failed_groups):
+        # Ignores the last group.
+        groups = dict(list(groups.items())[:-1])
+        return find_logical_saboteurs(groups, failed_groups)
+
+    result = run_differential(
+        logical_instance,
+        reference_find_logical_saboteurs,
+        wrong_candidate,
+        n_instances=50,
+        agree=lambda a, b: (normalized_logical_result(a) ==
+                            normalized_logical_result(b)),
+        shrinks=logical_shrinks,
+    )
+    assert len(result["mismatches"]) > 0
+    for mismatch in result["mismatches"]:
+        groups, failed_groups = mismatch["shrunk"]
+        assert len(groups) <= 2
+        assert all(len(group) == 1 for group in groups.values())
+
+
+def twins_and_varying_members(groups_data):
+    summary = GroupsDataSummary.from_groups_data(groups_data)
+    result = summary.find_saboteurs()
+    conserved = set(result["conserved_members"])
+    # The first of twin members (alphabetically) stands for the others.
+    twins = {member: set(member_twins)
+             for member, member_twins in summary.twins().items()
+             if (member not in conserved) and (member < min(member_twins))}
+    for member, data in result["significant_members"].items():
+        assert set(data["twins"]) == twins.get(member, set())
+    return result["varying_members"], twins
+
+
+def reference_twins_and_varying_members(groups_data):
+    twins = reference_find_twins(groups_data)
+    members = set(m for d in groups_data.values() for m in d["members"])
+    conserved = set(m for m in members if all(
+        m in d["members"] for d in groups_data.values()))
+    varying = sorted(members - conserved - set().union(*twins.values()))
+    return varying, twins
+
+
+def test_summary_statistics_differential():
+    result = run_differential(
+        random_groups_data,
+        reference_twins_and_varying_members,
+        twins_and_varying_members,
+        n_instances=300,
+    )
+    assert result["mismatches"] == []
+
+    def varying_members(groups_data):
+        return reference_twins_and_varying_members(groups_data)[0]
+
+    def reference_statistics(groups_data):
+        members = varying_members(groups_data)
+        if len(members) == 0:
+            return np.zeros(0), np.zeros(0)
+        return (reference_ridge_effects(groups_data, members),
+                reference_anova_pvalues(groups_data, members))
+
+    def statistics(groups_data):
+        members = varying_members(groups_data)
+        if len(members) == 0:
+            return np.zeros(0), np.zeros(0)
+        summary = GroupsDataSummary.from_groups_data(groups_data)
+        ids = [summary.members.index(m) for m in members]
+        return (summary.ridge_effects(members)[0], summary.pvalues()[ids])
+
+    result = run_differential(
+        random_groups_data,
+        reference_statistics,
+        statistics,
+        n_instances=300,
+        agree=lambda a, b: all(np.allclose(x, y, equal_nan=True)
+                               for x, y in zip(a, b)),
+    )
+    assert result["mismatches"] == []
+
+
+def test_find_twins_differential():
+    def twins(groups_data):
+        return {member: set(member_twins) for member, member_twins
+                in _find_twins(groups_data)[0].items()}
+
+    result = run_differential(
+        random_groups_data,
+        reference_find_twins,
+        twins,
+        n_instances=500,
+    )
+    assert result["mismatches"] == []
+
+
+def test_members_incidence_differential():
+    # The data of find_statistical_saboteurs, sliced from the incidence.
+    def data(groups_data):
+        incidence = MembersIncidence(groups_data)
+        members = sorted(incidence.members)
+        attempts = [d["attempts"] for d in groups_data.values()]
+        return np.repeat(incidence.columns(members), attempts, axis=0)
+
+    def reference_data(groups_data):
+        members = sorted(set(m for d in groups_data.values()
+                             for m in d["members"]))
+        return expanded_rows(groups_data, members)[0]
+
+    result = run_differential(random_groups_data, reference_data, data,
+                              n_instances=300, agree=np.array_equal)
+    assert result["mismatches"] == []
+
+    def almost_twins(groups_data, twins_function):
+        twins, almost = twins_function(groups_data)[:2]
+        return twins, {
+            member: {(m, round(corr, 9)) for m, corr in member_almost}
+            for member, member_almost in almost.items()
+        }
+
+    result = run_differential(
+        random_groups_data,
+        lambda groups_data: almost_twins(
+            groups_data, lambda g: reference_find_twins(g, 0.8)),
+        lambda groups_data: almost_twins(groups_data, _find_twins),
+        n_instances=500,
+    )
+    assert result["mismatches"] == []
+
+
+def cover_instance(rng):
+    groups = random_groups(rng, max_groups=10, max_elements=12, max_size=4)
+    elements = set(e for group in groups.values() for e in group)
+    return elements, [(name, set(group)) for name, group in groups.items()]
+
+
+def test_minimal_cover_differential():
+    result = run_differential(
+        cover_instance,
+        reference_minimal_cover,
+        minimal_cover,
+        n_instances=1000,
+        agree=lambda a, b: sorted(a) == sorted(b),
+    )
+    assert result["mismatches"] == []
+
+
+def test_design_test_batch_solvers_differential():
+    def design(elements_per_position, solver):
+        groups = generate_combinatorial_groups(elements_per_position)
+        selected, error = design_test_batch(groups, max_saboteurs=1,
+                                            solver=solver)
+        return len(selected), verify_test_batch(selected) == []
+
+    # The "search" solver returns the first design found: the optimal "milp"
+    # designs must not be larger, the greedy "bitset" designs must be valid.
+    checks = {"milp": lambda a, b: b[1] and (b[0] <= a[0]),
+              "bitset": lambda a, b: b[1]}
+    for solver, agree in checks.items():
+        result = run_differential(
+            random_combinatorial_design,
+            lambda design_: design(design_, "search"),
+            lambda design_: design(design_, solver),
+            n_instances=30,
+            agree=agree,
+        )
+        assert result["mismatches"] == []
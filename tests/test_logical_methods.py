@@ -1,9 +1,25 @@
+import pytest
 import os
+import zipfile
+import itertools
+import numpy as np
+from collections import OrderedDict
 from saboteurs import (find_logical_saboteurs,
+                       decode_group_tests,
                        generate_combinatorial_groups,
                        design_test_batch,
                        csv_to_groups_data,
-                       generate_batch_report)
+                       generate_batch_report,
+                       generate_batch_reports,
+                       plan_test_batch_design,
+                       minimum_separation,
+                       verify_test_batch,
+                       recommend_next_groups,
+                       plot_batch)
+from saboteurs.logical_methods.minimal_cover import (minimal_cover,
+                                                 reduce_cover_problem,
+                                                 milp_minimal_cover,
+                                                 weighted_minimal_cover)
 
 def test_find_logical_saboteurs():
     groups = {
@@ -36,4 +52,520 @@ def test_design_test_batch():
     assert (error is None)
     assert len(selected_groups) == 15
     raw_data = generate_batch_report(selected_groups)
-    assert len(raw_data) > 2000
\ No newline at end of file
+    assert len(raw_data) > 2000
+
+def test_plot_batch_with_many_groups():
+    groups = {
+        "group_%d" % i: ["e%d" % (i % 300), "e%d" % ((7 * i) % 300)]
+        for i in range(2000)
+    }
+    ax = plot_batch(groups, max_labels=50)
+    assert len(ax.collections) == 1
+    assert len(ax.get_yticks()) <= 50
+    assert len(ax.get_xticks()) <= 50
+
+
+def test_generate_batch_reports(tmpdir):
+    batches = {
+        "batch_%d" % i: {
+            "group_1": ["A", "B"],
+            "group_2": ["B", "C%d" % i],
+            "group_3": ["A", "C%d" % i],
+        }
+        for i in range(3)
+    }
+    for target in ["reports", "reports.zip"]:
+        target = os.path.join(str(tmpdir), target)
+        result = generate_batch_reports(batches, target, processes=2)
+        assert len(result["rendered"]) == 3
+        batches["batch_0"]["group_4"] = ["D"]
+        result = generate_batch_reports(batches, target, processes=1)
+        assert result["rendered"] == ["batch_0"]
+        assert sorted(result["unchanged"]) == ["batch_1", "batch_2"]
+        del batches["batch_0"]["group_4"]
+    with zipfile.ZipFile(target) as archive:
+        assert "batch_2/groups.pdf" in archive.namelist()
+    # A batch recorded in the hashes but missing from the archive is rendered.
+    with zipfile.ZipFile(target) as archive:
+        files = {name: archive.read(name) for name in archive.namelist()
+                 if not name.startswith("batch_1/")}
+    with zipfile.ZipFile(target, "w") as archive:
+        for name, content in files.items():
+            archive.writestr(name, content)
+    result = generate_batch_reports(batches, target, processes=1)
+    assert "batch_1" in result["rendered"]
+    assert result["unchanged"] == ["batch_2"]
+
+
+def test_generate_combinatorial_groups_is_lazy():
+    small_library = [['A', 'B', 'C'], ['D', 'E'], ['F', 'G', 'H', 'I']]
+    groups = generate_combinatorial_groups(small_library)
+    assert list(groups.items()) == [
+        ("group_%02d" % (i + 1), members)
+        for i, members in enumerate(itertools.product(*small_library))
+    ]
+    large_library = [["p%d_v%d" % (p, v) for v in range(10)] for p in range(8)]
+    groups = generate_combinatorial_groups(large_library)
+    assert len(groups) == 10 ** 8
+    assert groups.group_at(-1) == ("group_100000000", tuple(
+        "p%d_v9" % p for p in range(8)))
+    name, members = groups.group_at(12345678)
+    assert groups[name] == members
+    assert groups.index(name) == 12345678
+    assert "group_0" not in groups
+
+
+def test_design_test_batch_combinatorial_solver():
+    elements_per_position = {
+        "Position_1": ['A', 'B', 'C'],
+        "Position_2": ['D', 'E', 'F', 'G'],
+        "Position_3": ['H', 'I', 'J', 'K'],
+        "Position_4": ['L', 'M', 'N'],
+    }
+    possible_groups = generate_combinatorial_groups(elements_per_position)
+    selected_groups, error = design_test_batch(
+        possible_groups, max_saboteurs=2, solver="combinatorial")
+    assert error is None
+    all_elements = set(possible_groups.elements_per_position[0]).union(
+        *possible_groups.elements_per_position)
+    for x in all_elements:
+        for ys in itertools.combinations(sorted(all_elements - {x}), 2):
+            assert any((x in group) and not set(ys).intersection(group)
+                       for group in selected_groups.values())
+
+    # 100 million constructs
+    large_library = [["p%d_v%d" % (p, v) for v in range(10)] for p in range(8)]
+    possible_groups = generate_combinatorial_groups(large_library)
+    selected_groups, error = design_test_batch(possible_groups,
+                                               max_saboteurs=2)
+    assert error is None
+    assert len(selected_groups) < 100
+    # With one saboteur: few tuples, but too many groups for the search.
+    selected_groups, error = design_test_batch(possible_groups,
+                                               max_saboteurs=1)
+    assert error is None
+    assert len(selected_groups) < 100
+    possible_groups = generate_combinatorial_groups(
+        [["p%d_v%d" % (p, v) for v in range(6)] for p in range(5)])
+    selected_groups, error = design_test_batch(possible_groups,
+                                               max_saboteurs=1)
+    combinatorial_groups, error = design_test_batch(
+        possible_groups, max_saboteurs=1, solver="combinatorial")
+    assert list(selected_groups) == list(combinatorial_groups)
+
+
+def test_decode_group_tests():
+    groups = {
+        1: ['A', 'C', 'D'],
+        2: ['B', 'C', 'E'],
+        3: ['A', 'B', 'D'],
+        4: ['D', 'F', 'G']
+    }
+    result = decode_group_tests(groups, failed_groups=[2, 4], method="dd")
+    assert result['saboteurs'] == ['E']
+    assert sorted(result['suspicious']) == ['F', 'G']
+    result = decode_group_tests(groups, failed_groups=[2, 4], method="comp")
+    assert sorted(result['saboteurs']) == ['E', 'F', 'G']
+
+    # Noisy data: group 7 failed despite containing no saboteur.
+    rng = np.random.RandomState(0)
+    elements = ["e%d" % i for i in range(50)]
+    groups = {
+        i: list(rng.choice(elements, 4, replace=False)) for i in range(150)
+    }
+    saboteurs = {"e3", "e17"}
+    failed_groups = [i for i, group in groups.items()
+                     if saboteurs.intersection(group)]
+    wrong_group = min(set(groups).difference(failed_groups))
+    result = decode_group_tests(groups, failed_groups + [wrong_group])
+    assert sorted(result['saboteurs']) == ['e17', 'e3']
+    assert result['mislabelled_groups'] == [wrong_group]
+
+
+def test_design_test_batch_with_independent_sub_libraries():
+    sub_libraries = [
+        generate_combinatorial_groups(
+            [[s + e for e in "ABC"], [s + e for e in "DEF"]], prefix=s)
+        for s in ("x_", "y_", "z_")
+    ]
+    possible_groups = OrderedDict(
+        item for groups in sub_libraries for item in groups.items())
+    selected_groups, error = design_test_batch(possible_groups,
+                                               max_saboteurs=2, processes=2)
+    assert error is None
+    expected = [design_test_batch(groups, max_saboteurs=2)[0]
+                for groups in sub_libraries]
+    assert list(selected_groups) == [name for groups in expected
+                                     for name in groups]
+    elements = [(name, set(group)) for name, group in possible_groups.items()]
+    assert len(minimal_cover(
+        set(possible_groups), [(e, {g for g, s in elements if e in s})
+                               for e in set().union(*possible_groups.values())],
+        max_subsets=9)) == 9
+
+
+def test_reduce_cover_problem():
+    subsets = [
+        ("s1", {1, 2}),
+        ("s2", {2, 3, 4}),
+        ("s3", {3, 4}),  # dominated by s2
+        ("s4", {4, 5, 6}),
+        ("s5", {6, 7}),  # only subset covering 7
+        ("s6", {1, 5}),
+    ]
+    elements_set = set(range(1, 8))
+    elements, reduced, selected = reduce_cover_problem(elements_set, subsets)
+    # s5 is the only subset covering 7, then s3 is dominated by s2 which
+    # becomes the only subset covering 3, then s6 dominates s1 and s4.
+    assert [name for name, subset in selected] == ["s5", "s2", "s6"]
+    assert elements == set() and reduced == []
+    for max_subsets in range(1, 5):
+        result = minimal_cover(elements_set, subsets, max_subsets=max_subsets)
+        assert (result is None) == (max_subsets < 3)
+    assert elements_set == set().union(*[dict(subsets)[n] for n in result])
+
+
+def test_design_test_batch_milp():
+    elements_per_position = {
+        "Position_1": ['A', 'B', 'C'],
+        "Position_2": ['D', 'E', 'F', 'G'],
+        "Position_3": ['H', 'I', 'J', 'K'],
+        "Position_4": ['L', 'M', 'N'],
+    }
+    possible_groups = generate_combinatorial_groups(elements_per_position)
+    selected_groups, error = design_test_batch(possible_groups,
+                                               max_saboteurs=1, solver="milp")
+    assert error is None
+    search_selection, _ = design_test_batch(possible_groups, max_saboteurs=1)
+    assert len(selected_groups) <= len(search_selection)
+    # Groups with element "A" are expensive so the selection avoids them.
+    group_costs = {name: 10 if "A" in group else 1
+                   for name, group in possible_groups.items()}
+    cheap_selection, _ = design_test_batch(possible_groups, max_saboteurs=1,
+                                           solver="milp",
+                                           group_costs=group_costs)
+    assert sum("A" in group for group in cheap_selection.values()) <= 2
+    selected, infos = milp_minimal_cover(
+        {1, 2, 3}, [("a", {1, 2}), ("b", {2, 3}), ("c", {3})], max_subsets=2)
+    assert sorted(selected) == ["a", "b"] or sorted(selected) == ["a", "c"]
+    assert infos["optimal"]
+    selected, infos = minimal_cover(
+        {1, 2, 3}, [("a", {1, 2}), ("b", {2, 3}), ("c", {3})], solver="milp",
+        return_infos=True)
+    assert infos["optimal"] and (infos["cost"] == 2) and (infos["gap"] == 0)
+    selected, infos = minimal_cover(
+        {1, 2, 3}, [("a", {1, 2}), ("b", {2, 3}), ("c", {3})],
+        return_infos=True)
+    assert (not infos["optimal"]) and (infos["cost"] == len(selected))
+
+
+def test_design_test_batch_weighted():
+    elements_per_position = {
+        "Position_1": ['A', 'B'],
+        "Position_2": ['C', 'D', 'E'],
+        "Position_3": ['F', 'G'],
+    }
+    possible_groups = generate_combinatorial_groups(elements_per_position)
+    group_costs = {name: 5 if "C" in group else 1 + ("F" in group)
+                   for name, group in possible_groups.items()}
+    costs = {}
+    for solver in ["search", "milp"]:
+        selected_groups, error = design_test_batch(
+            possible_groups, max_saboteurs=1, solver=solver,
+            group_costs=group_costs)
+        assert error is None
+        assert verify_test_batch(selected_groups) == []
+        costs[solver] = sum(group_costs[name] for name in selected_groups)
+    assert costs["search"] == costs["milp"]
+    unweighted, _ = design_test_batch(possible_groups, max_saboteurs=1)
+    assert costs["search"] <= sum(group_costs[name] for name in unweighted)
+    # Element "C" is available for only 2 groups.
+    selected_groups, error = design_test_batch(
+        possible_groups, max_saboteurs=1, solver="search",
+        element_availability={"C": 2})
+    assert error is None
+    assert verify_test_batch(selected_groups) == []
+    assert sum("C" in group for group in selected_groups.values()) <= 2
+    selected, infos = weighted_minimal_cover(
+        {1, 2, 3}, [("a", {1, 2, 3}), ("b", {1, 2}), ("c", {3})],
+        costs={"a": 3, "b": 1, "c": 1})
+    assert selected == ["b", "c"]
+    assert infos["optimal"] and (infos["cost"] == 2)
+    selected, infos = weighted_minimal_cover(
+        {1, 2, 3}, [("a", {1, 2, 3}), ("b", {1, 2}), ("c", {3})],
+        capacity_constraints=[(0, ["a"])])
+    assert selected == ["b", "c"]
+    with pytest.raises(ValueError):
+        design_test_batch(possible_groups, solver="bitset",
+                          group_costs=group_costs)
+
+
+def test_design_test_batch_planner():
+    rng = np.random.RandomState(0)
+    possible_groups = OrderedDict(
+        ("group_%03d" % i, ["e%02d" % e for e in rng.choice(40, 6, False)])
+        for i in range(300))
+    plan = plan_test_batch_design(possible_groups, max_saboteurs=2,
+                                  memory_budget=1e7)
+    assert plan["n_tuples"] == 40 * 39 * 38 // 2
+    assert plan["engine"] == "bitset"
+    selected_groups, error = design_test_batch(possible_groups,
+                                               max_saboteurs=2,
+                                               memory_budget=1e7)
+    assert error is None
+    groups = [set(group) for group in selected_groups.values()]
+    elements = set().union(*groups)
+    for x in elements:
+        for ys in itertools.combinations(elements - {x}, 2):
+            assert any((x in g) and not g.intersection(ys) for g in groups)
+
+    # Huge problems are refused before any tuple is created.
+    huge_groups = OrderedDict(
+        ("group_%04d" % i, ["e%03d" % e for e in rng.choice(200, 20, False)])
+        for i in range(2000))
+    stats = {}
+    selected_groups, error = design_test_batch(huge_groups, max_saboteurs=3,
+                                               stats=stats)
+    assert selected_groups is None
+    assert "exceeds the budgets" in error
+    assert (stats["engine"] is None) and (stats["plan"]["n_groups"] == 2000)
+
+    # Combinatorial libraries too large for the other engines.
+    library = generate_combinatorial_groups(OrderedDict(
+        ("position_%d" % p, ["e%d_%d" % (p, i) for i in range(10)])
+        for p in range(8)))
+    plan = plan_test_batch_design(library, max_saboteurs=1,
+                                  engines=("search", "bitset",
+                                           "combinatorial"))
+    assert plan["engine"] == "combinatorial"
+    assert plan["engines"]["combinatorial"]["memory"] < 1e5
+    assert plan_test_batch_design(
+        possible_groups, engines=("combinatorial",))["engine"] is None
+    selected_groups, error = design_test_batch(library, max_saboteurs=1)
+    assert error is None
+    assert verify_test_batch(selected_groups) == []
+
+
+def test_minimal_cover_checkpoint_and_resume(tmpdir):
+    rng = np.random.RandomState(1)
+    subsets = [("s%02d" % i, set(rng.choice(30, 8, False)))
+               for i in range(25)]
+    elements_set = set().union(*[subset for name, subset in subsets])
+    expected = minimal_cover(elements_set, subsets, max_subsets=6)
+    assert expected is not None
+    checkpoint_file = os.path.join(str(tmpdir), "search.pkl")
+
+    calls = []
+
+    def interrupting_heuristic(named_subset, selected):
+        calls.append(1)
+        if len(calls) > 40:
+            raise KeyboardInterrupt()
+        return len(named_subset[1])
+
+    try:
+        minimal_cover(elements_set, subsets, max_subsets=6,
+                      heuristic=interrupting_heuristic,
+                      checkpoint_file=checkpoint_file, checkpoint_interval=0)
+    except KeyboardInterrupt:
+        pass
+    assert os.path.exists(checkpoint_file)
+    resumed = minimal_cover(elements_set, subsets, max_subsets=6,
+                            checkpoint_file=checkpoint_file,
+                            resume_from=checkpoint_file)
+    assert resumed == expected
+    # The final result is saved, so resuming again returns it directly.
+    assert minimal_cover(elements_set, subsets, max_subsets=6,
+                         resume_from=checkpoint_file) == expected
+
+    elements_per_position = {
+        "Position_1": ['A', 'B', 'C'],
+        "Position_2": ['D', 'E', 'F', 'G'],
+        "Position_3": ['H', 'I', 'J', 'K'],
+        "Position_4": ['L', 'M', 'N'],
+    }
+    possible_groups = generate_combinatorial_groups(elements_per_position)
+    batch_checkpoint = os.path.join(str(tmpdir), "batch.pkl")
+    selected_groups, error = design_test_batch(
+        possible_groups, max_saboteurs=2, solver="search",
+        checkpoint_file=batch_checkpoint)
+    assert len(selected_groups) == 15
+    resumed_groups, error = design_test_batch(
+        possible_groups, max_saboteurs=2, solver="search",
+        resume_from=batch_checkpoint)
+    assert list(resumed_groups) == list(selected_groups)
+
+
+def test_minimal_cover_resumes_from_every_save_point(tmpdir, monkeypatch):
+    from saboteurs.logical_methods import minimal_cover as module
+    saved_states = []
+    save = module._SearchCheckpoint.save
+
+    def recording_save(checkpoint, force=False, **state):
+        save(checkpoint, force=force, **state)
+        if checkpoint.path is not None:
+            with open(checkpoint.path, "rb") as f:
+                saved_states.append(f.read())
+
+    monkeypatch.setattr(module._SearchCheckpoint, "save", recording_save)
+    checkpoint_file = os.path.join(str(tmpdir), "search.pkl")
+    resume_file = os.path.join(str(tmpdir), "resume.pkl")
+    for seed in range(20):
+        rng = np.random.RandomState(seed)
+        subsets = [("s%02d" % i, set(rng.choice(12, 3, False)))
+                   for i in range(10)]
+        elements_set = set().union(*[subset for name, subset in subsets])
+        for max_subsets in [4, 5]:
+            saved_states[:] = []
+            expected = minimal_cover(elements_set, subsets,
+                                     max_subsets=max_subsets,
+                                     checkpoint_file=checkpoint_file,
+                                     checkpoint_interval=0)
+            for state in saved_states[:-1]:
+                with open(resume_file, "wb") as f:
+                    f.write(state)
+                resumed = minimal_cover(elements_set, subsets,
+                                        max_subsets=max_subsets,
+                                        resume_from=resume_file)
+                assert resumed == expected
+
+
+def test_design_test_batch_with_fixed_groups():
+    elements_per_position = {
+        "Position_1": ['A', 'B', 'C'],
+        "Position_2": ['D', 'E', 'F', 'G'],
+        "Position_3": ['H', 'I', 'J', 'K'],
+    }
+    old_groups = generate_combinatorial_groups(elements_per_position)
+    old_batch, error = design_test_batch(old_groups, max_saboteurs=2)
+    assert error is None
+    elements_per_position["Position_1"].append('O')
+    new_groups = OrderedDict(generate_combinatorial_groups(
+        elements_per_position, prefix="new_").items())
+    new_groups.update(old_groups.items())
+    batch, error = design_test_batch(new_groups, max_saboteurs=2,
+                                     fixed_groups=old_batch)
+    assert error is None
+    assert list(batch)[:len(old_batch)] == list(old_batch)
+    extra_groups = list(batch)[len(old_batch):]
+    assert 0 < len(extra_groups) < len(old_batch)
+    groups = [set(group) for group in batch.values()]
+    elements = set().union(*groups)
+    for x in elements:
+        for ys in itertools.combinations(elements - {x}, 2):
+            assert any((x in g) and not g.intersection(ys) for g in groups)
+
+
+def test_design_error_tolerant_test_batch():
+    elements_per_position = {
+        "Position_1": ['A', 'B', 'C'],
+        "Position_2": ['D', 'E', 'F', 'G'],
+        "Position_3": ['H', 'I', 'J', 'K'],
+        "Position_4": ['L', 'M', 'N'],
+    }
+    possible_groups = generate_combinatorial_groups(elements_per_position)
+    batch, error = design_test_batch(possible_groups, max_saboteurs=1)
+    separation, pair = minimum_separation(batch, max_saboteurs=1)
+    assert separation >= 1
+    tolerant_batch, error = design_test_batch(possible_groups,
+                                              max_saboteurs=1, max_errors=1)
+    assert error is None
+    assert len(tolerant_batch) > len(batch)
+    separation, pair = minimum_separation(tolerant_batch, max_saboteurs=1,
+                                          chunk_size=5)
+    assert separation >= 3
+
+    # Brute-force check of the separation.
+    def signature(hypothesis):
+        return [any(e in group for e in hypothesis)
+                for group in tolerant_batch.values()]
+    hypotheses = [()] + [(e,) for e in "ABCDEFGHIJKLMN"]
+    brute_force = min(
+        sum(a != b for a, b in zip(signature(h1), signature(h2)))
+        for h1, h2 in itertools.combinations(hypotheses, 2))
+    assert separation == brute_force
+    assert sum(a != b for a, b in zip(signature(pair[0]),
+                                      signature(pair[1]))) == separation
+
+
+def test_verify_test_batch():
+    groups = {"g1": ["a", "b"], "g2": ["b", "c"], "g3": ["c"]}
+    assert verify_test_batch(groups, max_saboteurs=1) == []
+    assert verify_test_batch(groups, max_saboteurs=2) == [
+        (("b",), ("a", "b")), (("a", "c"), ("b", "c"))]
+    assert len(verify_test_batch(groups, max_saboteurs=2, max_pairs=1)) == 1
+    elements_per_position = {
+        "Position_1": ['A', 'B', 'C'],
+        "Position_2": ['D', 'E', 'F', 'G'],
+        "Position_3": ['H', 'I', 'J', 'K'],
+        "Position_4": ['L', 'M', 'N'],
+    }
+    possible_groups = generate_combinatorial_groups(elements_per_position)
+    batch, error = design_test_batch(possible_groups, max_saboteurs=2)
+    assert verify_test_batch(batch, max_saboteurs=2) == []
+    first_groups = OrderedDict(list(batch.items())[:5])
+    assert len(verify_test_batch(first_groups, max_saboteurs=2)) > 0
+
+
+def test_recommend_next_groups():
+    elements_per_position = {
+        "Position_1": ['A', 'B', 'C'],
+        "Position_2": ['D', 'E', 'F', 'G'],
+        "Position_3": ['H', 'I', 'J', 'K'],
+        "Position_4": ['L', 'M', 'N'],
+    }
+    candidates = generate_combinatorial_groups(elements_per_position)
+    tested = OrderedDict((name, candidates[name])
+                         for name in ["group_001", "group_050", "group_100"])
+    failed = ["group_001"]
+    result = recommend_next_groups(tested, failed, candidates,
+                                   max_saboteurs=2, n_groups=3)
+    # Brute force: hypotheses explaining the results, and best first group.
+    ok_elements = set(tested["group_050"]) | set(tested["group_100"])
+    suspects = [e for e in "ABCDEFGHIJKLMN" if e not in ok_elements]
+    hypotheses = [set(h) for size in (1, 2)
+                  for h in itertools.combinations(suspects, size)
+                  if set(h) & set(tested["group_001"])]
+    assert result["n_hypotheses"] == len(hypotheses)
+
+    def gain(group):
+        p = np.mean([bool(h & set(group)) for h in hypotheses])
+        return 0 if p in (0, 1) else -p * np.log2(p) - (1 - p) * np.log2(1 - p)
+    best_gain = max(gain(group) for group in candidates.values())
+    assert np.isclose(result["information_gains"][0], best_gain)
+    assert np.isclose(gain(candidates[result["recommended"][0]]), best_gain)
+    assert len(result["recommended"]) == 3
+
+
+def test_design_test_batch_out_of_core(tmpdir):
+    from saboteurs.logical_methods import out_of_core_test_batch
+    from saboteurs.logical_methods.bitset_cover import bitset_test_batch
+    rng = np.random.RandomState(0)
+    possible_groups = OrderedDict(
+        ("group_%03d" % i, ["e%02d" % e for e in rng.choice(40, 6, False)])
+        for i in range(300))
+    expected = bitset_test_batch(possible_groups, max_saboteurs=2)
+    # A budget of a few rows: the coverage is written and read by chunks.
+    selected, stats = out_of_core_test_batch(
+        possible_groups, max_saboteurs=2, directory=str(tmpdir),
+        memory_budget=200000)
+    assert selected == expected
+    assert stats["chunk_rows"] < 300
+    assert stats["resident_bytes"] <= 200000
+    assert stats["bytes_written"] == stats["file_bytes"] == 300 * 3705
+    assert stats["rows_read"] < 300 * len(selected)
+    assert os.listdir(str(tmpdir)) == []
+    # Too large for the memory budget, so "auto" spills to disk.
+    plan = plan_test_batch_design(possible_groups, max_saboteurs=2,
+                                  memory_budget=1e6,
+                                  engines=("search", "bitset", "out_of_core"))
+    assert plan["engine"] == "out_of_core"
+    stats = {}
+    selected_groups, error = design_test_batch(
+        possible_groups, max_saboteurs=2, memory_budget=1e6,
+        spill_directory=str(tmpdir), stats=stats)
+    assert error is None
+    assert list(selected_groups) == sorted(expected)
+    assert stats["engine"] == "out_of_core"
+    assert stats["out_of_core"]["bytes_written"] == 300 * 3705
+    assert stats["out_of_core"]["resident_bytes"] <= 1e6
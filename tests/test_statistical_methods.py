@@ -1,5 +1,11 @@
 import os
-from saboteurs import csv_to_groups_data, find_statistical_saboteurs, statistics_report
+from collections import OrderedDict
+import numpy as np
+from scipy.sparse import issparse
+from saboteurs import (csv_to_groups_data, find_statistical_saboteurs,
+                       find_interacting_saboteurs, find_bayesian_saboteurs,
+                       GroupsDataSummary, merge_summaries, statistics_report)
+from saboteurs.statistical_methods import weighted_lasso_path
 
 def test_basics(tmpdir):
     csv_path = os.path.join('tests', 'data', "statistical.csv")
@@ -9,3 +15,210 @@ def test_basics(tmpdir):
     statistics_report(analysis_results, pdf_path)
     data = statistics_report(analysis_results, '@memory')
     assert len(data) > 70000
+
+
+def test_find_interacting_saboteurs():
+    rng = np.random.RandomState(0)
+    groups_data = OrderedDict()
+    for i in range(300):
+        members = ["m%d" % m for m in rng.choice(30, 8, replace=False)]
+        # Groups fail mostly when m1 and m2 are both present.
+        rate = 0.9 if ("m1" in members) and ("m2" in members) else 0.1
+        groups_data["g%d" % i] = dict(attempts=10, members=members,
+                                      failures=rng.binomial(10, rate))
+    pairs = find_interacting_saboteurs(groups_data, pvalue_threshold=1e-3)
+    assert set(pairs[0]["members"]) == {"m1", "m2"}
+    assert pairs[0]["failure_rate"] > 0.8
+    assert all(pair["pvalue"] < 1e-3 for pair in pairs)
+    groups_data = csv_to_groups_data(os.path.join('tests', 'data',
+                                                  "statistical.csv"))
+    assert find_interacting_saboteurs(groups_data, min_cooccurrences=20) == []
+
+
+def test_weighted_lasso_path():
+    from sklearn.linear_model import ElasticNet, Lasso
+    rng = np.random.RandomState(0)
+    data = (rng.rand(200, 500) < 0.05).astype(float)
+    rates = 0.05 + data[:, :3] @ [0.5, 0.3, 0.2] + 0.02 * rng.randn(200)
+    attempts = rng.randint(1, 10, 200)
+    alphas, coefs, intercepts, n_screened = weighted_lasso_path(
+        data, rates, sample_weight=attempts, n_alphas=20)
+    # Screening rules keep coordinate descent on a few members only.
+    assert n_screened[5] < 50
+    expected = Lasso(alpha=alphas[10], tol=1e-10).fit(
+        data, rates, sample_weight=attempts * 200.0 / attempts.sum())
+    assert np.abs(expected.coef_ - coefs[10]).max() < 1e-3
+    assert set(np.flatnonzero(coefs[8])) == {0, 1, 2}
+    # Elastic net: the SAFE rule is not used, the strong rule still is.
+    alphas, coefs, intercepts, n_screened = weighted_lasso_path(
+        data, rates, sample_weight=attempts, l1_ratio=0.5, n_alphas=20)
+    assert n_screened[5] < 50
+    expected = ElasticNet(alpha=alphas[10], l1_ratio=0.5, tol=1e-10).fit(
+        data, rates, sample_weight=attempts * 200.0 / attempts.sum())
+    assert np.abs(expected.coef_ - coefs[10]).max() < 1e-3
+    assert abs(expected.intercept_ - intercepts[10]) < 1e-3
+
+
+def test_find_statistical_saboteurs_with_lasso():
+    csv_path = os.path.join('tests', 'data', "statistical.csv")
+    groups_data = csv_to_groups_data(csv_path)
+    results = find_statistical_saboteurs(groups_data, regression="lasso")
+    assert list(results["significant_members"]) == ["Charlie", "Stephany"]
+    assert "Charlie" in results["selected_members"]
+    assert len(results["selected_members"]) < len(results["varying_members"])
+
+
+def test_find_bayesian_saboteurs():
+    csv_path = os.path.join('tests', 'data', "statistical.csv")
+    groups_data = csv_to_groups_data(csv_path)
+    variational = find_bayesian_saboteurs(groups_data)
+    assert list(variational["posteriors"])[:2] == ["Charlie", "Stephany"]
+    assert "Alice" not in variational["posteriors"]  # in all groups
+    gibbs = find_bayesian_saboteurs(groups_data, method="gibbs", n_chains=4,
+                                    n_samples=200, burn_in=50, processes=2)
+    assert gibbs["chains_posteriors"].shape == (4, 7)
+    for member, probability in gibbs["posteriors"].items():
+        assert abs(probability - variational["posteriors"][member]) < 0.05
+    same_seed = find_bayesian_saboteurs(groups_data, method="gibbs",
+                                        n_chains=4, n_samples=200, burn_in=50,
+                                        processes=2)
+    assert (same_seed["chains_posteriors"] == gibbs["chains_posteriors"]).all()
+
+
+def test_bayesian_saboteurs_independent_of_processes():
+    groups_data = OrderedDict(
+        ("group_%d" % i, dict(members=list(members), attempts=4,
+                              failures=failures))
+        for i, (members, failures) in enumerate([
+            ("AB", 2), ("AC", 1), ("BC", 1), ("BD", 0), ("CD", 1), ("AD", 1)])
+    )
+    parameters = dict(method="gibbs", prior=0.3, background_failure_rate=0.1,
+                      saboteur_failure_rate=0.3, n_chains=4, n_samples=100,
+                      burn_in=20)
+    serial = find_bayesian_saboteurs(groups_data, processes=1, **parameters)
+    chains_posteriors = serial["chains_posteriors"]
+    # The posteriors are not all 0 or 1, so the chains differ.
+    assert ((chains_posteriors > 0.05) & (chains_posteriors < 0.95)).all()
+    assert len(set(map(tuple, chains_posteriors))) == 4
+    parallel = find_bayesian_saboteurs(groups_data, processes=2, **parameters)
+    assert (parallel["chains_posteriors"] == chains_posteriors).all()
+
+
+def test_find_statistical_saboteurs_with_bootstrap():
+    csv_path = os.path.join('tests', 'data', "statistical.csv")
+    groups_data = csv_to_groups_data(csv_path)
+    result = find_statistical_saboteurs(groups_data, bootstrap=200)
+    for member_data in result["significant_members"].values():
+        low, high = member_data["effect_interval"]
+        assert low <= member_data["effect"] <= high
+    low, high = result["f1_score_interval"]
+    assert 0 <= low <= high <= 1
+    parallel = find_statistical_saboteurs(groups_data, bootstrap=200,
+                                          processes=2)
+    assert parallel["f1_score_interval"] == result["f1_score_interval"]
+
+
+def test_groups_data_summary():
+    import json
+    csv_path = os.path.join('tests', 'data', "statistical.csv")
+    groups_data = csv_to_groups_data(csv_path)
+    items = list(groups_data.items())
+    shards = [OrderedDict(items[i::3]) for i in range(3)]
+    summaries = [GroupsDataSummary.from_groups_data(shard) for shard in shards]
+    left = merge_summaries(summaries)
+    right = summaries[0] + (summaries[1] + summaries[2])
+    assert left.to_dict() == right.to_dict()
+    serialized = json.dumps(left.to_dict())
+    summary = GroupsDataSummary.from_dict(json.loads(serialized))
+    assert summary.to_dict() == left.to_dict()
+    whole = GroupsDataSummary.from_groups_data(groups_data)
+    ids = [left.members.index(m) for m in whole.members]
+    assert issparse(left.gram)
+    assert (left.gram[ids][:, ids] != whole.gram).nnz == 0
+    expected = find_statistical_saboteurs(groups_data)
+    result = summary.find_saboteurs()
+    assert result["varying_members"] == expected["varying_members"]
+    assert list(result["significant_members"]) == ["Charlie", "Stephany"]
+    for member, data in expected["significant_members"].items():
+        assert np.allclose(result["significant_members"][member]["pvalue"],
+                           data["pvalue"])
+        assert np.allclose(result["significant_members"][member]["effect"],
+                           data["effect"])
+
+
+def test_statistical_result_does_not_copy_groups_data():
+    csv_path = os.path.join('tests', 'data', "statistical.csv")
+    groups_data = csv_to_groups_data(csv_path)
+    result = find_statistical_saboteurs(groups_data)
+    assert "deviation" not in groups_data["Mission 1"]
+    group_data = result["groups_data"]["Mission 1"]
+    assert group_data["members"] is groups_data["Mission 1"]["members"]
+    assert group_data["failure_rate"] == 7 / 8
+    assert set(result) == {"groups_data", "conserved_members",
+                           "varying_members", "significant_members",
+                           "f1_score"}
+    as_dict = result.to_dict()
+    assert as_dict["groups_data"]["Mission 2"]["deviation"] == -1.3
+    assert list(result.to_dataframe().index) == ["Charlie", "Stephany"]
+    groups_dataframe = result["groups_data"].to_dataframe()
+    assert groups_dataframe.loc["Mission 1", "failures"] == 7
+
+
+def test_groups_deviations_and_outliers():
+    from scipy.stats import binom
+    from saboteurs.statistical_methods.deviations import (groups_deviations,
+                                                          top_outliers)
+    rng = np.random.RandomState(0)
+    attempts = rng.randint(1, 50, 1000)
+    predictions = rng.uniform(0, 1, 1000)
+    failures = rng.binomial(attempts, predictions)
+    deviations, pvalues = groups_deviations(attempts, failures, predictions,
+                                            0.3)
+    for i in range(0, 1000, 97):
+        std = binom.std(attempts[i], 0.3) / attempts[i]
+        expected = (failures[i] / attempts[i] - predictions[i]) / std
+        assert np.round(expected, 1) == deviations[i]
+        assert np.allclose(pvalues[i], binom.sf(failures[i] - 1, attempts[i],
+                                                predictions[i]))
+    outliers = top_outliers(pvalues, 20)
+    assert list(outliers) == list(np.argsort(pvalues, kind="stable")[:20])
+    result = find_statistical_saboteurs(
+        csv_to_groups_data(os.path.join('tests', 'data', "statistical.csv")))
+    groups = result["groups_data"]
+    assert groups.outliers(1) == ["Mission 11"]
+    # Items and values are views, which can be iterated several times.
+    items = groups.items()
+    assert len(items) == len(groups)
+    assert list(items) == list(items) == [(n, groups[n]) for n in groups]
+    assert list(groups.values()) == [data for _, data in items]
+    assert ("Mission 11", groups["Mission 11"]) in items
+
+
+def test_members_incidence():
+    from saboteurs.statistical_methods import MembersIncidence
+    from saboteurs.statistical_methods.reports import make_groups_table
+    csv_path = os.path.join('tests', 'data', "statistical.csv")
+    groups_data = csv_to_groups_data(csv_path)
+    incidence = MembersIncidence(groups_data)
+    members = sorted(incidence.members)
+    expected = [[m in d["members"] for m in members]
+                for d in groups_data.values()]
+    assert (incidence.columns(members, dtype=bool) == expected).all()
+    result = find_statistical_saboteurs(groups_data)
+    groups = result["groups_data"]
+    # The incidence of the analysis is kept for the report.
+    assert groups._incidence is not None
+    assert groups.incidence.members == incidence.members
+    table = make_groups_table(result).set_index("Group")
+    for member in result["significant_members"]:
+        for name, group_data in groups_data.items():
+            in_group = member in group_data["members"]
+            assert table.loc[name, member] == ("✔" if in_group else "")
+
+
+def test_groups_table_from_dict_results():
+    from saboteurs.statistical_methods.reports import make_groups_table
+    csv_path = os.path.join('tests', 'data', "statistical.csv")
+    result = find_statistical_saboteurs(csv_to_groups_data(csv_path))
+    table = make_groups_table(result)
+    assert make_groups_table(result.to_dict()).equals(table)